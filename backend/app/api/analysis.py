@@ -1,9 +1,11 @@
 """Analysis endpoints for running bioinformatics tools."""
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel
 from typing import Optional
 import uuid
 
+from app.http_cache import CATALOGUE_CACHE, conditional_json
+
 router = APIRouter()
 
 
@@ -93,17 +95,17 @@ TOOLS = {
 
 
 @router.get("/tools")
-async def list_tools() -> dict[str, ToolInfo]:
+async def list_tools(request: Request) -> dict[str, ToolInfo]:
     """List all available bioinformatics tools."""
-    return TOOLS
+    return conditional_json(request, TOOLS, CATALOGUE_CACHE)
 
 
 @router.get("/tools/{tool_name}")
-async def get_tool_info(tool_name: str) -> ToolInfo:
+async def get_tool_info(tool_name: str, request: Request) -> ToolInfo:
     """Get information about a specific tool."""
     if tool_name not in TOOLS:
         raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
-    return TOOLS[tool_name]
+    return conditional_json(request, TOOLS[tool_name], CATALOGUE_CACHE)
 
 
 @router.post("/run")
@@ -1,8 +1,10 @@
 """Narrative content endpoints."""
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
 
+from app.http_cache import CATALOGUE_CACHE, conditional_json
+
 router = APIRouter()
 
 
@@ -99,9 +101,9 @@ NARRATIVES = {
 
 
 @router.get("/")
-async def list_narratives() -> list[dict]:
+async def list_narratives(request: Request) -> list[dict]:
     """List all available narratives."""
-    return [
+    return conditional_json(request, [
         {
             "id": n.id,
             "title": n.title,
@@ -111,19 +113,19 @@ async def list_narratives() -> list[dict]:
             "estimated_time": n.estimated_time,
         }
         for n in NARRATIVES.values()
-    ]
+    ], CATALOGUE_CACHE)
 
 
 @router.get("/{narrative_id}")
-async def get_narrative(narrative_id: str) -> Narrative:
+async def get_narrative(narrative_id: str, request: Request) -> Narrative:
     """Get a specific narrative with all its steps."""
     if narrative_id not in NARRATIVES:
         raise HTTPException(status_code=404, detail=f"Narrative '{narrative_id}' not found")
-    return NARRATIVES[narrative_id]
+    return conditional_json(request, NARRATIVES[narrative_id], CATALOGUE_CACHE)
 
 
 @router.get("/{narrative_id}/step/{step_id}")
-async def get_narrative_step(narrative_id: str, step_id: int) -> NarrativeStep:
+async def get_narrative_step(narrative_id: str, step_id: int, request: Request) -> NarrativeStep:
     """Get a specific step from a narrative."""
     if narrative_id not in NARRATIVES:
         raise HTTPException(status_code=404, detail=f"Narrative '{narrative_id}' not found")
@@ -131,6 +133,6 @@ async def get_narrative_step(narrative_id: str, step_id: int) -> NarrativeStep:
     narrative = NARRATIVES[narrative_id]
     for step in narrative.steps:
         if step.id == step_id:
-            return step
+            return conditional_json(request, step, CATALOGUE_CACHE)
 
     raise HTTPException(status_code=404, detail=f"Step {step_id} not found in narrative '{narrative_id}'")
@@ -10,7 +10,7 @@ from pydantic import BaseModel, EmailStr
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import get_current_user, hash_password
+from app.auth import get_current_user, get_current_user_for_update, invalidate_user, passwords
 from app.database import get_db
 from app.models import User
 
@@ -64,7 +64,7 @@ class GroupMemberResponse(BaseModel):
 @router.post("/create-checkout")
 async def create_checkout_session(
     body: CreateCheckoutRequest,
-    user: Annotated[User, Depends(get_current_user)],
+    user: Annotated[User, Depends(get_current_user_for_update)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     """Create a Stripe Checkout Session and return the URL."""
@@ -86,6 +86,7 @@ async def create_checkout_session(
         )
         user.stripe_customer_id = customer.id
         await db.commit()
+        invalidate_user(user.id)
 
     metadata = {
         "user_id": user.id,
@@ -154,21 +155,27 @@ async def _handle_checkout_completed(session: dict, db: AsyncSession):
     user.subscription_expires_at = expires_at
 
     # Handle group plan: upgrade group member accounts
+    upgraded = [user]
     if plan == "group_monthly":
         group_emails_str = metadata.get("group_emails", "")
         if group_emails_str:
             emails = [e.strip() for e in group_emails_str.split(",") if e.strip()]
             for email in emails[:10]:
-                await _upgrade_or_create_group_member(email, user.id, expires_at, db)
+                upgraded.append(await _upgrade_or_create_group_member(email, user.id, expires_at, db))
 
     await db.commit()
+    for upgraded_user in upgraded:
+        invalidate_user(upgraded_user.id)
     logger.info(f"User {user_id} upgraded to pro ({plan}), expires {expires_at}")
 
 
 async def _upgrade_or_create_group_member(
     email: str, owner_id: str, expires_at: datetime, db: AsyncSession
-):
-    """Upgrade an existing user or create a placeholder account for a group member."""
+) -> User:
+    """Upgrade an existing user or create a placeholder account for a group member.
+
+    The caller commits and then invalidates the member's cached user.
+    """
     result = await db.execute(select(User).where(User.email == email))
     member = result.scalar_one_or_none()
 
@@ -183,13 +190,14 @@ async def _upgrade_or_create_group_member(
         member = User(
             email=email,
             username=email.split("@")[0] + "_" + secrets.token_hex(3),
-            password_hash=hash_password(secrets.token_hex(16)),
+            password_hash=await passwords.hash(secrets.token_hex(16)),
             subscription_tier="pro",
             subscription_plan="group_monthly",
             subscription_expires_at=expires_at,
             group_owner_id=owner_id,
         )
         db.add(member)
+    return member
 
 
 @router.get("/status", response_model=SubscriptionStatusResponse)
@@ -222,9 +230,11 @@ async def manage_group_members(
 
     members = []
     for email in body.emails:
-        await _upgrade_or_create_group_member(email, user.id, expires_at, db)
+        members.append(await _upgrade_or_create_group_member(email, user.id, expires_at, db))
 
     await db.commit()
+    for member in members:
+        invalidate_user(member.id)
 
     # Return current group members
     result = await db.execute(select(User).where(User.group_owner_id == user.id))
@@ -1,15 +1,26 @@
 """Template file serving endpoints."""
-from typing import Annotated, Optional
+import base64
+from typing import Annotated, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer
 from pathlib import Path
 from pydantic import BaseModel
 
 from app.auth import get_current_user
-from app.models import User
+from app.entitlements import has_pro_access
+from app.http_cache import (
+    FILE_CACHE, LISTING_CACHE, conditional_json, digest_etag, file_etag, is_not_modified, not_modified, validator_headers,
+)
+from app.http_range import RangeFileResponse, requested_ranges
+from app.services.analysis_cache import analysis_kind, template_analyses
+from app.services.template_index import TreeNode, template_index
+from app.storage.features import is_feature_file, template_features
 from app.storage.files import template_storage
+from app.storage.precompress import choose_encoding, is_compressible, template_precompressor
+from app.storage.records import record_format, template_records
 
 router = APIRouter()
 
@@ -22,13 +33,14 @@ oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/users/login", auto_
 
 
 async def _check_category_access(category: str, request: Request):
-    """Raise 403 if the category requires pro and the user isn't subscribed."""
+    """Raise 403 if the category requires pro and the user isn't subscribed.
+
+    The user comes from the user cache; see app.entitlements.
+    """
     if category not in PAID_CATEGORIES:
         return
     # Try to get the current user from the Authorization header
     from app.auth import decode_token
-    from app.database import get_db
-    from sqlalchemy import select
 
     auth_header = request.headers.get("authorization", "")
     if not auth_header.startswith("Bearer "):
@@ -44,13 +56,11 @@ async def _check_category_access(category: str, request: Request):
     if not user_id or payload.get("type") != "access":
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    async for db in get_db():
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        if not user.is_pro:
-            raise HTTPException(status_code=403, detail="Pro subscription required to access this content")
+    is_pro = await has_pro_access(payload)
+    if is_pro is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if not is_pro:
+        raise HTTPException(status_code=403, detail="Pro subscription required to access this content")
 
 
 class TemplateInfo(BaseModel):
@@ -79,22 +89,100 @@ def get_template_path(category: str, storyline: str, tool: Optional[str] = None,
     return path
 
 
+async def _get_storyline_node(category: str, storyline: str) -> TreeNode:
+    """Look up a storyline in the template index, or raise 404."""
+    node = await template_index.get(category, storyline)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Storyline '{storyline}' not found in category '{category}'")
+    return node
+
+
+async def _stat_file(file_path: Path, filename: str) -> tuple[int, int, Optional[str]]:
+    """Return (size, mtime_ns, sha256 or None) of a regular file, or raise 404/400.
+
+    Answered from the template index, which re-stats the file on local disk;
+    paths it doesn't know yet (added since the last refresh) fall back to the
+    disk. The hash is only known up front for content-addressed storage (or
+    once computed for this file version).
+    """
+    node = await template_index.current(str(file_path.relative_to(TEMPLATE_DIR)))
+    if node is not None:
+        if node.is_dir:
+            raise HTTPException(status_code=400, detail=f"'{filename}' is not a file")
+        return node.size, node.mtime_ns, node.known_digest()
+
+    if not await template_storage.aio.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"File '{filename}' not found")
+    if not await template_storage.aio.is_file(file_path):
+        raise HTTPException(status_code=400, detail=f"'{filename}' is not a file")
+    st = await template_storage.aio.stat(file_path)
+    return st.st_size, st.st_mtime_ns, template_storage.digest(file_path)
+
+
+def _file_etag(size: int, mtime_ns: int, digest: Optional[str], encoding: Optional[str] = None) -> str:
+    # Content hashes make the same file share one ETag across storylines
+    if digest is not None:
+        return digest_etag(digest, encoding)
+    return file_etag(size, mtime_ns, encoding)
+
+
+async def _serve_file(request: Request, file_path: Path, filename: str) -> Response:
+    """Serve a template file with validators, answering 304 without opening it.
+
+    Compressible files are served from a precompressed sidecar when one is
+    up to date and the client accepts its encoding. Range requests (resumed
+    or partial downloads) get 206 with just the requested bytes; ranges of
+    a compressed variant refer to its encoded bytes.
+    """
+    size, mtime_ns, digest = await _stat_file(file_path, filename)
+    rel_path = str(file_path.relative_to(TEMPLATE_DIR))
+    media_type = template_storage.media_type(rel_path)
+
+    # Sidecars are local, so choosing the encoding (part of the ETag) never
+    # touches the source; a remote source is only fetched for a full response
+    encoding = None
+    if is_compressible(file_path):
+        variants = await template_precompressor.variants(rel_path, size, mtime_ns, digest)
+        encoding = choose_encoding(request.headers.get("accept-encoding"), variants)
+
+    headers = validator_headers(_file_etag(size, mtime_ns, digest, encoding), mtime_ns / 1e9, FILE_CACHE)
+    if is_compressible(file_path):
+        headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request, headers["ETag"], mtime_ns / 1e9):
+        return not_modified(headers)
+
+    if encoding is not None:
+        path, size = variants[encoding]
+        offset = 0
+        headers["Content-Encoding"] = encoding
+    else:
+        path, offset = await template_storage.aio.locate(rel_path)
+    return RangeFileResponse(
+        path=path,
+        size=size,
+        offset=offset,
+        ranges=requested_ranges(request, size, headers),
+        media_type=media_type,
+        headers=headers,
+        filename=filename
+    )
+
+
 @router.get("/")
-async def list_categories() -> list[str]:
+async def list_categories(request: Request) -> list[str]:
     """List all template categories."""
-    if not TEMPLATE_DIR.exists():
-        return []
-    return [d.name for d in TEMPLATE_DIR.iterdir() if d.is_dir()]
+    root = await template_index.get()
+    return conditional_json(request, [node.name for node in root.entries() if node.is_dir])
 
 
 @router.get("/{category}")
 async def list_storylines(category: str, request: Request) -> list[str]:
     """List all storylines in a category."""
     await _check_category_access(category, request)
-    category_path = TEMPLATE_DIR / category
-    if not category_path.exists():
+    category_node = await template_index.get(category)
+    if category_node is None or not category_node.is_dir:
         raise HTTPException(status_code=404, detail=f"Category '{category}' not found")
-    return [d.name for d in category_path.iterdir() if d.is_dir()]
+    return conditional_json(request, [node.name for node in category_node.entries() if node.is_dir])
 
 
 class StorylineFiles(BaseModel):
@@ -109,26 +197,24 @@ class StorylineFiles(BaseModel):
 async def get_storyline_info(category: str, storyline: str, request: Request) -> TemplateInfo:
     """Get information about a storyline's templates."""
     await _check_category_access(category, request)
-    storyline_path = get_template_path(category, storyline)
-    if not storyline_path.exists():
-        raise HTTPException(status_code=404, detail=f"Storyline '{storyline}' not found in category '{category}'")
+    storyline_node = await _get_storyline_node(category, storyline)
 
     # List tool output directories (o_toolname format)
     tools = []
     file_count = 0
-    for item in storyline_path.iterdir():
-        if item.is_dir() and item.name.startswith("o_"):
+    for item in storyline_node.entries():
+        if item.is_dir and item.name.startswith("o_"):
             tool_name = item.name[2:]  # Remove 'o_' prefix
             tools.append(tool_name)
             # Count files in tool directory
-            file_count += sum(1 for f in item.iterdir() if f.is_file() and f.name != ".gitkeep")
+            file_count += sum(1 for f in item.entries() if not f.is_dir)
 
-    return TemplateInfo(
+    return conditional_json(request, TemplateInfo(
         category=category,
         storyline=storyline,
         tools=sorted(tools),
         file_count=file_count
-    )
+    ))
 
 
 @router.get("/{category}/{storyline}/files")
@@ -140,82 +226,389 @@ async def get_storyline_files(category: str, storyline: str, request: Request) -
     - Files directly in the storyline folder (like o_bandage.png)
     """
     await _check_category_access(category, request)
-    storyline_path = get_template_path(category, storyline)
-    if not storyline_path.exists():
-        raise HTTPException(status_code=404, detail=f"Storyline '{storyline}' not found in category '{category}'")
+    storyline_node = await _get_storyline_node(category, storyline)
+    # The student is about to open these; start fetching them if remote
+    await template_storage.aio.prefetch(f"{category}/{storyline}")
 
     tools: dict[str, list[str]] = {}
     root_files: list[str] = []
 
-    for item in storyline_path.iterdir():
-        if item.name == ".gitkeep":
-            continue
-
-        if item.is_dir() and item.name.startswith("o_"):
+    for item in storyline_node.entries():
+        if item.is_dir and item.name.startswith("o_"):
             # This is a tool output directory
             tool_name = item.name[2:]  # Remove 'o_' prefix
-            files = [f.name for f in item.iterdir() if f.is_file() and f.name != ".gitkeep"]
+            files = [f.name for f in item.entries() if not f.is_dir]
             if files:
                 tools[tool_name] = sorted(files)
-        elif item.is_file() and item.name.startswith("o_"):
+        elif not item.is_dir and item.name.startswith("o_"):
             # This is a root-level output file (like o_bandage.png)
             root_files.append(item.name)
 
-    return StorylineFiles(
+    return conditional_json(request, StorylineFiles(
         category=category,
         storyline=storyline,
         tools=tools,
         root_files=sorted(root_files)
-    )
+    ))
 
 
 class FilesystemStructure(BaseModel):
     """Filesystem structure for a storyline - maps directory paths to file/folder lists."""
     data_dir: str  # The root data directory (e.g., /data/linux_tutorial)
     filesystem: dict[str, list[str]]  # path -> list of files/folders
+    unexpanded: list[str] = []  # Directories listed but not included (fetch with ?path=)
+    next_cursor: Optional[str] = None  # More entries of the requested directory follow
+
+
+def _encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/{category}/{storyline}/filesystem")
-async def get_storyline_filesystem(category: str, storyline: str, request: Request, data_dir: str = "/data") -> FilesystemStructure:
+async def get_storyline_filesystem(
+    category: str,
+    storyline: str,
+    request: Request,
+    data_dir: str = "/data",
+    path: str = "",
+    depth: Optional[int] = Query(None, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+) -> FilesystemStructure:
     """Get the filesystem structure for a storyline.
 
-    Scans the template directory recursively and returns all files and directories
-    that should appear in the terminal filesystem.
+    Without parameters, returns every file and directory that should appear in
+    the terminal filesystem. For lazy loading:
+
+    - `path` lists only that subtree (relative to the storyline folder)
+    - `depth` stops after that many directory levels; deeper directories are
+      listed in `unexpanded`
+    - `limit` pages the `path` directory (continue with `cursor` = the previous
+      `next_cursor`); subdirectories with more than `limit` entries are left
+      in `unexpanded` to be paged on their own
     """
     await _check_category_access(category, request)
-    storyline_path = get_template_path(category, storyline)
-    if not storyline_path.exists():
-        raise HTTPException(status_code=404, detail=f"Storyline '{storyline}' not found in category '{category}'")
+    storyline_node = await _get_storyline_node(category, storyline)
 
     filesystem: dict[str, list[str]] = {}
+    unexpanded: list[str] = []
     root_data_dir = data_dir
     if root_data_dir.rstrip("/") == "/data":
         root_data_dir = f"{data_dir}/{storyline}"
 
-    def scan_directory(path: Path, virtual_path: str):
-        """Recursively scan directory and build filesystem structure."""
+    node = storyline_node
+    virtual_root = root_data_dir
+    for part in Path(path.strip("/")).parts:
+        node = node.child(part)
+        if node is None or not node.is_dir:
+            raise HTTPException(status_code=404, detail=f"Directory '{path}' not found")
+        virtual_root = f"{virtual_root}/{part}"
+
+    def scan_directory(node: TreeNode, virtual_path: str, level: int, items: list[TreeNode]):
+        """Walk the indexed tree and build filesystem structure."""
         entries = []
-        for item in sorted(path.iterdir()):
-            if item.name == ".gitkeep":
-                continue
-            if item.is_dir():
+        for item in items:
+            if item.is_dir:
                 entries.append(item.name + "/")
-                # Recursively scan subdirectory
-                scan_directory(item, f"{virtual_path}/{item.name}")
+                child_path = f"{virtual_path}/{item.name}"
+                children = list(item.entries())
+                if (depth is not None and level >= depth) or (limit is not None and len(children) > limit):
+                    unexpanded.append(child_path)
+                else:
+                    # Recursively scan subdirectory
+                    scan_directory(item, child_path, level + 1, children)
             else:
                 entries.append(item.name)
         filesystem[virtual_path] = entries
 
-    scan_directory(storyline_path, root_data_dir)
+    items = list(node.entries())
+    next_cursor = None
+    if cursor is not None:
+        after = _decode_cursor(cursor)
+        items = [item for item in items if item.name > after]
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = _encode_cursor(items[-1].name)
+
+    scan_directory(node, virtual_root, 1, items)
 
-    return FilesystemStructure(
+    return conditional_json(request, FilesystemStructure(
         data_dir=root_data_dir,
-        filesystem=filesystem
+        filesystem=filesystem,
+        unexpanded=unexpanded,
+        next_cursor=next_cursor
+    ))
+
+
+class FilePreview(BaseModel):
+    """A window of lines from a (possibly compressed) template file."""
+    name: str
+    mode: str  # head, tail, page
+    page: int
+    lines: list[str]
+
+
+# Extensions that can't be previewed as text
+BINARY_EXTENSIONS = {".png", ".pdf", ".zip"}
+
+
+# Views of a file's content sit under "_"-prefixed segments, which are
+# reserved: tool directories are o_<tool>, so a tool named "records"
+# would otherwise be shadowed by /{category}/{storyline}/records/...
+@router.get("/{category}/{storyline}/_preview/{filename:path}")
+async def preview_file(
+    category: str,
+    storyline: str,
+    filename: str,
+    request: Request,
+    mode: str = "head",
+    lines: int = Query(50, ge=1, le=1000),
+    page: int = Query(0, ge=0),
+) -> FilePreview:
+    """Preview part of a storyline file by lines without sending the whole file.
+
+    `filename` is relative to the storyline folder (e.g. input_data/reads_1.fastq.gz).
+    Gzip files are decompressed incrementally, so a preview of a multi-GB FASTQ
+    reads only as much as it returns (tail still has to scan the whole stream).
+    """
+    await _check_category_access(category, request)
+    if mode not in ("head", "tail", "page"):
+        raise HTTPException(status_code=400, detail="mode must be one of: head, tail, page")
+
+    file_path = get_template_path(category, storyline) / filename
+    size, mtime_ns, digest = await _stat_file(file_path, filename)
+
+    if file_path.suffix.lower() in BINARY_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"'{filename}' is a binary file")
+
+    # The preview for a given URL only changes with the file itself
+    headers = validator_headers(_file_etag(size, mtime_ns, digest), mtime_ns / 1e9, LISTING_CACHE)
+    if is_not_modified(request, headers["ETag"], mtime_ns / 1e9):
+        return not_modified(headers)
+
+    if mode == "tail":
+        content = await template_storage.aio.tail_lines(file_path, count=lines)
+    else:
+        start = page * lines if mode == "page" else 0
+        content = await template_storage.aio.read_lines(file_path, start=start, count=lines)
+
+    preview = FilePreview(name=filename, mode=mode, page=page if mode == "page" else 0, lines=content)
+    return JSONResponse(jsonable_encoder(preview), headers=headers)
+
+
+class SequenceRecord(BaseModel):
+    """A FASTA or FASTQ record; sequence and quality may be cut to max_bases."""
+    index: int
+    id: str
+    description: str = ""
+    length: int  # Full sequence length
+    sequence: str
+    quality: Optional[str] = None  # FASTQ only
+    truncated: bool = False
+
+
+class FeatureRecord(BaseModel):
+    """One GFF feature line."""
+    index: int
+    seqid: str
+    source: str
+    type: str
+    start: int
+    end: int
+    score: Optional[float] = None
+    strand: str
+    phase: str
+    attributes: dict[str, str]
+
+
+class RecordPage(BaseModel):
+    """A page of records from a FASTA/FASTQ/GFF template file."""
+    name: str
+    format: str  # fasta, fastq, gff
+    total: int
+    start: int
+    records: list[Union[SequenceRecord, FeatureRecord]]
+    next_start: Optional[int] = None  # Pass as ?start= for the next page
+
+
+@router.get("/{category}/{storyline}/_records/{filename:path}")
+async def get_file_records(
+    category: str,
+    storyline: str,
+    filename: str,
+    request: Request,
+    start: int = Query(0, ge=0),
+    count: int = Query(20, ge=1, le=200),
+    name: Optional[str] = None,
+    max_bases: int = Query(1000, ge=1, le=100_000),
+) -> RecordPage:
+    """Page through the records of a FASTA, FASTQ or GFF file (optionally gzipped).
+
+    `filename` is relative to the storyline folder (e.g. o_unicycler/assembly.fasta).
+    `name` starts the page at a FASTA record id or at the first feature on a
+    GFF seqid. The first request for a file indexes it; later pages read only
+    the records they return.
+    """
+    await _check_category_access(category, request)
+    file_format = record_format(filename)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail=f"'{filename}' is not a FASTA, FASTQ or GFF file")
+
+    file_path = get_template_path(category, storyline) / filename
+    size, mtime_ns, digest = await _stat_file(file_path, filename)
+
+    headers = validator_headers(_file_etag(size, mtime_ns, digest), mtime_ns / 1e9, LISTING_CACHE)
+    if is_not_modified(request, headers["ETag"], mtime_ns / 1e9):
+        return not_modified(headers)
+
+    rel_path = str(file_path.relative_to(TEMPLATE_DIR))
+    index = await template_records.index(rel_path, file_format, size, mtime_ns, digest)
+    if name is not None:
+        if file_format == "fastq":
+            raise HTTPException(status_code=400, detail="Lookup by name is only supported for FASTA and GFF")
+        if name not in index.lookup:
+            raise HTTPException(status_code=404, detail=f"No record named '{name}' in '{filename}'")
+        start = index.lookup[name]
+
+    records = await template_records.records(rel_path, index, start, count, max_bases)
+    next_start = start + len(records)
+    page = RecordPage(
+        name=filename,
+        format=file_format,
+        total=index.count,
+        start=start,
+        records=records,
+        next_start=next_start if next_start < index.count else None,
     )
+    return JSONResponse(jsonable_encoder(page), headers=headers)
+
+
+class SequenceRegion(BaseModel):
+    """A sequence (contig) of an annotation file."""
+    seqid: str
+    length: int
+    features: int
+
+
+class FeatureQuery(BaseModel):
+    """Features of a GFF file matching a region or name query."""
+    name: str
+    total: int  # Matching features, including any beyond limit
+    features: list[FeatureRecord]
+    truncated: bool = False
+    sequences: Optional[list[SequenceRegion]] = None  # Only when neither seqid nor feature name is given
+
+
+@router.get("/{category}/{storyline}/_features/{filename:path}")
+async def get_file_features(
+    category: str,
+    storyline: str,
+    filename: str,
+    request: Request,
+    seqid: Optional[str] = None,
+    start: int = Query(1, ge=1),
+    end: Optional[int] = Query(None, ge=1),
+    name: Optional[str] = None,
+    prefix: bool = False,
+    type: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000),
+) -> FeatureQuery:
+    """Query the features of a GFF file (optionally gzipped) without downloading it.
+
+    `seqid` with `start`/`end` (1-based, inclusive) returns the features
+    overlapping that region, ordered by start; `name` returns features whose
+    Name, gene, locus_tag or ID equals it (or starts with it, with `prefix`),
+    optionally on one seqid. `type` keeps only one feature type (e.g. CDS).
+    With neither, the response lists the file's sequences. The first request
+    for a file builds its index; queries after that don't read the GFF.
+    """
+    await _check_category_access(category, request)
+    if not is_feature_file(filename):
+        raise HTTPException(status_code=400, detail=f"'{filename}' is not a GFF file")
+
+    file_path = get_template_path(category, storyline) / filename
+    size, mtime_ns, digest = await _stat_file(file_path, filename)
+
+    headers = validator_headers(_file_etag(size, mtime_ns, digest), mtime_ns / 1e9, LISTING_CACHE)
+    if is_not_modified(request, headers["ETag"], mtime_ns / 1e9):
+        return not_modified(headers)
+
+    rel_path = str(file_path.relative_to(TEMPLATE_DIR))
+    index = await template_features.index(rel_path, size, mtime_ns, digest)
+    if seqid is not None and seqid not in index.seqids and seqid not in index.metadata["lengths"]:
+        raise HTTPException(status_code=404, detail=f"No sequence '{seqid}' in '{filename}'")
+
+    if seqid is None and name is None:
+        query = FeatureQuery(name=filename, total=0, features=[], sequences=index.sequences())
+        return JSONResponse(jsonable_encoder(query), headers=headers)
+
+    rows = index.query(seqid, start, end, name=name, prefix=prefix, type_=type)
+    query = FeatureQuery(
+        name=filename,
+        total=len(rows),
+        features=index.features(rows[:limit]),
+        truncated=len(rows) > limit,
+    )
+    return JSONResponse(jsonable_encoder(query), headers=headers)
+
+
+class FileAnalysis(BaseModel):
+    """Computed statistics for a template file, ready for the output panel."""
+    name: str
+    kind: str  # assembly (FASTA) or reads (FASTQ)
+    summary: dict[str, str]
+    chart_data: Optional[dict] = None  # CommandOutput.chart_data format
+    charts: list[dict] = []  # Further charts in the same format
+    stats: dict  # The full analysis model
+
+
+@router.get("/{category}/{storyline}/_stats/{filename:path}")
+async def get_file_stats(category: str, storyline: str, filename: str, request: Request) -> FileAnalysis:
+    """Statistics for a template file.
+
+    FASTA assemblies get N50, GC, contig lengths and depth; FASTQ(.gz) reads
+    get FastQC-style per-position quality, GC and length distributions.
+
+    `filename` is relative to the storyline folder (e.g. o_unicycler/assembly.fasta).
+    Results are cached by content hash, so only the first request for a file reads it.
+    """
+    await _check_category_access(category, request)
+    kind = analysis_kind(filename)
+    if kind is None:
+        raise HTTPException(status_code=400, detail=f"No statistics available for '{filename}'")
+
+    file_path = get_template_path(category, storyline) / filename
+    size, mtime_ns, digest = await _stat_file(file_path, filename)
+
+    headers = validator_headers(_file_etag(size, mtime_ns, digest), mtime_ns / 1e9, LISTING_CACHE)
+    if is_not_modified(request, headers["ETag"], mtime_ns / 1e9):
+        return not_modified(headers)
+
+    rel_path = str(file_path.relative_to(TEMPLATE_DIR))
+    try:
+        stats = await template_analyses.get(rel_path, kind, size, mtime_ns, digest)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Could not analyse '{filename}': {e}")
+    analysis = FileAnalysis(
+        name=filename,
+        kind=kind,
+        summary=stats.summary(),
+        chart_data=stats.chart_data(),
+        charts=stats.charts(),
+        stats=stats.model_dump(),
+    )
+    return JSONResponse(jsonable_encoder(analysis), headers=headers)
 
 
 @router.get("/{category}/{storyline}/root/{filename:path}")
-async def get_root_file(category: str, storyline: str, filename: str, request: Request) -> FileResponse:
+async def get_root_file(category: str, storyline: str, filename: str, request: Request) -> Response:
     """Serve a file directly from the storyline folder (not in an o_tool/ subdirectory).
 
     This handles files like o_bandage.png that are stored directly in the storyline folder.
@@ -224,103 +617,34 @@ async def get_root_file(category: str, storyline: str, filename: str, request: R
     storyline_path = get_template_path(category, storyline)
     file_path = storyline_path / filename
 
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"File '{filename}' not found")
-
-    if not file_path.is_file():
-        raise HTTPException(status_code=400, detail=f"'{filename}' is not a file")
-
-    # Determine media type based on extension
-    media_types = {
-        ".html": "text/html",
-        ".txt": "text/plain",
-        ".tsv": "text/tab-separated-values",
-        ".csv": "text/csv",
-        ".json": "application/json",
-        ".fasta": "text/plain",
-        ".fa": "text/plain",
-        ".fna": "text/plain",
-        ".faa": "text/plain",
-        ".fastq": "text/plain",
-        ".fq": "text/plain",
-        ".gff": "text/plain",
-        ".gbk": "text/plain",
-        ".png": "image/png",
-        ".svg": "image/svg+xml",
-        ".pdf": "application/pdf",
-        ".zip": "application/zip",
-    }
-
-    ext = file_path.suffix.lower()
-    media_type = media_types.get(ext, "application/octet-stream")
-
-    return FileResponse(
-        path=file_path,
-        media_type=media_type,
-        filename=filename
-    )
+    return await _serve_file(request, file_path, filename)
 
 
 @router.get("/{category}/{storyline}/{tool}")
 async def list_tool_files(category: str, storyline: str, tool: str, request: Request) -> list[TemplateFile]:
     """List all files in a tool's output directory."""
     await _check_category_access(category, request)
-    tool_path = get_template_path(category, storyline, tool)
-    if not tool_path.exists():
+    tool_node = await template_index.get(category, storyline, f"o_{tool}")
+    if tool_node is None:
         raise HTTPException(status_code=404, detail=f"Tool output 'o_{tool}' not found")
 
-    files = []
-    for item in tool_path.iterdir():
-        if item.name == ".gitkeep":
-            continue
-        files.append(TemplateFile(
+    files = [
+        TemplateFile(
             name=item.name,
-            path=str(item.relative_to(TEMPLATE_DIR)),
-            size=item.stat().st_size if item.is_file() else 0,
-            is_directory=item.is_dir()
-        ))
+            path=f"{category}/{storyline}/o_{tool}/{item.name}",
+            size=0 if item.is_dir else item.size,
+            is_directory=item.is_dir
+        )
+        for item in tool_node.entries()
+    ]
 
-    return sorted(files, key=lambda f: f.name)
+    return conditional_json(request, sorted(files, key=lambda f: f.name))
 
 
 @router.get("/{category}/{storyline}/{tool}/{filename:path}")
-async def get_template_file(category: str, storyline: str, tool: str, filename: str, request: Request) -> FileResponse:
+async def get_template_file(category: str, storyline: str, tool: str, filename: str, request: Request) -> Response:
     """Serve a specific template file."""
     await _check_category_access(category, request)
     file_path = get_template_path(category, storyline, tool, filename)
 
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"File '{filename}' not found")
-
-    if not file_path.is_file():
-        raise HTTPException(status_code=400, detail=f"'{filename}' is not a file")
-
-    # Determine media type based on extension
-    media_types = {
-        ".html": "text/html",
-        ".txt": "text/plain",
-        ".tsv": "text/tab-separated-values",
-        ".csv": "text/csv",
-        ".json": "application/json",
-        ".fasta": "text/plain",
-        ".fa": "text/plain",
-        ".fna": "text/plain",
-        ".faa": "text/plain",
-        ".fastq": "text/plain",
-        ".fq": "text/plain",
-        ".gff": "text/plain",
-        ".gbk": "text/plain",
-        ".png": "image/png",
-        ".svg": "image/svg+xml",
-        ".pdf": "application/pdf",
-        ".zip": "application/zip",
-    }
-
-    ext = file_path.suffix.lower()
-    media_type = media_types.get(ext, "application/octet-stream")
-
-    return FileResponse(
-        path=file_path,
-        media_type=media_type,
-        filename=filename
-    )
+    return await _serve_file(request, file_path, filename)
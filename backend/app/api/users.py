@@ -9,21 +9,28 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import (
-    hash_password,
-    verify_password,
+    passwords,
     create_access_token,
     create_refresh_token,
     create_reset_token,
     decode_reset_token,
     decode_token,
     get_current_user,
+    get_current_user_for_update,
+    invalidate_user,
+    revoke_tokens,
+    check_not_revoked,
 )
 from app.database import get_db
 from app.email import FRONTEND_URL, send_password_reset
 from app.models import User, UserProgress
+from app.services.progress_buffer import progress_buffer
 
 router = APIRouter()
 
+# Narratives one progress batch may update
+MAX_PROGRESS_BATCH = 100
+
 # Path to the registered users file
 USERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "registered_users.txt")
 
@@ -99,6 +106,14 @@ class ProgressUpdate(BaseModel):
     completed_steps: list[int] = []
 
 
+class NarrativeProgressUpdate(ProgressUpdate):
+    narrative_id: str
+
+
+class ProgressBatch(BaseModel):
+    updates: list[NarrativeProgressUpdate]
+
+
 # ---------- Endpoints ----------
 
 @router.post("/register", response_model=AuthResponse)
@@ -111,7 +126,7 @@ async def register(body: UserCreate, db: Annotated[AsyncSession, Depends(get_db)
     user = User(
         email=body.email,
         username=body.username,
-        password_hash=hash_password(body.password),
+        password_hash=await passwords.hash(body.password),
     )
     db.add(user)
     await db.commit()
@@ -135,7 +150,7 @@ async def login(body: LoginRequest, db: Annotated[AsyncSession, Depends(get_db)]
         select(User).where((User.email == body.identifier) | (User.username == body.identifier))
     )
     user = result.scalar_one_or_none()
-    if not user or not verify_password(body.password, user.password_hash):
+    if not user or not await passwords.verify(body.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email/username or password")
 
     return AuthResponse(
@@ -155,8 +170,10 @@ async def refresh_token(body: RefreshRequest, db: Annotated[AsyncSession, Depend
 
     user_id = payload.get("sub")
     result = await db.execute(select(User).where(User.id == user_id))
-    if not result.scalar_one_or_none():
+    user = result.scalar_one_or_none()
+    if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    check_not_revoked(payload, user)
 
     return TokenResponse(
         access_token=create_access_token(user_id),
@@ -182,8 +199,10 @@ async def reset_password(body: ResetPasswordRequest, db: Annotated[AsyncSession,
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
-    user.password_hash = hash_password(body.new_password)
+    user.password_hash = await passwords.hash(body.new_password)
+    revoke_tokens(user)
     await db.commit()
+    invalidate_user(user.id)
     return {"message": "Password has been reset successfully."}
 
 
@@ -202,14 +221,23 @@ def _user_response(user: User) -> UserResponse:
 @router.post("/change-password")
 async def change_password(
     body: ChangePasswordRequest,
-    user: Annotated[User, Depends(get_current_user)],
+    user: Annotated[User, Depends(get_current_user_for_update)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    if not verify_password(body.current_password, user.password_hash):
+    if not await passwords.verify(body.current_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
-    user.password_hash = hash_password(body.new_password)
+    user.password_hash = await passwords.hash(body.new_password)
+    # Sign out other sessions; this one continues with fresh tokens
+    revoke_tokens(user)
     await db.commit()
-    return {"message": "Password changed successfully."}
+    invalidate_user(user.id)
+    return {
+        "message": "Password changed successfully.",
+        "tokens": TokenResponse(
+            access_token=create_access_token(user.id),
+            refresh_token=create_refresh_token(user.id),
+        ),
+    }
 
 
 @router.get("/me", response_model=UserResponse)
@@ -217,24 +245,50 @@ async def get_me(user: Annotated[User, Depends(get_current_user)]):
     return _user_response(user)
 
 
+def _progress_response(narrative_id: str, progress) -> ProgressResponse:
+    return ProgressResponse(
+        narrative_id=narrative_id,
+        current_step=progress.current_step,
+        completed_steps=progress.completed_steps,
+        started_at=progress.started_at.isoformat(),
+        last_activity=progress.last_activity.isoformat(),
+    )
+
+
 @router.get("/me/progress", response_model=list[ProgressResponse])
 async def get_progress(
     user: Annotated[User, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
+    pending = progress_buffer.pending_for(user.id)
     result = await db.execute(
         select(UserProgress).where(UserProgress.user_id == user.id)
     )
     rows = result.scalars().all()
+    responses = []
+    for r in rows:
+        progress_buffer.remember_started(user.id, r.narrative_id, r.started_at)
+        update = pending.pop(r.narrative_id, None)
+        if update is not None:
+            # Unsaved progress wins; the row keeps when the narrative was started
+            response = _progress_response(r.narrative_id, update)
+            response.started_at = r.started_at.isoformat()
+            responses.append(response)
+        else:
+            responses.append(_progress_response(r.narrative_id, r))
+    responses.extend(_progress_response(narrative_id, update) for narrative_id, update in pending.items())
+    return responses
+
+
+def _buffer_progress(user_id: str, updates: list[tuple[str, ProgressUpdate]]) -> list[ProgressResponse]:
+    """Queue progress updates for the next flush and return the resulting progress."""
+    now = datetime.now(timezone.utc)
     return [
-        ProgressResponse(
-            narrative_id=r.narrative_id,
-            current_step=r.current_step,
-            completed_steps=r.completed_steps,
-            started_at=r.started_at.isoformat(),
-            last_activity=r.last_activity.isoformat(),
+        _progress_response(
+            narrative_id,
+            progress_buffer.put(user_id, narrative_id, body.current_step, body.completed_steps, now),
         )
-        for r in rows
+        for narrative_id, body in updates
     ]
 
 
@@ -243,39 +297,16 @@ async def update_progress(
     narrative_id: str,
     body: ProgressUpdate,
     user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[AsyncSession, Depends(get_db)],
 ):
-    result = await db.execute(
-        select(UserProgress).where(
-            UserProgress.user_id == user.id,
-            UserProgress.narrative_id == narrative_id,
-        )
-    )
-    progress = result.scalar_one_or_none()
-
-    now = datetime.now(timezone.utc)
-    if progress is None:
-        progress = UserProgress(
-            user_id=user.id,
-            narrative_id=narrative_id,
-            current_step=body.current_step,
-            completed_steps=body.completed_steps,
-            started_at=now,
-            last_activity=now,
-        )
-        db.add(progress)
-    else:
-        progress.current_step = body.current_step
-        progress.completed_steps = body.completed_steps
-        progress.last_activity = now
+    return _buffer_progress(user.id, [(narrative_id, body)])[0]
 
-    await db.commit()
-    await db.refresh(progress)
 
-    return ProgressResponse(
-        narrative_id=progress.narrative_id,
-        current_step=progress.current_step,
-        completed_steps=progress.completed_steps,
-        started_at=progress.started_at.isoformat(),
-        last_activity=progress.last_activity.isoformat(),
-    )
+@router.post("/me/progress/batch", response_model=list[ProgressResponse])
+async def update_progress_batch(
+    body: ProgressBatch,
+    user: Annotated[User, Depends(get_current_user)],
+):
+    """Update several narratives at once; later entries for a narrative win."""
+    if len(body.updates) > MAX_PROGRESS_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PROGRESS_BATCH} updates per batch")
+    return _buffer_progress(user.id, [(u.narrative_id, u) for u in body.updates])
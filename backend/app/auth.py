@@ -1,7 +1,13 @@
 """Authentication utilities — JWT tokens and password hashing."""
+import asyncio
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from functools import partial
+from typing import Annotated, Any, Callable, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -10,7 +16,8 @@ from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.cache import BoundedCache
+from app.database import async_session, get_db
 from app.models import User
 
 SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-production-use-a-real-secret")
@@ -18,7 +25,24 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# Authenticated requests reuse a user row loaded this recently
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+_users = BoundedCache("users", max_entries=int(os.getenv("USER_CACHE_ENTRIES", "10000")), ttl=USER_CACHE_TTL_SECONDS)
+# User loads in progress, shared by concurrent requests for the same user
+_loading: dict[str, asyncio.Future] = {}
+
+# SHA-256 of a verified token -> its claims, until the token expires
+_verified_tokens = BoundedCache("tokens", max_entries=int(os.getenv("TOKEN_CACHE_ENTRIES", "10000")))
+# user id -> time.time() before which their tokens are rejected
+_revoked_before: dict[str, float] = {}
+_revoked_lock = threading.Lock()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Threads hashing passwords; requests beyond threads + queue are refused
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
 
 
@@ -30,6 +54,74 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def _timed(func: Callable[..., Any], submitted: float, *args: Any) -> tuple[float, Any]:
+    return time.perf_counter() - submitted, func(*args)
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a dedicated thread pool.
+
+    Each hash takes ~250 ms of CPU; on the loop it would stall every
+    websocket terminal for that long. bcrypt releases the GIL, so the
+    pool threads run alongside the loop. At most `threads` hashes run at
+    once and `max_queue` more may wait; beyond that requests get a 503
+    instead of queueing for seconds. Queue times are reported at
+    /health/passwords.
+    """
+
+    def __init__(self, threads: int, max_queue: int):
+        self.threads = threads
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="password-hash")
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.threads + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            waited, result = await loop.run_in_executor(
+                self._executor, partial(_timed, func, time.perf_counter(), *args)
+            )
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.queue_seconds_total += waited
+        self.queue_seconds_max = max(self.queue_seconds_max, waited)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "threads": self.threads,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_ms_avg": round(self.queue_seconds_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "queue_ms_max": round(self.queue_seconds_max * 1000, 2),
+        }
+
+
+passwords = PasswordHasher(PASSWORD_HASH_THREADS, PASSWORD_HASH_QUEUE)
+
+
 RESET_TOKEN_EXPIRE_MINUTES = 15
 
 
@@ -52,38 +144,159 @@ def decode_reset_token(token: str) -> str:
 
 
 def create_access_token(subject: str) -> str:
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    return jwt.encode({"sub": subject, "exp": expire, "type": "access"}, SECRET_KEY, algorithm=ALGORITHM)
+    # iat keeps sub-second precision so tokens issued right after a revocation stay valid
+    now = time.time()
+    expire = now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    return jwt.encode({"sub": subject, "iat": now, "exp": expire, "type": "access"}, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def create_refresh_token(subject: str) -> str:
-    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    return jwt.encode({"sub": subject, "exp": expire, "type": "refresh"}, SECRET_KEY, algorithm=ALGORITHM)
+    now = time.time()
+    expire = now + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    return jwt.encode({"sub": subject, "iat": now, "exp": expire, "type": "refresh"}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def utc_timestamp(value: Optional[datetime]) -> Optional[float]:
+    """Epoch seconds of a stored datetime (SQLite hands back naive ones, stored in UTC)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def revoke_tokens(user: User):
+    """Reject every token issued to the user until now (e.g. after a password change).
+
+    Sets User.tokens_valid_after, which the caller commits; it is checked
+    against the cached user, so it survives restarts and holds for every
+    worker (after at most USER_CACHE_TTL_SECONDS). This process also
+    rejects the tokens immediately in decode_token.
+    """
+    now = time.time()
+    user.tokens_valid_after = datetime.fromtimestamp(now, timezone.utc)
+    with _revoked_lock:
+        for stale in [uid for uid, at in _revoked_before.items() if at < now - REFRESH_TOKEN_EXPIRE_DAYS * 86400]:
+            del _revoked_before[stale]
+        _revoked_before[user.id] = now
+
+
+def check_not_revoked(payload: dict, user: User):
+    """Raise 401 if the token was issued before the user's tokens were revoked."""
+    valid_after = utc_timestamp(user.tokens_valid_after)
+    if valid_after is not None and payload.get("iat", 0) <= valid_after:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 
 def decode_token(token: str) -> dict:
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except JWTError:
+    """Verified claims of a token (shared with the cache: do not modify).
+
+    Repeat tokens are a cache lookup; entries expire with the token.
+    Revocations made by this process are checked on every call; callers
+    that load the user also apply check_not_revoked().
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            _verified_tokens.set(key, payload, ttl=ttl)
+
+    revoked_before = _revoked_before.get(payload.get("sub"))
+    if revoked_before is not None and payload.get("iat", 0) <= revoked_before:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
+            detail="Token has been revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[AsyncSession, Depends(get_db)],
-) -> User:
-    """Dependency: extract and validate user from JWT."""
+def _access_token_payload(token: str) -> dict:
     payload = decode_token(token)
-    user_id: str | None = payload.get("sub")
-    if user_id is None or payload.get("type") != "access":
+    if payload.get("sub") is None or payload.get("type") != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return payload
+
+
+async def _fetch_user(user_id: str) -> Optional[User]:
+    async with async_session() as db:
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalar_one_or_none()
+
+
+def _user_loaded(user_id: str, task: asyncio.Future):
+    # A load that was invalidated while running must not repopulate the cache
+    if _loading.get(user_id) is not task:
+        return
+    del _loading[user_id]
+    if not task.cancelled() and task.exception() is None and task.result() is not None:
+        _users.set(user_id, task.result())
+
+
+async def load_user(user_id: str) -> Optional[User]:
+    """A detached, read-only User, cached for USER_CACHE_TTL_SECONDS.
+
+    Concurrent misses for the same user share one query. Handlers that
+    modify the user must load it in their own session instead (see
+    get_current_user_for_update) and call invalidate_user() after commit.
+    """
+    user = _users.get(user_id)
+    if user is not None:
+        return user
+
+    task = _loading.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_user(user_id))
+        _loading[user_id] = task
+        task.add_done_callback(lambda t: _user_loaded(user_id, t))
+    return await asyncio.shield(task)
 
-    result = await db.execute(select(User).where(User.id == user_id))
+
+def invalidate_user(user_id: str):
+    """Drop a user from the cache after their row was changed and committed."""
+    _loading.pop(user_id, None)
+    _users.pop(user_id)
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
+    """Dependency: extract and validate user from JWT (cached, read-only)."""
+    payload = _access_token_payload(token)
+    user = await load_user(payload["sub"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    check_not_revoked(payload, user)
+    return user
+
+
+async def get_admin_user(user: Annotated[User, Depends(get_current_user)]) -> User:
+    """Dependency: the current user, who must be an admin (403 otherwise)."""
+    if user.email not in User.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+
+async def get_current_user_for_update(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> User:
+    """Dependency: the current user loaded in the request's session, for handlers that modify it."""
+    payload = _access_token_payload(token)
+    result = await db.execute(select(User).where(User.id == payload["sub"]))
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    check_not_revoked(payload, user)
     return user
@@ -0,0 +1,201 @@
+"""
+Bounded in-process caches with size accounting and file invalidation.
+
+Every cache is bounded by total bytes and/or entry count and evicts the
+least recently used entries first. Entries can carry a TTL and a list of
+files they were built from; a file whose mtime or size changed (or that
+appeared or disappeared) invalidates the entry on its next read, so
+edited content is picked up without a restart.
+
+File checks are rate-limited per entry (CHECK_INTERVAL_SECONDS) to keep
+hits to a dict lookup plus, at most, a few stat() calls per interval.
+
+All caches register themselves in CACHES so their hit/miss counters can
+be reported together (see /health/caches).
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Optional
+import os
+import threading
+import time
+
+# How often an entry re-stats the files it depends on
+CHECK_INTERVAL_SECONDS = 2.0
+
+CACHES: dict[str, "BoundedCache"] = {}
+
+
+def _file_signature(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "watch", "checked_at")
+
+    def __init__(self, value, size, expires_at, watch, checked_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.watch = watch
+        self.checked_at = checked_at
+
+
+class BoundedCache:
+    """Thread-safe LRU cache with byte accounting, TTL and file watching."""
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        check_interval: float = CHECK_INTERVAL_SECONDS,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live cached value, or default on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_fresh(entry, now):
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int = 0,
+        ttl: Optional[float] = None,
+        watch: Iterable[Path] = (),
+    ):
+        """
+        Cache a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            size: Approximate resident size in bytes, used for the byte bound
+            ttl: Seconds until expiry (defaults to the cache's TTL)
+            watch: Files the value was built from; changes invalidate it
+        """
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        watched = tuple((Path(p), _file_signature(Path(p))) for p in watch)
+        entry = _Entry(value, size, now + ttl if ttl else None, watched, now)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Never cacheable; don't flush everything else trying
+                return
+            self._entries[key] = entry
+            self.total_bytes += size
+            self._evict()
+
+    def resize(self, key: Hashable, value: Any, size: int):
+        """Re-charge an entry that grew (or shrank) in place, evicting to stay in budget.
+
+        Ignored if the key now holds a different value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.value is not value or entry.size == size:
+                return
+            self.total_bytes += size - entry.size
+            entry.size = size
+            self._evict()
+
+    def pop(self, key: Hashable) -> Any:
+        """Remove and return an entry (write-through invalidation)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            self.invalidations += 1
+            return entry.value
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _is_fresh(self, entry: _Entry, now: float) -> bool:
+        if entry.expires_at is not None and now >= entry.expires_at:
+            return False
+        if entry.watch and now - entry.checked_at >= self.check_interval:
+            entry.checked_at = now
+            for path, signature in entry.watch:
+                if _file_signature(path) != signature:
+                    return False
+        return True
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+def cache_stats() -> dict[str, dict]:
+    """Counters for every registered cache."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def env_megabytes(name: str, default: int) -> int:
+    """Read a cache budget in MiB from the environment, returned in bytes."""
+    return int(os.getenv(name, str(default))) * 1024 * 1024
@@ -26,11 +26,27 @@ async def get_db():
         yield session
 
 
+def _add_missing_columns(conn):
+    """Add nullable columns introduced after a table was created (create_all skips existing tables)."""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
 async def init_db():
-    """Create all tables."""
+    """Create all tables (and columns added since they were created)."""
     async with engine.begin() as conn:
         from app.models import User, UserProgress  # noqa: F401
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
 
 
 async def seed_admin_account():
@@ -0,0 +1,20 @@
+"""
+Subscription checks for paid template content.
+
+Paid requests are answered from the cached user row (load_user), so a
+check costs one query per USER_CACHE_TTL_SECONDS per user. The payment
+handlers call invalidate_user() after committing a change, which this
+worker sees at once and every other worker within that TTL.
+"""
+from typing import Optional
+
+from app.auth import check_not_revoked, load_user
+
+
+async def has_pro_access(payload: dict) -> Optional[bool]:
+    """Whether a decoded access token's user has pro access (None: unknown user)."""
+    user = await load_user(payload["sub"])
+    if user is None:
+        return None
+    check_not_revoked(payload, user)
+    return user.is_pro
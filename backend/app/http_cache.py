@@ -0,0 +1,120 @@
+"""
+HTTP validators and conditional responses.
+
+Routes attach a strong ETag (and, for files, Last-Modified) plus a
+Cache-Control policy. A request whose If-None-Match / If-Modified-Since
+still matches gets an empty 304 before any file is opened or any body
+is sent.
+
+ETags for files come from the template index (content hash when the
+store is content-addressed, otherwise size and mtime), so validating a
+cached copy costs a dict lookup. JSON bodies are hashed
+after serialization, which is cheap for listings and catalogue data.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Optional
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+# Cache-Control policies
+# Listings change whenever templates are added; always revalidate (cheap 304)
+LISTING_CACHE = "private, no-cache"
+# Template outputs: reuse for an hour, then revalidate
+FILE_CACHE = "private, max-age=3600"
+# Narratives and tool catalogue are defined in code and change only on deploy
+CATALOGUE_CACHE = "public, max-age=300, must-revalidate"
+
+
+def file_etag(size: int, mtime_ns: int, encoding: Optional[str] = None) -> str:
+    """Strong ETag for a file version (and content coding, if compressed)."""
+    if encoding:
+        return f'"{mtime_ns:x}-{size:x}-{encoding}"'
+    return f'"{mtime_ns:x}-{size:x}"'
+
+
+def digest_etag(digest: str, encoding: Optional[str] = None) -> str:
+    """Strong ETag from a SHA-256 hex digest (and content coding, if compressed)."""
+    if encoding:
+        return f'"{digest[:32]}-{encoding}"'
+    return f'"{digest[:32]}"'
+
+
+def content_etag(data: bytes) -> str:
+    """Strong ETag from a content hash."""
+    return digest_etag(hashlib.sha256(data).hexdigest())
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: ignore W/ prefixes
+    if header.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in header.split(","))
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[float] = None) -> bool:
+    """
+    True if the client's cached copy is still current.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    the request carries no If-None-Match (RFC 9110 13.2.2).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(last_modified) <= since
+    return False
+
+
+def validator_headers(
+    etag: Optional[str],
+    last_modified: Optional[float] = None,
+    cache_control: Optional[str] = None,
+) -> dict[str, str]:
+    """ETag / Last-Modified / Cache-Control headers for a response."""
+    headers = {}
+    if etag is not None:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    if cache_control is not None:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    """Empty 304 carrying the same validators as a full response would."""
+    return Response(status_code=304, headers=headers)
+
+
+def conditional_json(request: Request, content: Any, cache_control: str = LISTING_CACHE) -> Response:
+    """
+    Serialize content as JSON with a content-hash ETag.
+
+    Returns 304 if the client already holds this exact body.
+    """
+    body = json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    headers = validator_headers(content_etag(body), cache_control=cache_control)
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,224 @@
+"""
+HTTP byte-range responses for file downloads.
+
+Supports single and multiple ranges (206 Partial Content, multipart/
+byteranges for more than one), If-Range, and 416 for unsatisfiable
+requests, independently of the installed Starlette version.
+
+Bodies are sent with the ASGI zero-copy extensions when the server
+offers them: ``http.response.pathsend`` for whole files and
+``http.response.zerocopysend`` (sendfile) for ranges. Otherwise ranges
+are read with pread() on the file I/O pool, a chunk at a time, so a
+slice of a multi-GB FASTQ only reads that slice.
+"""
+from typing import Optional
+from urllib.parse import quote
+import os
+import secrets
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.storage.files import run_io
+
+CHUNK_SIZE = 256 * 1024
+
+# More ranges than this in one request are ignored (the whole file is sent)
+MAX_RANGES = 16
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[list[tuple[int, int]]]:
+    """
+    Parse a Range header into sorted, merged (start, end) pairs, end exclusive.
+
+    Returns None when the header should be ignored (absent, not bytes,
+    malformed, or too many ranges), in which case the full file is sent.
+    Raises 416 if no requested range overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    parts = spec.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, dash, last = part.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) + 1 if last else size
+                if last and end <= start:
+                    return None
+            else:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size)))
+
+    if not ranges:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request: Request, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """True unless an If-Range header names a different version of the file."""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("W/", '"')):
+        # Strong comparison only: a weak validator never matches
+        return etag is not None and if_range == etag
+    return last_modified is not None and if_range == last_modified
+
+
+def requested_ranges(request: Request, size: int, headers: dict[str, str]) -> Optional[list[tuple[int, int]]]:
+    """Ranges to serve for a request, or None to send the whole file."""
+    if request.method not in ("GET", "HEAD") or "range" not in request.headers:
+        return None
+    if not if_range_matches(request, headers.get("ETag"), headers.get("Last-Modified")):
+        return None
+    return parse_range(request.headers["range"], size)
+
+
+class RangeFileResponse(Response):
+    """
+    A file response that honours byte ranges.
+
+    Args:
+        path: File to send
+        size: File size (already known from the caller's stat)
+        offset: Where the file's bytes start within path (for files packed
+            into a larger one, e.g. a storyline bundle)
+        ranges: From requested_ranges(); None sends the whole file
+        media_type: Content type of the file
+        headers: Extra headers (validators, Cache-Control, ...)
+        filename: Sets Content-Disposition: attachment if given
+    """
+
+    def __init__(
+        self,
+        path: os.PathLike,
+        size: int,
+        ranges: Optional[list[tuple[int, int]]] = None,
+        offset: int = 0,
+        media_type: Optional[str] = None,
+        headers: Optional[dict[str, str]] = None,
+        filename: Optional[str] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.offset = offset
+        self.ranges = ranges
+        self.media_type = media_type or "application/octet-stream"
+        self.background = None
+        self.status_code = 206 if ranges else 200
+        self.init_headers(headers)
+        self.headers["accept-ranges"] = "bytes"
+        if filename is not None:
+            quoted = quote(filename)
+            if quoted != filename:
+                self.headers.setdefault("content-disposition", f"attachment; filename*=utf-8''{quoted}")
+            else:
+                self.headers.setdefault("content-disposition", f'attachment; filename="{filename}"')
+
+        self._parts: list[tuple[bytes, int, int]] = []
+        if not ranges:
+            self.headers["content-length"] = str(size)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            self.headers["content-length"] = str(end - start)
+        else:
+            boundary = secrets.token_hex(16)
+            part_type = self.headers["content-type"]
+            for start, end in ranges:
+                part_header = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {part_type}\r\n"
+                    f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self._parts.append((part_header, start, end))
+            self._closing = f"--{boundary}--\r\n".encode("latin-1")
+            length = sum(len(h) + (end - start) + 2 for h, start, end in self._parts) + len(self._closing)
+            self.headers["content-length"] = str(length)
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        extensions = scope.get("extensions") or {}
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if not self.ranges and not self.offset and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        zerocopy = "http.response.zerocopysend" in extensions
+        f = await run_io(open, self.path, "rb")
+        try:
+            if not self.ranges:
+                await self._send_range(send, f, 0, self.size, zerocopy, more_body=False)
+            elif not self._parts:
+                start, end = self.ranges[0]
+                await self._send_range(send, f, start, end, zerocopy, more_body=False)
+            else:
+                for part_header, start, end in self._parts:
+                    await send({"type": "http.response.body", "body": part_header, "more_body": True})
+                    await self._send_range(send, f, start, end, zerocopy, more_body=True)
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+                await send({"type": "http.response.body", "body": self._closing, "more_body": False})
+        finally:
+            await run_io(f.close)
+
+    async def _send_range(self, send: Send, f, start: int, end: int, zerocopy: bool, more_body: bool):
+        if zerocopy:
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": f,
+                "offset": self.offset + start,
+                "count": end - start,
+                "more_body": more_body,
+            })
+            return
+
+        fd = f.fileno()
+        pos = start
+        while True:
+            chunk = b""
+            if pos < end:
+                chunk = await run_io(os.pread, fd, min(CHUNK_SIZE, end - pos), self.offset + pos)
+            pos += len(chunk)
+            # An empty read means the file shrank underneath us; end the body rather than hang
+            done = not chunk or pos >= end
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body or not done})
+            if done:
+                break
@@ -1,7 +1,7 @@
 """
 BioLearn - Bioinformatics Learning Platform API
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
@@ -9,6 +9,7 @@ import logging
 import os
 
 from app.api import router as api_router
+from app.auth import get_admin_user
 from app.websocket import ConnectionManager
 
 # Configure logging
@@ -30,8 +31,27 @@ async def lifespan(app: FastAPI):
     logger.info("Admin account seeded.")
     from app.scheduler import scheduler_loop
     scheduler_task = asyncio.create_task(scheduler_loop())
+    from app.services.template_index import template_index
+    await template_index.load()
+    index_task = asyncio.create_task(template_index.refresh_loop())
+    from app.services.progress_buffer import progress_buffer
+    progress_task = asyncio.create_task(progress_buffer.run())
+    from app.storage.features import template_features
+    from app.storage.precompress import template_precompressor
+    ingest_tasks = []
+    # Building sidecars and feature indexes reads every file; for a remote store that would download it all
+    if not template_precompressor.storage.is_remote:
+        # On its own thread: a long build mustn't hold a file I/O pool thread
+        ingest_tasks.append(asyncio.create_task(asyncio.to_thread(template_precompressor.build)))
+        ingest_tasks.append(asyncio.create_task(template_features.storage.aio.run(template_features.build)))
     yield
+    index_task.cancel()
+    for task in ingest_tasks:
+        task.cancel()
     scheduler_task.cancel()
+    # Write progress still buffered in memory
+    progress_buffer.stop()
+    await progress_task
     logger.info("Shutting down BioLearn API server...")
 
 
@@ -73,6 +93,27 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/caches", dependencies=[Depends(get_admin_user)])
+async def cache_health():
+    """Size and hit/miss counters for the in-process caches (admin only)."""
+    from app.cache import cache_stats
+    return cache_stats()
+
+
+@app.get("/health/passwords", dependencies=[Depends(get_admin_user)])
+async def password_hashing_health():
+    """Load and queue times of the password hashing pool (admin only)."""
+    from app.auth import passwords
+    return passwords.stats()
+
+
+@app.get("/health/progress", dependencies=[Depends(get_admin_user)])
+async def progress_buffer_health():
+    """Pending and written counts of the progress write-behind buffer (admin only)."""
+    from app.services.progress_buffer import progress_buffer
+    return progress_buffer.stats()
+
+
 @app.websocket("/ws/terminal/{session_id}")
 async def websocket_terminal(websocket: WebSocket, session_id: str):
     """
@@ -26,6 +26,8 @@ class User(Base):
     group_owner_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey("users.id"), nullable=True)
     expiry_notified_7d: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     expiry_notified_1d: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Tokens issued at or before this time are rejected (set on password change/reset)
+    tokens_valid_after: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     progress: Mapped[list["UserProgress"]] = relationship(back_populates="user", cascade="all, delete-orphan")
 
@@ -37,9 +39,13 @@ class User(Base):
             return True
         if self.subscription_tier != "pro":
             return False
-        if self.subscription_expires_at is None:
+        expires_at = self.subscription_expires_at
+        if expires_at is None:
             return False
-        return self.subscription_expires_at > datetime.now(timezone.utc)
+        if expires_at.tzinfo is None:
+            # SQLite hands back naive datetimes; they are stored in UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at > datetime.now(timezone.utc)
 
 
 class UserProgress(Base):
@@ -0,0 +1,141 @@
+"""
+Cached analyses of template files (assembly and read statistics).
+
+An analysis reads a whole file once and reduces it to a small pydantic
+model, so results are kept as JSON sidecars under ANALYSIS_CACHE_DIR,
+keyed by the file's SHA-256 (``objects/ab/<sha>.<kind>.json``): the same
+assembly shipped in several storylines is analysed once, and an edited
+file gets a new key instead of a stale result. Content-addressed stores
+know each file's hash already; for plain disk it is computed on the
+file I/O pool the first time a file version is seen.
+
+Recent results are also held in memory (BoundedCache "analyses"), and
+concurrent requests for the same file share one computation. Analyses
+run on the file I/O pool, or with ANALYSIS_PROCESSES > 0 in a process
+pool of that size, so e.g. R1 and R2 of a run are profiled on separate
+cores.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+import asyncio
+import logging
+import os
+import threading
+
+from pydantic import BaseModel, ValidationError
+
+from app.cache import BoundedCache, env_megabytes
+from app.services.assembly_stats import AssemblyStats, compute_assembly_stats
+from app.services.read_stats import ReadStats, compute_read_stats
+from app.storage.files import FileStorage, storyline_storage, template_storage
+from app.storage.records import FASTA_EXTENSIONS, FASTQ_EXTENSIONS
+from app.storage.streaming import sha256_file
+
+logger = logging.getLogger(__name__)
+
+# Analysis kind -> (compute(source) -> model, model class)
+ANALYSES: dict[str, tuple[Callable, type[BaseModel]]] = {
+    "assembly": (compute_assembly_stats, AssemblyStats),
+    "reads": (compute_read_stats, ReadStats),
+}
+
+# Worker processes for analyses (0: run them on the file I/O pool threads)
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", "0"))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _default_analysis_cache_dir() -> Path:
+    return Path(__file__).parent.parent.parent / ".analysis_cache"
+
+
+ANALYSIS_CACHE_DIR = Path(os.getenv("ANALYSIS_CACHE_DIR") or _default_analysis_cache_dir())
+
+
+def analysis_kind(name: str) -> Optional[str]:
+    """The analysis available for a file name, if any (.gz is looked through)."""
+    lower = name.lower()
+    if lower.endswith(".gz"):
+        lower = lower[:-3]
+    suffix = Path(lower).suffix
+    if suffix in FASTA_EXTENSIONS:
+        return "assembly"
+    if suffix in FASTQ_EXTENSIONS:
+        return "reads"
+    return None
+
+
+def _run_analysis(compute: Callable, source):
+    """Run compute(source) in the analysis process pool if one is configured."""
+    global _process_pool
+    # Only local paths can be handed to another process (bundle entries are open files)
+    if ANALYSIS_PROCESSES <= 0 or not isinstance(source, Path):
+        return compute(source)
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=ANALYSIS_PROCESSES)
+    return _process_pool.submit(compute, source).result()
+
+
+class AnalysisCache:
+    """Computes, persists and caches file analyses for a FileStorage tree."""
+
+    def __init__(self, storage: FileStorage, cache_dir: Path, name: str = "analyses"):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        # (kind, relative path, size, mtime_ns) -> model
+        self._results = BoundedCache(name, max_bytes=env_megabytes("ANALYSIS_CACHE_MB", 16))
+        # Computations in progress, shared by concurrent requests for the same file
+        self._running: dict = {}
+
+    def result_path(self, digest: str, kind: str) -> Path:
+        return self.cache_dir / "objects" / digest[:2] / f"{digest}.{kind}.json"
+
+    def load_or_compute(self, rel_path: str, kind: str, digest: Optional[str]) -> BaseModel:
+        """Blocking: read the result from disk if present, else compute and save it."""
+        compute, model = ANALYSES[kind]
+        source = self.storage.source(rel_path)
+        if digest is None:
+            digest = sha256_file(source)
+
+        path = self.result_path(digest, kind)
+        try:
+            return model.model_validate_json(path.read_bytes())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValidationError) as e:
+            logger.warning(f"Ignoring unreadable {kind} result for {rel_path}: {e}")
+
+        result = _run_analysis(compute, source)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_text(result.model_dump_json())
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Could not save {kind} result for {rel_path}: {e}")
+        logger.info(f"Computed {kind} analysis of {rel_path}")
+        return result
+
+    async def get(self, rel_path: str, kind: str, size: int, mtime_ns: int, digest: Optional[str] = None) -> BaseModel:
+        """The analysis of a file version, computing it at most once at a time."""
+        key = (kind, rel_path, size, mtime_ns)
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        task = self._running.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.storage.aio.run(self.load_or_compute, rel_path, kind, digest))
+            self._running[key] = task
+            task.add_done_callback(lambda _: self._running.pop(key, None))
+        result = await asyncio.shield(task)
+        self._results.set(key, result, size=len(result.model_dump_json()))
+        return result
+
+
+template_analyses = AnalysisCache(template_storage, ANALYSIS_CACHE_DIR)
+# Shares sidecars with template_analyses: the same assembly is analysed once
+storyline_analyses = AnalysisCache(storyline_storage, ANALYSIS_CACHE_DIR, name="storyline_analyses")
@@ -0,0 +1,252 @@
+"""
+Assembly statistics computed from a FASTA file.
+
+QUAST-style metrics (contig count, total length, N50/L50, N90/L90, GC,
+N's per 100 kbp), a contig length histogram, and per-contig depth and
+circularity from Unicycler (``depth=1.23x circular=true``) or SPAdes
+(``NODE_1_length_500_cov_12.3``) headers.
+
+The file is read in blocks of BLOCK_BYTES. Headers and line ends are
+found with vectorized searches over each block, GC/ACGT bytes are
+flagged with NumPy comparisons, and per-contig counts are one
+count_nonzero per contig slice, so Python only loops over contigs, never
+over sequence lines. Memory stays at a few times BLOCK_BYTES whatever
+the assembly size.
+
+Results are cached as JSON keyed by content hash (see
+app.services.analysis_cache) and rendered with summary() and
+chart_data() in the shape CommandOutput.chart_data and the output panel
+expect.
+"""
+from typing import Optional
+import re
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.storage.streaming import open_binary
+
+# Bytes read and classified at a time
+BLOCK_BYTES = 32 * 1024 * 1024
+
+# Contigs listed individually (the largest first); all contigs count in the totals
+MAX_CONTIGS_LISTED = 500
+
+# Contig length histogram bin edges (bp)
+LENGTH_BINS = [0, 500, 1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 500_000, 1_000_000]
+
+# Lower-cased (byte | 0x20) codes of the bases counted for GC and ACGT(U)
+_GC_CODES = tuple(b"gc")
+_AT_CODES = tuple(b"atu")
+
+_DEPTH = re.compile(r"(?:\bdepth=|_cov_)([0-9.]+)")
+_CIRCULAR = re.compile(r"\bcircular=true\b")
+
+
+class ContigStats(BaseModel):
+    name: str
+    length: int
+    gc_percent: Optional[float] = None
+    depth: Optional[float] = None  # From the assembler's header, if present
+    circular: bool = False
+
+
+class AssemblyStats(BaseModel):
+    """Whole-assembly metrics plus the largest contigs."""
+    contigs: int
+    total_length: int
+    largest_contig: int
+    n50: int
+    l50: int
+    n90: int
+    l90: int
+    gc_percent: Optional[float]
+    ns_per_100kbp: float
+    circular_contigs: int = 0
+    length_histogram: list[int]  # Counts per LENGTH_BINS bin
+    contig_list: list[ContigStats]  # Largest first, at most MAX_CONTIGS_LISTED
+
+    def summary(self) -> dict[str, str]:
+        """Labelled values for the output panel's summary table."""
+        summary = {
+            "Contigs": f"{self.contigs:,}",
+            "Total length": f"{self.total_length:,} bp",
+            "Largest contig": f"{self.largest_contig:,} bp",
+            "N50": f"{self.n50:,} bp",
+            "L50": f"{self.l50:,}",
+            "N90": f"{self.n90:,} bp",
+            "L90": f"{self.l90:,}",
+            "GC (%)": f"{self.gc_percent:.2f}" if self.gc_percent is not None else "n/a",
+            "N's per 100 kbp": f"{self.ns_per_100kbp:.2f}",
+        }
+        if self.circular_contigs:
+            summary["Circular contigs"] = f"{self.circular_contigs:,}"
+        return summary
+
+    def chart_data(self) -> dict:
+        """Contig length histogram in the CommandOutput.chart_data format."""
+        return {
+            "title": "Contig Length Distribution",
+            "x": _bin_labels(),
+            "y": self.length_histogram,
+            "type": "bar",
+            "xLabel": "Contig length (bp)",
+            "yLabel": "Contigs",
+        }
+
+    def charts(self) -> list[dict]:
+        """Further charts: contig depth, if the headers carry it."""
+        depth_chart = self.depth_chart_data()
+        return [depth_chart] if depth_chart else []
+
+    def depth_chart_data(self) -> Optional[dict]:
+        """Per-contig depth (largest contigs first), if the headers carry it."""
+        contigs = [contig for contig in self.contig_list if contig.depth is not None]
+        if not contigs:
+            return None
+        return {
+            "title": "Contig Depth",
+            "x": [contig.name for contig in contigs],
+            "y": [contig.depth for contig in contigs],
+            "type": "bar",
+            "xLabel": "Contig",
+            "yLabel": "Depth (x)",
+        }
+
+
+def _short_size(bp: int) -> str:
+    if bp >= 1_000_000:
+        return f"{bp // 1_000_000}M"
+    if bp >= 1_000:
+        return f"{bp // 1_000}k"
+    return str(bp)
+
+
+def _bin_labels() -> list[str]:
+    labels = [f"{_short_size(lo)}-{_short_size(hi)}" for lo, hi in zip(LENGTH_BINS, LENGTH_BINS[1:])]
+    labels[0] = f"<{_short_size(LENGTH_BINS[1])}"
+    return labels + [f">={_short_size(LENGTH_BINS[-1])}"]
+
+
+def _nx(sorted_lengths: np.ndarray, total: int, fraction: float) -> tuple[int, int]:
+    """(Nx, Lx) for lengths sorted largest first."""
+    if total == 0:
+        return 0, 0
+    i = int(np.searchsorted(np.cumsum(sorted_lengths), total * fraction))
+    return int(sorted_lengths[i]), i + 1
+
+
+def _count_segments(block: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """(bases, ACGT, GC) counts of each sequence segment [start, end) of a block."""
+    lower = block | 0x20
+    # Any letter is a base (IUPAC codes and N included); line ends and stray text aren't
+    base_mask = (lower >= ord("a")) & (lower <= ord("z"))
+    gc_mask = np.zeros(len(block), dtype=bool)
+    for code in _GC_CODES:
+        gc_mask |= lower == code
+    acgt_mask = gc_mask.copy()
+    for code in _AT_CODES:
+        acgt_mask |= lower == code
+
+    # One count_nonzero per contig and mask: the loop is over contigs, never lines
+    segments = list(zip(starts.tolist(), ends.tolist()))
+    return tuple(
+        np.array([np.count_nonzero(mask[s:e]) for s, e in segments], dtype=np.int64)
+        for mask in (base_mask, acgt_mask, gc_mask)
+    )
+
+
+def compute_assembly_stats(source) -> AssemblyStats:
+    """Stats for a FASTA file (path or storage source; gzip is decompressed)."""
+    names: list[str] = []
+    depths: list[float] = []
+    circular: list[bool] = []
+    bases: list[np.ndarray] = []
+    acgt: list[np.ndarray] = []
+    gc: list[np.ndarray] = []
+
+    with open_binary(source) as f:
+        carry = b""
+        while True:
+            data = f.read(BLOCK_BYTES)
+            chunk = carry + data
+            if not data:
+                if not chunk:
+                    break
+                if not chunk.endswith(b"\n"):
+                    chunk += b"\n"
+                carry = b""
+            else:
+                # Whole lines only; the partial last line goes to the next block
+                cut = chunk.rfind(b"\n") + 1
+                chunk, carry = chunk[:cut], chunk[cut:]
+                if not chunk:
+                    continue
+
+            block = np.frombuffer(chunk, dtype=np.uint8)
+            newlines = np.flatnonzero(block == 10)
+            line_starts = np.concatenate(([0], newlines[:-1] + 1))
+            header_starts = line_starts[block[line_starts] == ord(">")]
+            header_ends = newlines[np.searchsorted(newlines, header_starts)] + 1
+
+            for start, end in zip(header_starts.tolist(), header_ends.tolist()):
+                header = chunk[start + 1:end].decode("utf-8", errors="replace").strip()
+                names.append(header.split(" ", 1)[0])
+                depth = _DEPTH.search(header)
+                depths.append(float(depth.group(1)) if depth else np.nan)
+                circular.append(bool(_CIRCULAR.search(header)))
+
+            # Segment 0 is the text before the first header (continuing the previous contig)
+            starts = np.concatenate(([0], header_ends))
+            ends = np.concatenate((header_starts, [len(block)]))
+            block_bases, block_acgt, block_gc = _count_segments(block, starts, ends)
+            for totals, counts in ((bases, block_bases), (acgt, block_acgt), (gc, block_gc)):
+                # The prefix segment continues the last contig of earlier blocks
+                for earlier in reversed(totals):
+                    if len(earlier):
+                        earlier[-1] += counts[0]
+                        break
+                totals.append(counts[1:].copy())
+            if not data:
+                break
+
+    lengths = np.concatenate(bases) if bases else np.zeros(0, dtype=np.int64)
+    acgt_counts = np.concatenate(acgt) if acgt else np.zeros(0, dtype=np.int64)
+    gc_counts = np.concatenate(gc) if gc else np.zeros(0, dtype=np.int64)
+    depth_values = np.array(depths, dtype=np.float64)
+
+    total = int(lengths.sum())
+    total_acgt = int(acgt_counts.sum())
+    order = np.argsort(lengths, kind="stable")[::-1]
+    sorted_lengths = lengths[order]
+    n50, l50 = _nx(sorted_lengths, total, 0.5)
+    n90, l90 = _nx(sorted_lengths, total, 0.9)
+    histogram, _ = np.histogram(lengths, bins=LENGTH_BINS + [np.iinfo(np.int64).max])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        contig_gc = np.where(acgt_counts > 0, gc_counts / acgt_counts * 100, np.nan)
+
+    listed = []
+    for i in order[:MAX_CONTIGS_LISTED].tolist():
+        listed.append(ContigStats(
+            name=names[i],
+            length=int(lengths[i]),
+            gc_percent=None if np.isnan(contig_gc[i]) else round(float(contig_gc[i]), 2),
+            depth=None if np.isnan(depth_values[i]) else float(depth_values[i]),
+            circular=circular[i],
+        ))
+
+    return AssemblyStats(
+        contigs=len(lengths),
+        total_length=total,
+        largest_contig=int(sorted_lengths[0]) if len(sorted_lengths) else 0,
+        n50=n50,
+        l50=l50,
+        n90=n90,
+        l90=l90,
+        gc_percent=round(int(gc_counts.sum()) / total_acgt * 100, 2) if total_acgt else None,
+        ns_per_100kbp=round((total - total_acgt) / total * 100_000, 2) if total else 0.0,
+        circular_contigs=sum(circular),
+        length_histogram=histogram.tolist(),
+        contig_list=listed,
+    )
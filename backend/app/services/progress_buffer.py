@@ -0,0 +1,197 @@
+"""
+Write-behind buffer for narrative progress.
+
+The frontend reports progress after every step, and writing each report
+costs a select, an insert or update, and a commit. Updates are instead
+kept in memory per (user, narrative), where a newer update replaces an
+older one, and written to the database in one transaction every
+PROGRESS_FLUSH_SECONDS, as soon as PROGRESS_MAX_PENDING narratives are
+waiting, and on shutdown.
+
+Readers merge pending entries over the stored rows (pending_for), so a
+user always sees their own latest progress. Entries held by a flush
+that fails are put back, unless a newer update replaced them meanwhile.
+
+Buffering an update never queries the database. When a narrative was
+started is remembered (BoundedCache "progress_started") from rows seen
+by readers and flushes; for a narrative not seen yet it is taken as the
+time of the update. That value only reaches the database if the row is
+new: flushes never overwrite a stored start time.
+"""
+from datetime import datetime
+import asyncio
+import logging
+import os
+
+from sqlalchemy import select
+
+from app.cache import BoundedCache
+from app.database import async_session
+from app.models import UserProgress
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of buffered progress to the database
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "2"))
+
+# Flush early once this many (user, narrative) updates are waiting
+PROGRESS_MAX_PENDING = int(os.getenv("PROGRESS_MAX_PENDING", "5000"))
+
+
+class PendingProgress:
+    """The latest unsaved progress of one user in one narrative."""
+    __slots__ = ("current_step", "completed_steps", "started_at", "last_activity")
+
+    def __init__(self, current_step: int, completed_steps: list[int], started_at: datetime, last_activity: datetime):
+        self.current_step = current_step
+        self.completed_steps = completed_steps
+        self.started_at = started_at
+        self.last_activity = last_activity
+
+
+class ProgressBuffer:
+    """Coalesces progress updates in memory and writes them in bulk."""
+
+    def __init__(self, interval: float = PROGRESS_FLUSH_SECONDS, max_pending: int = PROGRESS_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        # user id -> narrative id -> latest update
+        self._pending: dict[str, dict[str, PendingProgress]] = {}
+        # Entries being written by the flush in progress (still visible to readers)
+        self._flushing: dict[str, dict[str, PendingProgress]] = {}
+        self._count = 0
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        # (user id, narrative id) -> started_at of the stored row
+        self._started = BoundedCache("progress_started", max_entries=50_000)
+
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def put(
+        self,
+        user_id: str,
+        narrative_id: str,
+        current_step: int,
+        completed_steps: list[int],
+        now: datetime,
+    ) -> PendingProgress:
+        """Buffer an update (no database access)."""
+        self.updates += 1
+        narratives = self._pending.setdefault(user_id, {})
+        earlier = narratives.get(narrative_id) or self._flushing.get(user_id, {}).get(narrative_id)
+        if earlier is not None:
+            started_at = earlier.started_at
+        else:
+            started_at = self._started.get((user_id, narrative_id), now)
+        if narrative_id in narratives:
+            self.coalesced += 1
+        else:
+            self._count += 1
+        entry = PendingProgress(current_step, list(completed_steps), started_at, now)
+        narratives[narrative_id] = entry
+
+        if self._count >= self.max_pending:
+            self._wake.set()
+        return entry
+
+    def remember_started(self, user_id: str, narrative_id: str, started_at: datetime):
+        """Record a stored row's start time, so updates to it report the right one."""
+        self._started.set((user_id, narrative_id), started_at)
+
+    def pending_for(self, user_id: str) -> dict[str, PendingProgress]:
+        """A user's unsaved progress by narrative id, including updates being flushed."""
+        return {**self._flushing.get(user_id, {}), **self._pending.get(user_id, {})}
+
+    async def flush(self) -> int:
+        """Write all buffered updates in one transaction; returns the number of rows written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending, self._count = self._pending, {}, 0
+            self._flushing = batch
+            try:
+                written = await self._write(batch)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Progress flush failed, keeping {sum(map(len, batch.values()))} updates: {e}")
+                for user_id, narratives in batch.items():
+                    current = self._pending.setdefault(user_id, {})
+                    for narrative_id, entry in narratives.items():
+                        if narrative_id not in current:
+                            current[narrative_id] = entry
+                            self._count += 1
+                return 0
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    async def _write(self, batch: dict[str, dict[str, PendingProgress]]) -> int:
+        narrative_ids = {n for narratives in batch.values() for n in narratives}
+        async with async_session() as db:
+            result = await db.execute(
+                select(UserProgress).where(
+                    UserProgress.user_id.in_(batch.keys()),
+                    UserProgress.narrative_id.in_(narrative_ids),
+                )
+            )
+            rows: dict[tuple[str, str], UserProgress] = {}
+            for row in result.scalars():
+                rows.setdefault((row.user_id, row.narrative_id), row)
+
+            written = 0
+            for user_id, narratives in batch.items():
+                for narrative_id, entry in narratives.items():
+                    row = rows.get((user_id, narrative_id))
+                    if row is None:
+                        db.add(UserProgress(
+                            user_id=user_id,
+                            narrative_id=narrative_id,
+                            current_step=entry.current_step,
+                            completed_steps=entry.completed_steps,
+                            started_at=entry.started_at,
+                            last_activity=entry.last_activity,
+                        ))
+                    else:
+                        row.current_step = entry.current_step
+                        row.completed_steps = entry.completed_steps
+                        row.last_activity = entry.last_activity
+                    self.remember_started(user_id, narrative_id, row.started_at if row is not None else entry.started_at)
+                    written += 1
+            await db.commit()
+        return written
+
+    async def run(self):
+        """Background task flushing on an interval (or when full) until stop(), then once more."""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+        await self.flush()
+
+    def stop(self):
+        """Make run() write what is left and return."""
+        self._stopping = True
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._count,
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+
+progress_buffer = ProgressBuffer()
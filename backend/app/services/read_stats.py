@@ -0,0 +1,419 @@
+"""
+FastQC-style read statistics computed from a FASTQ file.
+
+Per-position quality distributions (box plot data: 10th/25th/50th/75th/
+90th percentiles and mean), per-read GC and mean quality histograms, the
+read length distribution, and Q20/Q30/N totals for a FASTQ or FASTQ.gz.
+
+Reads are processed in blocks of whole records (BLOCK_BYTES of
+decompressed text). Within a block, line boundaries come from one
+vectorized newline search; the sequence and quality bytes of every read
+are copied into a (reads x read length) matrix through a sliding window
+view (or gathered with index arithmetic when lengths vary widely), and
+all counts are bincounts and row or cumulative sums, so Python never
+loops over reads. Only the running
+totals survive a block: a position x quality count matrix (at most
+MAX_POSITIONS rows), per-read histograms and a length count array, so
+memory depends on read length, not read count.
+
+Quality characters are decoded as Phred+33. Several files (e.g. R1 and
+R2) can be profiled in separate processes with profile_read_files().
+
+Usage (from backend/):
+    python -m app.services.read_stats reads_R1.fq.gz [reads_R2.fq.gz ...] [--processes N]
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+import json
+import math
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydantic import BaseModel
+
+from app.storage.streaming import open_binary
+
+# Decompressed bytes read and profiled at a time (whole records only)
+BLOCK_BYTES = 8 * 1024 * 1024
+
+# Read positions tracked individually; bases beyond share the last row
+MAX_POSITIONS = 1_000
+
+# Reads of a block go through the (reads x longest read) matrix path while
+# that matrix has at most this many cells per block byte; blocks of very
+# uneven or long reads are gathered base by base instead
+MATRIX_CELLS_PER_BYTE = 2
+
+# Position groups shown in the per-position quality chart (like FastQC's grouping)
+MAX_POSITION_GROUPS = 60
+
+# Length distribution bars shown when reads have many distinct lengths
+LENGTH_BARS = 50
+
+# Phred+33 quality values 0..93
+QUALITY_LEVELS = 94
+PHRED_OFFSET = 33
+
+# Box plot percentiles: whiskers, box and median
+_PERCENTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+
+
+class ReadStats(BaseModel):
+    """Whole-file read metrics plus chart-ready distributions."""
+    reads: int
+    bases: int
+    min_length: int
+    max_length: int
+    mean_length: float
+    gc_percent: Optional[float]
+    mean_quality: Optional[float]
+    q20_percent: Optional[float]
+    q30_percent: Optional[float]
+    n_percent: float
+    positions: list[str]  # Position group labels ("1", "2", ..., "10-14", ...)
+    position_quality: dict[str, list[float]]  # p10, p25, median, p75, p90, mean per group
+    gc_histogram: list[int]  # Reads per GC percent, 0..100
+    quality_histogram: list[int]  # Reads per rounded mean quality, 0..max
+    length_labels: list[str]
+    length_counts: list[int]
+
+    def summary(self) -> dict[str, str]:
+        """Labelled values for the output panel's summary table."""
+        def percent(value: Optional[float]) -> str:
+            return f"{value:.2f}" if value is not None else "n/a"
+
+        length = (
+            f"{self.min_length:,} bp" if self.min_length == self.max_length
+            else f"{self.min_length:,}-{self.max_length:,} bp"
+        )
+        return {
+            "Reads": f"{self.reads:,}",
+            "Bases": f"{self.bases:,}",
+            "Read length": length,
+            "Mean length": f"{self.mean_length:.1f} bp",
+            "GC (%)": percent(self.gc_percent),
+            "Mean quality": f"{self.mean_quality:.1f}" if self.mean_quality is not None else "n/a",
+            "Q20 bases (%)": percent(self.q20_percent),
+            "Q30 bases (%)": percent(self.q30_percent),
+            "N bases (%)": f"{self.n_percent:.3f}",
+        }
+
+    def chart_data(self) -> dict:
+        """Per-position quality box plot (Plotly precomputed box statistics)."""
+        quality = self.position_quality
+        return {
+            "title": "Per Base Sequence Quality",
+            "x": self.positions,
+            "q1": quality["p25"],
+            "median": quality["median"],
+            "q3": quality["p75"],
+            "lowerfence": quality["p10"],
+            "upperfence": quality["p90"],
+            "mean": quality["mean"],
+            "type": "box",
+            "xLabel": "Position in read (bp)",
+            "yLabel": "Phred quality",
+        }
+
+    def charts(self) -> list[dict]:
+        """Further charts: GC, mean quality and length distributions."""
+        return [
+            {
+                "title": "Per Sequence GC Content",
+                "x": list(range(len(self.gc_histogram))),
+                "y": self.gc_histogram,
+                "type": "bar",
+                "xLabel": "Mean GC content (%)",
+                "yLabel": "Reads",
+            },
+            {
+                "title": "Per Sequence Quality Scores",
+                "x": list(range(len(self.quality_histogram))),
+                "y": self.quality_histogram,
+                "type": "bar",
+                "xLabel": "Mean sequence quality (Phred)",
+                "yLabel": "Reads",
+            },
+            {
+                "title": "Sequence Length Distribution",
+                "x": self.length_labels,
+                "y": self.length_counts,
+                "type": "bar",
+                "xLabel": "Read length (bp)",
+                "yLabel": "Reads",
+            },
+        ]
+
+
+def _grow(counts: np.ndarray, size: int) -> np.ndarray:
+    """counts zero-padded along axis 0 to at least size rows."""
+    if len(counts) >= size:
+        return counts
+    pad = [(0, size - len(counts))] + [(0, 0)] * (counts.ndim - 1)
+    return np.pad(counts, pad)
+
+
+def _positions(lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start of each read in the concatenated bases, and each base's position in its read."""
+    offsets = np.cumsum(lengths) - lengths
+    return offsets, np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(offsets, lengths)
+
+
+def _per_read(values: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Sum of values over each read, as differences of a running total."""
+    running = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return running[offsets + lengths] - running[offsets]
+
+
+def _profile_matrix(block, seq_starts, lengths, qual_starts, qual_lengths, width):
+    """Counts for reads laid out as rows of a (reads x width) matrix.
+
+    Row i of a sliding window view is block[i:i + width], so indexing it
+    with the line starts copies every read at once without building a
+    per-base index. Cells past a read's end are masked out.
+    """
+    windows = sliding_window_view(np.concatenate((block, np.zeros(width, dtype=np.uint8))), width)
+    columns = np.arange(width)
+    bases = windows[seq_starts] | 0x20
+    if lengths.min() < width:
+        bases[columns >= lengths[:, None]] = 0
+    quality = windows[qual_starts].astype(np.int16)
+    quality -= PHRED_OFFSET
+    np.clip(quality, 0, QUALITY_LEVELS - 1, out=quality)
+    padding = columns >= qual_lengths[:, None] if qual_lengths.min() < width else None
+    if padding is not None:
+        quality[padding] = 0
+    read_quality = quality.sum(axis=1, dtype=np.int64)
+    if padding is not None:
+        # An extra quality level collects the padding and is dropped
+        quality[padding] = QUALITY_LEVELS
+
+    levels = QUALITY_LEVELS + 1
+    codes = quality + (columns * levels).astype(np.int32 if width * levels >= 2 ** 15 else np.int16)
+    counts = np.bincount(codes.ravel(), minlength=width * levels).reshape(width, levels)
+    rows = int(qual_lengths.max())
+
+    gc_mask = (bases == ord("g")) | (bases == ord("c"))
+    acgt_mask = gc_mask | (bases == ord("a")) | (bases == ord("t"))
+    return (
+        counts[:rows, :QUALITY_LEVELS],
+        gc_mask.sum(axis=1, dtype=np.int64),
+        acgt_mask.sum(axis=1, dtype=np.int64),
+        read_quality,
+        int(np.count_nonzero(bases == ord("n"))),
+    )
+
+
+def _profile_flat(block, seq_starts, lengths, qual_starts, qual_lengths):
+    """Counts for reads of very different or long lengths, gathered base by base."""
+    read_offsets, positions = _positions(lengths)
+    bases = block[np.repeat(seq_starts, lengths) + positions] | 0x20
+    if not np.array_equal(lengths, qual_lengths):
+        qual_offsets, positions = _positions(qual_lengths)
+    else:
+        qual_offsets = read_offsets
+    quality = block[np.repeat(qual_starts, qual_lengths) + positions].astype(np.int64) - PHRED_OFFSET
+    np.clip(quality, 0, QUALITY_LEVELS - 1, out=quality)
+
+    rows = min(int(qual_lengths.max(initial=0)), MAX_POSITIONS)
+    np.minimum(positions, MAX_POSITIONS - 1, out=positions)
+    counts = np.bincount(positions * QUALITY_LEVELS + quality, minlength=rows * QUALITY_LEVELS)
+
+    gc_mask = (bases == ord("g")) | (bases == ord("c"))
+    acgt_mask = gc_mask | (bases == ord("a")) | (bases == ord("t"))
+    return (
+        counts.reshape(rows, QUALITY_LEVELS),
+        _per_read(gc_mask, read_offsets, lengths),
+        _per_read(acgt_mask, read_offsets, lengths),
+        _per_read(quality, qual_offsets, qual_lengths),
+        int(np.count_nonzero(bases == ord("n"))),
+    )
+
+
+class _Profile:
+    """Running totals over the blocks of one file."""
+
+    def __init__(self):
+        self.reads = 0
+        self.gc = 0
+        self.acgt = 0
+        self.n = 0
+        self.position_quality = np.zeros((0, QUALITY_LEVELS), dtype=np.int64)
+        self.length_counts = np.zeros(0, dtype=np.int64)
+        self.gc_histogram = np.zeros(101, dtype=np.int64)
+        self.quality_histogram = np.zeros(QUALITY_LEVELS, dtype=np.int64)
+
+    def add_block(self, block: np.ndarray, newlines: np.ndarray):
+        """Add a block of whole records, given the offsets of its newlines."""
+        if len(newlines) % 4:
+            raise ValueError("FASTQ records must have exactly four lines")
+        line_starts = np.concatenate(([0], newlines[:-1] + 1))
+        line_ends = newlines.copy()
+        # CRLF files: the \r isn't part of the sequence or quality
+        line_ends[(line_ends > line_starts) & (block[np.maximum(line_ends - 1, 0)] == 13)] -= 1
+        if not np.all(block[line_starts[0::4]] == ord("@")):
+            raise ValueError("FASTQ record headers must start with '@'")
+
+        seq_starts = line_starts[1::4]
+        qual_starts = line_starts[3::4]
+        lengths = line_ends[1::4] - seq_starts
+        # Normally equal to lengths; hand-edited files are tolerated
+        qual_lengths = line_ends[3::4] - qual_starts
+
+        width = int(max(lengths.max(initial=0), qual_lengths.max(initial=0)))
+        if 0 < width <= MAX_POSITIONS and len(lengths) * width <= MATRIX_CELLS_PER_BYTE * len(block):
+            counts, read_gc, read_acgt, read_quality, n = _profile_matrix(
+                block, seq_starts, lengths, qual_starts, qual_lengths, width
+            )
+        else:
+            counts, read_gc, read_acgt, read_quality, n = _profile_flat(
+                block, seq_starts, lengths, qual_starts, qual_lengths
+            )
+        self.position_quality = _grow(self.position_quality, len(counts))
+        self.position_quality[:len(counts)] += counts
+
+        self.reads += len(lengths)
+        self.gc += int(read_gc.sum())
+        self.acgt += int(read_acgt.sum())
+        self.n += n
+
+        has_acgt = read_acgt > 0
+        gc_percent = np.rint(read_gc[has_acgt] * 100 / read_acgt[has_acgt]).astype(np.int64)
+        self.gc_histogram += np.bincount(gc_percent, minlength=101)
+        scored = qual_lengths > 0
+        mean_quality = np.rint(read_quality[scored] / qual_lengths[scored]).astype(np.int64)
+        self.quality_histogram += np.bincount(mean_quality, minlength=QUALITY_LEVELS)
+        length_counts = np.bincount(lengths)
+        self.length_counts = _grow(self.length_counts, len(length_counts))
+        self.length_counts[:len(length_counts)] += length_counts
+
+    def result(self) -> ReadStats:
+        lengths = np.flatnonzero(self.length_counts)
+        bases = int((np.arange(len(self.length_counts)) * self.length_counts).sum())
+        quality_totals = self.position_quality.sum(axis=0)
+        scored = int(quality_totals.sum())
+        levels = np.arange(QUALITY_LEVELS)
+
+        def percent(part: int, whole: int) -> Optional[float]:
+            return round(part / whole * 100, 2) if whole else None
+
+        positions, position_quality = _position_summary(self.position_quality)
+        length_labels, length_counts = _length_distribution(self.length_counts)
+        top_quality = int(np.flatnonzero(self.quality_histogram).max(initial=0))
+        return ReadStats(
+            reads=self.reads,
+            bases=bases,
+            min_length=int(lengths[0]) if len(lengths) else 0,
+            max_length=int(lengths[-1]) if len(lengths) else 0,
+            mean_length=round(bases / self.reads, 2) if self.reads else 0.0,
+            gc_percent=percent(self.gc, self.acgt),
+            mean_quality=round(float((quality_totals * levels).sum()) / scored, 2) if scored else None,
+            q20_percent=percent(int(quality_totals[20:].sum()), scored),
+            q30_percent=percent(int(quality_totals[30:].sum()), scored),
+            n_percent=round(self.n / bases * 100, 3) if bases else 0.0,
+            positions=positions,
+            position_quality=position_quality,
+            gc_histogram=self.gc_histogram.tolist(),
+            quality_histogram=self.quality_histogram[:top_quality + 1].tolist(),
+            length_labels=length_labels,
+            length_counts=length_counts,
+        )
+
+
+def _position_groups(rows: int) -> list[tuple[int, int]]:
+    """[start, end) row ranges: positions 1-9 alone, then equal-width groups."""
+    if rows <= MAX_POSITION_GROUPS:
+        return [(i, i + 1) for i in range(rows)]
+    width = math.ceil((rows - 9) / (MAX_POSITION_GROUPS - 9))
+    return [(i, i + 1) for i in range(9)] + [(i, min(i + width, rows)) for i in range(9, rows, width)]
+
+
+def _position_summary(matrix: np.ndarray) -> tuple[list[str], dict[str, list[float]]]:
+    """Group labels and percentile/mean series of a position x quality matrix."""
+    groups = _position_groups(len(matrix))
+    if not groups:
+        return [], {name: [] for name in ("p10", "p25", "median", "p75", "p90", "mean")}
+
+    grouped = np.add.reduceat(matrix, [start for start, _ in groups], axis=0)
+    totals = grouped.sum(axis=1)
+    cumulative = np.cumsum(grouped, axis=1)
+    series = {}
+    for name, fraction in zip(("p10", "p25", "median", "p75", "p90"), _PERCENTILES):
+        # First quality whose cumulative count reaches the fraction of the group's bases
+        series[name] = np.argmax(cumulative >= (totals * fraction)[:, None], axis=1).astype(float).tolist()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = grouped @ np.arange(QUALITY_LEVELS) / totals
+    series["mean"] = np.round(np.nan_to_num(means), 2).tolist()
+
+    labels = [str(start + 1) if end - start == 1 else f"{start + 1}-{end}" for start, end in groups]
+    if len(matrix) == MAX_POSITIONS:
+        labels[-1] += "+"
+    return labels, series
+
+
+def _length_distribution(counts: np.ndarray) -> tuple[list[str], list[int]]:
+    """Bars of the read length distribution, binned if there are many lengths."""
+    present = np.flatnonzero(counts)
+    if not len(present):
+        return [], []
+    low, high = int(present[0]), int(present[-1])
+    if high - low < LENGTH_BARS:
+        return [str(length) for length in range(low, high + 1)], counts[low:high + 1].tolist()
+
+    width = math.ceil((high - low + 1) / LENGTH_BARS)
+    edges = list(range(low, high + 1, width))
+    binned = np.add.reduceat(counts[low:high + 1], [edge - low for edge in edges])
+    labels = [f"{edge}-{min(edge + width - 1, high)}" for edge in edges]
+    return labels, binned.tolist()
+
+
+def compute_read_stats(source) -> ReadStats:
+    """Stats for a FASTQ file (path or storage source; gzip is decompressed)."""
+    profile = _Profile()
+    with open_binary(source) as f:
+        carry = b""
+        while True:
+            data = f.read(BLOCK_BYTES)
+            chunk = carry + data
+            if not data:
+                # Trailing blank lines aren't records
+                chunk = chunk.rstrip(b"\r\n")
+                chunk = chunk + b"\n" if chunk else b""
+            block = np.frombuffer(chunk, dtype=np.uint8)
+            newlines = np.flatnonzero(block == 10)
+            if data:
+                # Whole records only; the rest goes to the next block
+                complete = len(newlines) // 4 * 4
+                cut = int(newlines[complete - 1]) + 1 if complete else 0
+                carry = chunk[cut:]
+                block, newlines = block[:cut], newlines[:complete]
+            if len(newlines):
+                profile.add_block(block, newlines)
+            if not data:
+                break
+    return profile.result()
+
+
+def profile_read_files(sources: list, processes: Optional[int] = None) -> list[ReadStats]:
+    """Stats for several FASTQ files (e.g. R1 and R2), one process per file if processes > 1."""
+    if not processes or processes <= 1 or len(sources) <= 1:
+        return [compute_read_stats(source) for source in sources]
+    with ProcessPoolExecutor(max_workers=min(processes, len(sources))) as pool:
+        return list(pool.map(compute_read_stats, sources))
+
+
+def main(argv: list[str]):
+    processes = None
+    if "--processes" in argv:
+        i = argv.index("--processes")
+        processes = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+    paths = [Path(arg) for arg in argv]
+    for path, stats in zip(paths, profile_read_files(paths, processes)):
+        print(json.dumps({"file": str(path), **stats.summary()}, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
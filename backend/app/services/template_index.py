@@ -0,0 +1,321 @@
+"""
+In-memory index of the template directory tree.
+
+The template listing endpoints used to iterdir()/stat() the disk on every
+request, and the filesystem endpoint rescanned a whole storyline each
+time. This service scans TEMPLATE_DIR once at startup (one storyline per
+file I/O thread), keeps a compact tree of names, sizes and mtimes, and
+serves every listing from memory.
+
+Refreshes are incremental. Every TEMPLATE_INDEX_REFRESH_SECONDS a pass
+stats directories only, and re-lists (and re-stats the files of) a
+directory whose own mtime changed because an entry was added, removed or
+renamed. A file rewritten in place leaves its directory's mtime alone, so
+every TEMPLATE_INDEX_FULL_REFRESH_SECONDS a pass also stats each file.
+Content hashes are computed on first request and kept until the file's
+size or mtime changes. Requests for a file's content use current(),
+which stats that one file first, so a file served is never described by
+an outdated size or mtime.
+
+For indexed stores (content-addressed blobs, storyline bundles, object
+stores) the tree and the hashes come straight from the store's index,
+and a refresh only checks whether the index was replaced.
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+import asyncio
+import logging
+import os
+
+from app.storage.files import FileStorage, ManifestFileStorage, template_storage
+from app.storage.streaming import sha256_file
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background refresh passes (directories only)
+REFRESH_INTERVAL_SECONDS = float(os.getenv("TEMPLATE_INDEX_REFRESH_SECONDS", "10"))
+
+# Seconds between refresh passes that also stat every file
+FULL_REFRESH_SECONDS = float(os.getenv("TEMPLATE_INDEX_FULL_REFRESH_SECONDS", "300"))
+
+
+class TreeNode:
+    """A file or directory in the template tree."""
+    __slots__ = ("name", "size", "mtime_ns", "children", "_digest")
+
+    def __init__(self, name: str, size: int, mtime_ns: int, children: Optional[dict[str, "TreeNode"]] = None):
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # None for files, name -> node (sorted by name) for directories
+        self.children = children
+        # (size, mtime_ns, sha256 hex) once computed
+        self._digest: Optional[tuple[int, int, str]] = None
+
+    @property
+    def is_dir(self) -> bool:
+        return self.children is not None
+
+    def child(self, name: str) -> Optional["TreeNode"]:
+        return self.children.get(name) if self.children else None
+
+    def known_digest(self) -> Optional[str]:
+        """SHA-256 of this file if already known for its current size/mtime."""
+        if self._digest is not None and self._digest[:2] == (self.size, self.mtime_ns):
+            return self._digest[2]
+        return None
+
+    def entries(self) -> Iterator["TreeNode"]:
+        """Children in name order, skipping .gitkeep placeholders."""
+        if not self.children:
+            return iter(())
+        return (node for node in self.children.values() if node.name != ".gitkeep")
+
+
+def _scan(path: Path, name: str) -> TreeNode:
+    """Recursively scan a directory into a TreeNode."""
+    st = path.stat()
+    children: dict[str, TreeNode] = {}
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir():
+            children[entry.name] = _scan(Path(entry.path), entry.name)
+        else:
+            est = entry.stat()
+            children[entry.name] = TreeNode(entry.name, est.st_size, est.st_mtime_ns)
+    return TreeNode(name, 0, st.st_mtime_ns, children)
+
+
+def _update_file(node: TreeNode, st: os.stat_result) -> int:
+    """Apply a file's current size/mtime to its node. Returns 1 if it changed."""
+    if (st.st_size, st.st_mtime_ns) == (node.size, node.mtime_ns):
+        return 0
+    node.size = st.st_size
+    node.mtime_ns = st.st_mtime_ns
+    node._digest = None
+    return 1
+
+
+def _refresh(node: TreeNode, path: Path, stat_files: bool = True) -> int:
+    """
+    Bring a directory node up to date in place. Returns nodes changed.
+
+    Files are stat()ed only in directories that were re-listed, or
+    everywhere if stat_files is set.
+    """
+    st = path.stat()
+    changed = 0
+    relisted = st.st_mtime_ns != node.mtime_ns
+
+    if relisted:
+        # Entries were added, removed or renamed: re-list this directory
+        old = node.children or {}
+        children: dict[str, TreeNode] = {}
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            existing = old.get(entry.name)
+            if entry.is_dir():
+                if existing is not None and existing.is_dir:
+                    children[entry.name] = existing
+                else:
+                    children[entry.name] = _scan(Path(entry.path), entry.name)
+                    changed += 1
+            elif existing is not None and not existing.is_dir:
+                children[entry.name] = existing
+                changed += _update_file(existing, entry.stat())
+            else:
+                est = entry.stat()
+                children[entry.name] = TreeNode(entry.name, est.st_size, est.st_mtime_ns)
+                changed += 1
+        changed += len(old.keys() - children.keys())
+        node.children = children
+        node.mtime_ns = st.st_mtime_ns
+
+    for child in list(node.children.values()):
+        if not child.is_dir and (relisted or not stat_files):
+            continue
+        child_path = path / child.name
+        try:
+            if child.is_dir:
+                changed += _refresh(child, child_path, stat_files)
+            else:
+                changed += _update_file(child, child_path.stat())
+        except FileNotFoundError:
+            # Removed since the listing; the next pass drops it with the parent
+            continue
+    return changed
+
+
+def _from_manifest(storage: ManifestFileStorage) -> TreeNode:
+    """Build the tree from an indexed store's file list (no disk walk)."""
+    def build(key: str, name: str) -> TreeNode:
+        children: dict[str, TreeNode] = {}
+        for child in storage.dirs.get(key, ()):
+            child_key = f"{key}/{child}" if key else child
+            entry = storage.files.get(child_key)
+            if entry is None:
+                children[child] = build(child_key, child)
+            else:
+                digest, size, mtime_ns = entry
+                node = TreeNode(child, size, mtime_ns)
+                node._digest = (size, mtime_ns, digest)
+                children[child] = node
+        return TreeNode(name, 0, 0, children)
+
+    return build("", storage.base_path.name)
+
+
+class TemplateIndex:
+    """Memory-resident view of a FileStorage tree."""
+
+    def __init__(self, storage: FileStorage):
+        self.storage = storage
+        self.root: Optional[TreeNode] = None
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        """Full scan, one top-level subtree per file I/O thread."""
+        base = self.storage.base_path
+        if isinstance(self.storage, ManifestFileStorage):
+            await self.storage.areload()
+            self.root = await self.storage.aio.run(_from_manifest, self.storage)
+            logger.info(f"Template index loaded from {type(self.storage).__name__} {base}")
+            return
+        if not await self.storage.aio.is_dir():
+            self.root = TreeNode(base.name, 0, 0, {})
+            return
+
+        def list_top() -> tuple[TreeNode, list[str]]:
+            st = base.stat()
+            with os.scandir(base) as it:
+                entries = sorted(it, key=lambda e: e.name)
+            children: dict[str, TreeNode] = {}
+            dirs = []
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                else:
+                    est = entry.stat()
+                    children[entry.name] = TreeNode(entry.name, est.st_size, est.st_mtime_ns)
+            return TreeNode(base.name, 0, st.st_mtime_ns, children), dirs
+
+        root, dirs = await self.storage.aio.run(list_top)
+
+        async def scan_category(name: str) -> TreeNode:
+            # Each storyline in a category is scanned on its own thread
+            path = base / name
+            category = await self.storage.aio.run(_scan_shallow, path, name)
+            storylines = [n for n, node in category.children.items() if node.is_dir]
+            scanned = await asyncio.gather(
+                *(self.storage.aio.run(_scan, path / n, n) for n in storylines)
+            )
+            for node in scanned:
+                category.children[node.name] = node
+            return category
+
+        for node in await asyncio.gather(*(scan_category(name) for name in dirs)):
+            root.children[node.name] = node
+        root.children = dict(sorted(root.children.items()))
+        self.root = root
+        logger.info(f"Template index loaded from {base}")
+
+    async def ensure_loaded(self):
+        if self.root is None:
+            async with self._load_lock:
+                if self.root is None:
+                    await self.load()
+
+    async def refresh(self, stat_files: bool = True) -> int:
+        """Incrementally sync with disk. Returns the number of changed nodes.
+
+        With stat_files unset, files are only checked in directories whose
+        mtime changed.
+        """
+        if self.root is None:
+            await self.ensure_loaded()
+            return 0
+        if isinstance(self.storage, ManifestFileStorage):
+            # A new manifest or bundle set replaces the whole tree
+            if not await self.storage.areload():
+                return 0
+            self.root = await self.storage.aio.run(_from_manifest, self.storage)
+            return len(self.storage.files)
+        if not await self.storage.aio.is_dir():
+            return 0
+        return await self.storage.aio.run(_refresh, self.root, self.storage.base_path, stat_files)
+
+    async def refresh_loop(self):
+        """Background task keeping the index in sync with disk."""
+        loop = asyncio.get_running_loop()
+        last_full = loop.time()
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL_SECONDS)
+            full = loop.time() - last_full >= FULL_REFRESH_SECONDS
+            if full:
+                last_full = loop.time()
+            try:
+                changed = await self.refresh(stat_files=full)
+                if changed:
+                    logger.info(f"Template index refreshed ({changed} changes)")
+            except Exception as e:
+                logger.error(f"Template index refresh failed: {e}")
+
+    async def get(self, *parts: str) -> Optional[TreeNode]:
+        """Look up a node by path parts (e.g. category, storyline, 'o_quast')."""
+        await self.ensure_loaded()
+        node = self.root
+        for part in parts:
+            for name in Path(part).parts:
+                node = node.child(name) if node is not None else None
+                if node is None:
+                    return None
+        return node
+
+    async def current(self, *parts: str) -> Optional[TreeNode]:
+        """Look up a node; a file on local disk is stat()ed and its node updated first.
+
+        Returns None for a file removed since the last refresh. Indexed
+        stores are immutable per index, so their nodes are returned as is.
+        """
+        node = await self.get(*parts)
+        if node is None or node.is_dir or isinstance(self.storage, ManifestFileStorage):
+            return node
+        try:
+            st = await self.storage.aio.stat(*parts)
+        except FileNotFoundError:
+            return None
+        _update_file(node, st)
+        return node
+
+    async def digest(self, *parts: str) -> Optional[str]:
+        """SHA-256 of a file's content, cached until its size or mtime changes."""
+        node = await self.get(*parts)
+        if node is None or node.is_dir:
+            return None
+        digest = node.known_digest()
+        if digest is not None:
+            return digest
+        key = (node.size, node.mtime_ns)
+        digest = await self.storage.aio.run(sha256_file, self.storage.resolve(*parts))
+        node._digest = key + (digest,)
+        return digest
+
+
+def _scan_shallow(path: Path, name: str) -> TreeNode:
+    """List one directory; subdirectories get empty placeholder nodes."""
+    st = path.stat()
+    children: dict[str, TreeNode] = {}
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        est = entry.stat()
+        if entry.is_dir():
+            children[entry.name] = TreeNode(entry.name, 0, est.st_mtime_ns, {})
+        else:
+            children[entry.name] = TreeNode(entry.name, est.st_size, est.st_mtime_ns)
+    return TreeNode(name, 0, st.st_mtime_ns, children)
+
+
+template_index = TemplateIndex(template_storage)
@@ -17,20 +17,31 @@ The template directory structure:
         ├── sample_01_R1_fastqc.html
         ├── assembly.fasta
         └── ...
+
+All loaders are coroutines: disk reads go through ``storyline_storage.aio``
+so a slow disk never stalls the event loop.
 """
 import json
-from pathlib import Path
-from typing import Optional
-from functools import lru_cache
+from typing import AsyncIterator, Optional
 
+from app.cache import BoundedCache, env_megabytes
+from app.services.analysis_cache import analysis_kind, storyline_analyses
 from app.storage.files import storyline_storage
 
 # Base path to template directory
 TEMPLATE_BASE_PATH = storyline_storage.base_path
 
+# Lines shown when a compressed text file is requested whole
+GZ_PREVIEW_LINES = 40
+
+# Parsed manifests, reloaded when manifest.json changes on disk
+MANIFEST_CACHE = BoundedCache(
+    "storyline_manifests",
+    max_bytes=env_megabytes("MANIFEST_CACHE_MB", 16),
+)
+
 
-@lru_cache(maxsize=10)
-def load_manifest(storyline_id: str) -> Optional[dict]:
+async def load_manifest(storyline_id: str) -> Optional[dict]:
     """
     Load the manifest.json for a storyline.
 
@@ -40,15 +51,21 @@ def load_manifest(storyline_id: str) -> Optional[dict]:
     Returns:
         Parsed manifest dict or None if not found
     """
-    manifest_path = TEMPLATE_BASE_PATH / storyline_id / "manifest.json"
-    if not manifest_path.exists():
+    manifest = MANIFEST_CACHE.get(storyline_id)
+    if manifest is not None:
+        return manifest
+
+    manifest_path = storyline_storage.resolve(storyline_id, "manifest.json")
+    text = await storyline_storage.aio.read_text(storyline_id, "manifest.json")
+    if text is None:
         return None
 
-    with open(manifest_path, 'r') as f:
-        return json.load(f)
+    manifest = json.loads(text)
+    MANIFEST_CACHE.set(storyline_id, manifest, size=len(text), watch=(manifest_path,))
+    return manifest
 
 
-def get_tool_config(storyline_id: str, tool_name: str) -> Optional[dict]:
+async def get_tool_config(storyline_id: str, tool_name: str) -> Optional[dict]:
     """
     Get configuration for a specific tool from the manifest.
 
@@ -59,7 +76,7 @@ def get_tool_config(storyline_id: str, tool_name: str) -> Optional[dict]:
     Returns:
         Tool configuration dict or None if not found
     """
-    manifest = load_manifest(storyline_id)
+    manifest = await load_manifest(storyline_id)
     if not manifest:
         return None
 
@@ -67,7 +84,7 @@ def get_tool_config(storyline_id: str, tool_name: str) -> Optional[dict]:
     return tools.get(tool_name)
 
 
-def get_terminal_output(storyline_id: str, tool_name: str) -> Optional[str]:
+async def get_terminal_output(storyline_id: str, tool_name: str) -> Optional[str]:
     """
     Load terminal output for a tool from the template files.
 
@@ -78,7 +95,7 @@ def get_terminal_output(storyline_id: str, tool_name: str) -> Optional[str]:
     Returns:
         Terminal output string or None if not found
     """
-    tool_config = get_tool_config(storyline_id, tool_name)
+    tool_config = await get_tool_config(storyline_id, tool_name)
     if not tool_config:
         return None
 
@@ -86,15 +103,10 @@ def get_terminal_output(storyline_id: str, tool_name: str) -> Optional[str]:
     if not terminal_file:
         return None
 
-    terminal_path = TEMPLATE_BASE_PATH / storyline_id / terminal_file
-    if not terminal_path.exists():
-        return None
-
-    with open(terminal_path, 'r') as f:
-        return f.read()
+    return await storyline_storage.aio.read_text(storyline_id, terminal_file)
 
 
-def get_file_content(storyline_id: str, filename: str) -> Optional[str]:
+async def get_file_content(storyline_id: str, filename: str) -> Optional[str]:
     """
     Load output file content from the template files.
 
@@ -105,19 +117,74 @@ def get_file_content(storyline_id: str, filename: str) -> Optional[str]:
     Returns:
         File content string or None if not found
     """
-    file_path = TEMPLATE_BASE_PATH / storyline_id / "files" / filename
-    if not file_path.exists():
+    if not await storyline_storage.aio.exists(storyline_id, "files", filename):
         return None
 
     # Handle binary files
-    if filename.endswith(('.png', '.zip', '.gz')):
+    if filename.endswith(('.png', '.zip')):
         return f"[Binary file: {filename}]"
 
-    with open(file_path, 'r') as f:
-        return f.read()
+    # Compressed text (e.g. .fastq.gz) can be huge: show a decompressed preview
+    if filename.endswith('.gz'):
+        lines = await storyline_storage.aio.read_lines(
+            storyline_id, "files", filename, count=GZ_PREVIEW_LINES
+        )
+        return "\n".join(lines + [f"[... preview of first {GZ_PREVIEW_LINES} lines of {filename}]"])
+
+    return await storyline_storage.aio.read_text(storyline_id, "files", filename)
+
+
+async def get_file_lines(
+    storyline_id: str,
+    filename: str,
+    mode: str = "head",
+    lines: int = 50,
+    page: int = 0,
+) -> Optional[list[str]]:
+    """
+    Read part of an output file by lines, without loading the whole file.
+
+    Args:
+        storyline_id: The storyline identifier
+        filename: The output filename (gzip files are decompressed)
+        mode: 'head', 'tail' or 'page'
+        lines: Number of lines (page size for 'page')
+        page: 0-based page number for 'page'
+
+    Returns:
+        List of lines or None if not found
+    """
+    if not await storyline_storage.aio.is_file(storyline_id, "files", filename):
+        return None
+
+    if mode == "tail":
+        return await storyline_storage.aio.tail_lines(storyline_id, "files", filename, count=lines)
+    start = page * lines if mode == "page" else 0
+    return await storyline_storage.aio.read_lines(storyline_id, "files", filename, start=start, count=lines)
+
+
+def stream_file_content(
+    storyline_id: str,
+    filename: str,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream an output file in chunks, optionally limited to a byte range.
+
+    Args:
+        storyline_id: The storyline identifier
+        filename: The output filename (gzip files are decompressed)
+        start: First byte offset
+        end: Offset to stop before (None for end of file)
+
+    Returns:
+        Async iterator of byte chunks
+    """
+    return storyline_storage.aio.stream(storyline_id, "files", filename, start=start, end=end)
 
 
-def get_tool_files(storyline_id: str, tool_name: str) -> list[str]:
+async def get_tool_files(storyline_id: str, tool_name: str) -> list[str]:
     """
     Get list of output files for a tool.
 
@@ -128,14 +195,14 @@ def get_tool_files(storyline_id: str, tool_name: str) -> list[str]:
     Returns:
         List of output filenames
     """
-    tool_config = get_tool_config(storyline_id, tool_name)
+    tool_config = await get_tool_config(storyline_id, tool_name)
     if not tool_config:
         return []
 
     return tool_config.get("files", [])
 
 
-def get_execution_time(storyline_id: str, tool_name: str) -> float:
+async def get_execution_time(storyline_id: str, tool_name: str) -> float:
     """
     Get execution time for a tool.
 
@@ -146,17 +213,52 @@ def get_execution_time(storyline_id: str, tool_name: str) -> float:
     Returns:
         Execution time in seconds (default 10 if not found)
     """
-    tool_config = get_tool_config(storyline_id, tool_name)
+    tool_config = await get_tool_config(storyline_id, tool_name)
     if not tool_config:
         return 10.0
 
     return float(tool_config.get("execution_time", 10))
 
 
-def get_summary(storyline_id: str, tool_name: str) -> Optional[dict]:
+async def get_file_analysis(storyline_id: str, filename: str):
+    """
+    Get computed statistics for an output file (AssemblyStats for a FASTA,
+    ReadStats for a FASTQ).
+
+    Args:
+        storyline_id: The storyline identifier
+        filename: The output filename
+
+    Returns:
+        Analysis model, or None if the file has no analysis, doesn't exist
+        or can't be parsed
+    """
+    kind = analysis_kind(filename)
+    if kind is None or not await storyline_storage.aio.is_file(storyline_id, "files", filename):
+        return None
+
+    st = await storyline_storage.aio.stat(storyline_id, "files", filename)
+    try:
+        return await storyline_analyses.get(f"{storyline_id}/files/{filename}", kind, st.st_size, st.st_mtime_ns)
+    except ValueError:
+        return None
+
+
+async def _first_file_analysis(tool_config: dict, storyline_id: str):
+    for filename in tool_config.get("files", []):
+        analysis = await get_file_analysis(storyline_id, filename)
+        if analysis is not None:
+            return analysis
+    return None
+
+
+async def get_summary(storyline_id: str, tool_name: str) -> Optional[dict]:
     """
     Get summary statistics for a tool.
 
+    Falls back to statistics computed from the tool's first analysable
+    output file (e.g. assembly.fasta) when the manifest has none.
+
     Args:
         storyline_id: The storyline identifier
         tool_name: The tool name
@@ -164,17 +266,24 @@ def get_summary(storyline_id: str, tool_name: str) -> Optional[dict]:
     Returns:
         Summary dict or None
     """
-    tool_config = get_tool_config(storyline_id, tool_name)
+    tool_config = await get_tool_config(storyline_id, tool_name)
     if not tool_config:
         return None
 
-    return tool_config.get("summary")
+    if "summary" in tool_config:
+        return tool_config["summary"]
+    analysis = await _first_file_analysis(tool_config, storyline_id)
+    return analysis.summary() if analysis is not None else None
 
 
-def get_chart_data(storyline_id: str, tool_name: str) -> Optional[dict]:
+async def get_chart_data(storyline_id: str, tool_name: str) -> Optional[dict]:
     """
     Get chart data for visualization.
 
+    Falls back to a chart computed from the tool's first analysable output
+    file (e.g. the contig length histogram of assembly.fasta) when the
+    manifest has none.
+
     Args:
         storyline_id: The storyline identifier
         tool_name: The tool name
@@ -182,14 +291,17 @@ def get_chart_data(storyline_id: str, tool_name: str) -> Optional[dict]:
     Returns:
         Chart data dict or None
     """
-    tool_config = get_tool_config(storyline_id, tool_name)
+    tool_config = await get_tool_config(storyline_id, tool_name)
     if not tool_config:
         return None
 
-    return tool_config.get("chart_data")
+    if "chart_data" in tool_config:
+        return tool_config["chart_data"]
+    analysis = await _first_file_analysis(tool_config, storyline_id)
+    return analysis.chart_data() if analysis is not None else None
 
 
-def get_all_tools(storyline_id: str) -> list[str]:
+async def get_all_tools(storyline_id: str) -> list[str]:
     """
     Get list of all tools defined for a storyline.
 
@@ -199,29 +311,31 @@ def get_all_tools(storyline_id: str) -> list[str]:
     Returns:
         List of tool names
     """
-    manifest = load_manifest(storyline_id)
+    manifest = await load_manifest(storyline_id)
     if not manifest:
         return []
 
     return list(manifest.get("tools", {}).keys())
 
 
-def list_storylines() -> list[str]:
+async def list_storylines() -> list[str]:
     """
     List all available storylines.
 
     Returns:
         List of storyline IDs
     """
-    if not TEMPLATE_BASE_PATH.exists():
-        return []
+    def scan() -> list[str]:
+        if not TEMPLATE_BASE_PATH.exists():
+            return []
+        return [
+            d.name for d in TEMPLATE_BASE_PATH.iterdir()
+            if d.is_dir() and (d / "manifest.json").exists()
+        ]
 
-    return [
-        d.name for d in TEMPLATE_BASE_PATH.iterdir()
-        if d.is_dir() and (d / "manifest.json").exists()
-    ]
+    return await storyline_storage.aio.run(scan)
 
 
 def clear_cache():
     """Clear the manifest cache (useful for development)."""
-    load_manifest.cache_clear()
+    MANIFEST_CACHE.clear()
@@ -10,9 +10,15 @@ No actual bioinformatics tools run per user - just playback of stored results.
 """
 from pydantic import BaseModel
 from typing import Optional
+from functools import cached_property
 import json
 from pathlib import Path
 
+from app.cache import BoundedCache, env_megabytes
+from app.storage.command_index import CommandIndex
+from app.storage.frames import PlaybackFrames, render_frames
+from app.storage.pack import NarrativePack
+
 
 class CommandOutput(BaseModel):
     """Stored output for a command."""
@@ -23,6 +29,11 @@ class CommandOutput(BaseModel):
     chart_data: Optional[dict] = None  # Data for Plotly charts
     summary: Optional[dict] = None  # Summary statistics
 
+    @cached_property
+    def frames(self) -> PlaybackFrames:
+        """Terminal frames for playback, rendered once and shared by all sessions."""
+        return render_frames(self)
+
 
 class StepResults(BaseModel):
     """All results for a narrative step."""
@@ -36,26 +47,93 @@ class NarrativeResults(BaseModel):
     steps: list[StepResults]
 
 
-# In-memory storage for pre-computed results
+RESULTS_DIR = Path(__file__).parent.parent.parent / "content" / "results"
+
+# Results registered in code rather than loaded from content/results
 # In production, this would be loaded from files/database
 PRECOMPUTED_RESULTS: dict[str, NarrativeResults] = {}
 
 
+class LoadedNarrative:
+    """A narrative's command lookup plus whichever source backs it."""
+    __slots__ = ("index", "results", "pack")
+
+    def __init__(
+        self,
+        index: CommandIndex,
+        results: Optional[NarrativeResults] = None,
+        pack: Optional[NarrativePack] = None,
+    ):
+        self.index = index
+        self.results = results
+        self.pack = pack
+
+
+# Loaded narratives, bounded by approximate resident size and reloaded
+# when their JSON or pack file changes on disk
+NARRATIVE_CACHE = BoundedCache(
+    "narrative_results",
+    max_bytes=env_megabytes("RESULTS_CACHE_MB", 256),
+)
+
+
+def _results_paths(narrative_id: str) -> tuple[Path, Path]:
+    return RESULTS_DIR / f"{narrative_id}.json", RESULTS_DIR / f"{narrative_id}.pack"
+
+
+def _load_narrative(narrative_id: str) -> Optional[LoadedNarrative]:
+    """Get a narrative from the cache, loading it from disk on a miss."""
+    narrative = NARRATIVE_CACHE.get(narrative_id)
+    if narrative is not None:
+        return narrative
+
+    registered = PRECOMPUTED_RESULTS.get(narrative_id)
+    if registered is not None:
+        narrative = LoadedNarrative(CommandIndex.from_steps(registered.steps), results=registered)
+        NARRATIVE_CACHE.set(narrative_id, narrative)
+        return narrative
+
+    json_path, pack_path = _results_paths(narrative_id)
+    json_stat = json_path.stat() if json_path.exists() else None
+    pack_stat = pack_path.stat() if pack_path.exists() else None
+
+    # Prefer the pack unless the JSON was edited after it was built
+    if pack_stat and (json_stat is None or json_stat.st_mtime <= pack_stat.st_mtime):
+        pack = NarrativePack(pack_path)
+        narrative = LoadedNarrative(pack.command_index(), pack=pack)
+        size = pack.resident_bytes
+    elif json_stat:
+        with open(json_path) as f:
+            data = json.load(f)
+        results = NarrativeResults(**data)
+        narrative = LoadedNarrative(CommandIndex.from_steps(results.steps), results=results)
+        size = json_stat.st_size
+    else:
+        return None
+
+    NARRATIVE_CACHE.set(narrative_id, narrative, size=size, watch=(json_path, pack_path))
+    return narrative
+
+
 def load_narrative_results(narrative_id: str) -> Optional[NarrativeResults]:
     """Load pre-computed results for a narrative."""
     if narrative_id in PRECOMPUTED_RESULTS:
         return PRECOMPUTED_RESULTS[narrative_id]
 
-    # Try to load from JSON file
-    results_path = Path(__file__).parent.parent.parent / "content" / "results" / f"{narrative_id}.json"
-    if results_path.exists():
-        with open(results_path) as f:
-            data = json.load(f)
-            results = NarrativeResults(**data)
-            PRECOMPUTED_RESULTS[narrative_id] = results
-            return results
+    narrative = _load_narrative(narrative_id)
+    if narrative is None:
+        return None
+    if narrative.results is None:
+        # Materialize the full tree from a pack on request
+        narrative.results = narrative.pack.to_results()
+        _charge_pack(narrative_id, narrative)
+    return narrative.results
+
 
-    return None
+def _charge_pack(narrative_id: str, narrative: LoadedNarrative):
+    """Charge a pack-backed narrative's decoded outputs to the cache budget."""
+    if narrative.pack is not None:
+        NARRATIVE_CACHE.resize(narrative_id, narrative, narrative.pack.resident_bytes)
 
 
 def get_command_output(narrative_id: str, step_id: int, command: str) -> Optional[CommandOutput]:
@@ -70,18 +148,10 @@ def get_command_output(narrative_id: str, step_id: int, command: str) -> Optiona
     Returns:
         CommandOutput if found, None otherwise
     """
-    results = load_narrative_results(narrative_id)
-    if not results:
+    narrative = _load_narrative(narrative_id)
+    if narrative is None:
         return None
-
-    for step in results.steps:
-        if step.step_id == step_id:
-            for cmd_output in step.commands:
-                # Match command (could be exact or fuzzy matching)
-                if command.strip() == cmd_output.command.strip():
-                    return cmd_output
-                # Also match if user typed the base command
-                if command.strip().split()[0] == cmd_output.command.split()[0]:
-                    return cmd_output
-
-    return None
+    output = narrative.index.lookup(step_id, command)
+    # A hit may have decoded another output
+    _charge_pack(narrative_id, narrative)
+    return output
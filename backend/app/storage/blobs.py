@@ -0,0 +1,99 @@
+"""
+Build a content-addressed template store.
+
+Many storylines ship identical inputs and outputs (the same FASTQ, the
+same reference databases, the same reports). Ingesting a template tree
+hashes every file and stores each distinct content once:
+
+    STORE/objects/ab/<sha256>   one blob per distinct file
+    STORE/manifest.json         {"version": 1,
+                                 "files": {path: [sha256, size, mtime_ns]},
+                                 "dirs": [empty directories]}
+
+Serve the store by pointing TEMPLATE_BLOB_STORE at it (see
+BlobFileStorage). Re-ingesting reuses existing blobs and replaces the
+manifest atomically, so a running server picks up the new tree on its
+next index refresh. Blobs no longer referenced are left in place; remove
+them with --prune once no server uses the old manifest.
+
+Usage:
+    python -m app.storage.blobs SOURCE_DIR STORE_DIR [--prune]
+"""
+from pathlib import Path
+import json
+import os
+import shutil
+import sys
+
+from app.storage.files import BLOB_MANIFEST, blob_path
+from app.storage.streaming import sha256_file
+
+MANIFEST_VERSION = 1
+
+
+def ingest(source: Path, store: Path) -> dict:
+    """Store every file under source as a blob and write the manifest."""
+    files: dict[str, list] = {}
+    dirs: list[str] = []
+    stored = 0
+    deduplicated_bytes = 0
+
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        rel_dir = Path(dirpath).relative_to(source)
+        if not dirnames and not filenames and rel_dir != Path("."):
+            dirs.append(rel_dir.as_posix())
+        for name in sorted(filenames):
+            path = Path(dirpath) / name
+            digest = sha256_file(path)
+            target = blob_path(store, digest)
+            if target.exists():
+                deduplicated_bytes += path.stat().st_size
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(target.name + ".tmp")
+                shutil.copyfile(path, tmp_path)
+                tmp_path.replace(target)
+                stored += 1
+            st = target.stat()
+            files[(rel_dir / name).as_posix()] = [digest, st.st_size, st.st_mtime_ns]
+
+    manifest = {"version": MANIFEST_VERSION, "files": files, "dirs": dirs}
+    manifest_path = store / BLOB_MANIFEST
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, sort_keys=True))
+    tmp_path.replace(manifest_path)
+
+    return {
+        "files": len(files),
+        "blobs": len({entry[0] for entry in files.values()}),
+        "stored": stored,
+        "deduplicated_bytes": deduplicated_bytes,
+    }
+
+
+def prune(store: Path) -> int:
+    """Delete blobs the current manifest doesn't reference. Returns blobs removed."""
+    manifest = json.loads((store / BLOB_MANIFEST).read_text())
+    referenced = {entry[0] for entry in manifest["files"].values()}
+    removed = 0
+    for blob in (store / "objects").glob("*/*"):
+        if blob.name not in referenced:
+            blob.unlink()
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--prune"]
+    if len(args) != 2:
+        print("Usage: python -m app.storage.blobs SOURCE_DIR STORE_DIR [--prune]")
+        sys.exit(1)
+    source, store = Path(args[0]), Path(args[1])
+    stats = ingest(source, store)
+    print(
+        f"{stats['files']} files -> {stats['blobs']} blobs ({stats['stored']} new), "
+        f"{stats['deduplicated_bytes']} bytes deduplicated"
+    )
+    if "--prune" in sys.argv:
+        print(f"Pruned {prune(store)} unreferenced blobs")
@@ -0,0 +1,208 @@
+"""
+Single-file storyline bundles.
+
+A storyline under ``template/`` is hundreds of small files; a bundle packs
+one storyline into one file with a central index, so serving it costs
+one mmap instead of a directory lookup and an inode per file.
+
+Layout (all integers little-endian):
+
+    header  magic b"BLBN" | version u16 | entry count u32
+            | index offset u64 | index length u32
+    data    file contents, back to back, uncompressed
+    index   per entry: offset u64 | size u64 | mtime_ns i64 | sha256 (32 bytes)
+            | path length u16 | media type length u8 | path | media type
+
+Paths are relative to the storyline folder, POSIX-style. An empty
+directory is recorded as an entry whose path ends with "/".
+
+Build bundles for every storyline with:
+    python -m app.storage.bundle SOURCE_DIR OUT_DIR
+which writes OUT_DIR/{category}/{storyline}.bundle. Serve them by
+pointing TEMPLATE_BUNDLE_DIR at OUT_DIR (see BundleFileStorage).
+"""
+from pathlib import Path
+from typing import Optional
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+
+BUNDLE_MAGIC = b"BLBN"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".bundle"
+
+_HEADER = struct.Struct("<4sHIQI")
+_ENTRY = struct.Struct("<QQq32sHB")
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BundleError(ValueError):
+    """Raised when a bundle file is malformed or has an unknown version."""
+
+
+class BundleEntry:
+    """One file inside a bundle."""
+    __slots__ = ("bundle", "path", "offset", "size", "mtime_ns", "sha256", "media_type")
+
+    def __init__(self, bundle, path, offset, size, mtime_ns, sha256, media_type):
+        self.bundle = bundle
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        self.media_type = media_type
+
+    def read(self) -> bytes:
+        return self.bundle.mm[self.offset:self.offset + self.size]
+
+    def open(self) -> io.BufferedReader:
+        """A seekable binary file object over the entry's bytes in the mmap."""
+        return io.BufferedReader(_MmapSlice(self.bundle.mm, self.offset, self.size))
+
+    def stat(self) -> os.stat_result:
+        from app.storage.files import stat_result
+        return stat_result(self.size, self.mtime_ns)
+
+
+class _MmapSlice(io.RawIOBase):
+    """Read-only raw file view of a byte range of an mmap."""
+
+    def __init__(self, mm: mmap.mmap, offset: int, size: int):
+        self._mm = mm
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), self._size - self._pos))
+        start = self._offset + self._pos
+        b[:n] = self._mm[start:start + n]
+        self._pos += n
+        return n
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._size
+        self._pos = max(0, pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class StorylineBundle:
+    """A memory-mapped bundle with its index parsed into BundleEntry objects."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, count, index_offset, index_length = _HEADER.unpack_from(self.mm, 0)
+        except struct.error:
+            raise BundleError(f"{path}: truncated header")
+        if magic != BUNDLE_MAGIC:
+            raise BundleError(f"{path}: not a storyline bundle")
+        if version != BUNDLE_VERSION:
+            raise BundleError(f"{path}: unsupported bundle version {version}")
+        if index_offset + index_length > len(self.mm):
+            raise BundleError(f"{path}: index out of bounds")
+
+        self.entries: dict[str, BundleEntry] = {}
+        # Empty directories (no entries below them)
+        self.dirs: list[str] = []
+        pos = index_offset
+        for _ in range(count):
+            offset, size, mtime_ns, digest, path_len, type_len = _ENTRY.unpack_from(self.mm, pos)
+            pos += _ENTRY.size
+            name = self.mm[pos:pos + path_len].decode()
+            pos += path_len
+            media_type = self.mm[pos:pos + type_len].decode()
+            pos += type_len
+            if name.endswith("/"):
+                self.dirs.append(name.rstrip("/"))
+                continue
+            if offset + size > index_offset:
+                raise BundleError(f"{path}: entry '{name}' out of bounds")
+            self.entries[name] = BundleEntry(self, name, offset, size, mtime_ns, digest.hex(), media_type)
+
+    def get(self, name: str) -> Optional[BundleEntry]:
+        return self.entries.get(name)
+
+
+def build_bundle(source: Path, out_path: Path) -> int:
+    """Pack one storyline folder into a bundle. Returns the number of files."""
+    from app.storage.files import media_type_for
+
+    files: list[tuple[str, Path]] = []
+    empty_dirs: list[str] = []
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        rel_dir = Path(dirpath).relative_to(source)
+        if not dirnames and not filenames and rel_dir != Path("."):
+            empty_dirs.append(rel_dir.as_posix() + "/")
+        for name in sorted(filenames):
+            files.append(((rel_dir / name).as_posix(), Path(dirpath) / name))
+
+    index = bytearray()
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as out:
+        out.write(b"\0" * _HEADER.size)
+        for name, path in files:
+            st = path.stat()
+            offset = out.tell()
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    out.write(chunk)
+            size = out.tell() - offset
+            encoded_name = name.encode()
+            media_type = media_type_for(path).encode()
+            index += _ENTRY.pack(offset, size, st.st_mtime_ns, digest.digest(), len(encoded_name), len(media_type))
+            index += encoded_name + media_type
+        for name in empty_dirs:
+            encoded_name = name.encode()
+            index += _ENTRY.pack(0, 0, 0, b"\0" * 32, len(encoded_name), 0) + encoded_name
+
+        index_offset = out.tell()
+        out.write(index)
+        out.seek(0)
+        count = len(files) + len(empty_dirs)
+        out.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, count, index_offset, len(index)))
+    tmp_path.replace(out_path)
+    return len(files)
+
+
+def build_all(source: Path, out_dir: Path) -> list[Path]:
+    """Build {category}/{storyline}.bundle for every storyline under source."""
+    written = []
+    for category in sorted(p for p in source.iterdir() if p.is_dir()):
+        for storyline in sorted(p for p in category.iterdir() if p.is_dir()):
+            out_path = out_dir / category.name / (storyline.name + BUNDLE_SUFFIX)
+            build_bundle(storyline, out_path)
+            written.append(out_path)
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m app.storage.bundle SOURCE_DIR OUT_DIR")
+        sys.exit(1)
+    for bundle_path in build_all(Path(sys.argv[1]), Path(sys.argv[2])):
+        print(f"{bundle_path} ({bundle_path.stat().st_size} bytes)")
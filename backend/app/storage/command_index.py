@@ -0,0 +1,98 @@
+"""
+Compiled command lookup for pre-computed narrative results.
+
+A narrative's recorded commands are indexed once when its results are
+loaded, so resolving what the user typed no longer walks every step and
+every CommandOutput on each keystroke-submitted command:
+
+- exact:  (step_id, whitespace-collapsed command) -> output   O(1)
+- base:   (step_id, first token)                 -> output   O(1)
+- trie:   step_id -> token-level prefix trie                 O(tokens)
+
+Resolution order is exact, then longest shared token prefix (which
+covers the base command), so a step recording both
+``abricate --db ncbi`` and ``abricate --db card`` plays back the variant
+the user actually typed.
+
+Indexed values are opaque: parsed CommandOutputs for JSON results, or
+entry numbers for packed results, turned into a CommandOutput by the
+index's ``resolve`` callable only when a lookup hits.
+"""
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from app.storage import CommandOutput, StepResults
+
+
+class _TrieNode:
+    """A node in the token-level prefix trie."""
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        # First recorded value whose tokens pass through this node
+        self.value: Any = None
+
+
+class CommandIndex:
+    """Per-narrative index of recorded commands, built once at load time."""
+
+    def __init__(self, resolve: Optional[Callable[[Any], "CommandOutput"]] = None):
+        self.exact: dict[tuple[int, str], Any] = {}
+        self.base: dict[tuple[int, str], Any] = {}
+        self.tries: dict[int, _TrieNode] = {}
+        self.resolve = resolve
+
+    @classmethod
+    def from_steps(cls, steps: Iterable["StepResults"]) -> "CommandIndex":
+        """Index already-parsed step results."""
+        index = cls()
+        for step in steps:
+            for cmd_output in step.commands:
+                index.add(step.step_id, cmd_output.command, cmd_output)
+        return index
+
+    def add(self, step_id: int, command: str, value: Any):
+        """Index a recorded command. Earlier recordings win on ties."""
+        tokens = command.split()
+        if not tokens:
+            return
+
+        self.exact.setdefault((step_id, " ".join(tokens)), value)
+        self.base.setdefault((step_id, tokens[0]), value)
+
+        node = self.tries.setdefault(step_id, _TrieNode())
+        for token in tokens:
+            node = node.children.setdefault(token, _TrieNode())
+            if node.value is None:
+                node.value = value
+
+    def lookup(self, step_id: int, command: str) -> Optional["CommandOutput"]:
+        """
+        Resolve a typed command to its recorded output.
+
+        Args:
+            step_id: Current step in the narrative
+            command: The command user typed
+
+        Returns:
+            CommandOutput if found, None otherwise
+        """
+        tokens = command.split()
+        if not tokens:
+            return None
+
+        found = self.exact.get((step_id, " ".join(tokens)))
+        if found is None:
+            if (step_id, tokens[0]) not in self.base:
+                return None
+
+            # Walk the trie as far as the typed tokens agree with a recording
+            node = self.tries[step_id]
+            for token in tokens:
+                node = node.children.get(token)
+                if node is None:
+                    break
+                found = node.value
+
+        return self.resolve(found) if self.resolve else found
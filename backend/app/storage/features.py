@@ -0,0 +1,402 @@
+"""
+Interval index over GFF annotation files.
+
+The output panel draws genome-browser views of Prokka annotations: the
+genes on a stretch of one contig, or wherever a gene of a given name is.
+Instead of shipping the whole GFF to the browser, each file gets a
+feature index and the panel asks for a region or a name.
+
+Features are sorted by (seqid, start) into parallel NumPy arrays. For each
+seqid the index also keeps the running maximum of feature ends, which
+never decreases, so the features overlapping [start, end] are found with
+two binary searches (the first whose running max end reaches ``start``,
+the last that starts by ``end``) and one vectorized ``end >= start``
+filter over that slice. Names (Name, gene, locus_tag and ID attributes)
+are kept sorted for exact or prefix lookups with bisect.
+
+Indexes are written next to the record indexes (RECORD_INDEX_DIR, with a
+``.fidx`` suffix): the arrays as raw little-endian bytes, then two
+zlib-compressed blocks: JSON with seqids, types, sources and the name
+table, and the attribute strings (Prokka attributes repeat a lot). Like
+record indexes they carry the size and mtime of the GFF they were built
+from and are rebuilt when those change.
+
+Build indexes for every GFF with:
+    python -m app.storage.features
+(also run in the background at startup; current indexes are skipped).
+"""
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+import asyncio
+import json
+import logging
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from app.cache import BoundedCache, env_megabytes
+from app.storage.files import FileStorage, template_storage
+from app.storage.records import RECORD_INDEX_DIR, parse_attributes, record_format
+from app.storage.streaming import open_binary
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"BLFI"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".fidx"
+
+# magic | version u16 | pad | source size u64 | source mtime_ns i64 | feature count u64
+# | metadata length u32 | compressed attributes length u32
+_HEADER = struct.Struct("<4sHxxQqQII")
+
+# Per-feature arrays, in file order: name -> dtype
+_COLUMNS = {
+    "starts": np.dtype("<i8"),
+    "ends": np.dtype("<i8"),
+    "numbers": np.dtype("<u4"),  # Feature number in the file (as in the records endpoint)
+    "types": np.dtype("<u2"),  # Index into metadata["types"]
+    "sources": np.dtype("<u2"),  # Index into metadata["sources"]
+    "strands": np.dtype("S1"),
+    "phases": np.dtype("S1"),
+    "scores": np.dtype("<f8"),  # NaN for "."
+}
+
+# Attributes a feature can be looked up by
+NAME_ATTRIBUTES = ("Name", "gene", "locus_tag", "ID")
+
+
+class FeatureIndex:
+    """Features of one GFF version, sorted by (seqid, start), with region and name lookups."""
+
+    def __init__(
+        self, size: int, mtime_ns: int, columns: dict[str, np.ndarray], metadata: dict, attributes: list[str]
+    ):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.columns = columns
+        self.metadata = metadata
+        # Column 9 of each row, unparsed
+        self.attributes = attributes
+        self.starts = columns["starts"]
+        self.ends = columns["ends"]
+        self.count = len(self.starts)
+        # seqid -> (first row, end row); rows are contiguous per seqid
+        self.seqids = {seqid: (lo, hi) for seqid, lo, hi in metadata["seqids"]}
+        self._seqid_names = [seqid for seqid, _, _ in metadata["seqids"]]
+        self._seqid_ends = np.array([hi for _, _, hi in metadata["seqids"]], dtype=np.int64)
+
+        # Running max of ends within each seqid: non-decreasing, so searchable
+        self.max_ends = self.ends.copy()
+        for lo, hi in self.seqids.values():
+            np.maximum.accumulate(self.max_ends[lo:hi], out=self.max_ends[lo:hi])
+
+        # Lower-cased names, sorted, each with the rows that carry it
+        self.names = [name for name, _ in metadata["names"]]
+        self.name_rows = [rows for _, rows in metadata["names"]]
+
+    def nbytes(self) -> int:
+        arrays = sum(column.nbytes for column in self.columns.values()) + self.max_ends.nbytes
+        strings = sum(len(text) + 64 for text in self.attributes)
+        return arrays + strings + sum(len(name) + 96 for name in self.names)
+
+    def sequences(self) -> list[dict]:
+        """Each seqid with its length (from ##sequence-region, else its last feature end).
+
+        Declared sequences come first, in file order, including any without features.
+        """
+        lengths = self.metadata["lengths"]
+        sequences = []
+        for seqid in [*lengths, *(seqid for seqid in self.seqids if seqid not in lengths)]:
+            lo, hi = self.seqids.get(seqid, (0, 0))
+            length = lengths.get(seqid, int(self.max_ends[hi - 1]) if hi > lo else 0)
+            sequences.append({"seqid": seqid, "length": length, "features": hi - lo})
+        return sequences
+
+    def overlapping(self, seqid: str, start: int, end: int) -> np.ndarray:
+        """Rows of features on seqid overlapping [start, end] (1-based, inclusive), by start."""
+        lo, hi = self.seqids.get(seqid, (0, 0))
+        first = lo + int(np.searchsorted(self.max_ends[lo:hi], start, side="left"))
+        last = lo + int(np.searchsorted(self.starts[lo:hi], end, side="right"))
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        return first + np.flatnonzero(self.ends[first:last] >= start)
+
+    def named(self, name: str, prefix: bool = False) -> list[int]:
+        """Rows of features with a name equal to (or starting with) name, case-insensitively."""
+        key = name.lower()
+        i = bisect_left(self.names, key)
+        rows: list[int] = []
+        while i < len(self.names) and (self.names[i] == key or (prefix and self.names[i].startswith(key))):
+            rows.extend(self.name_rows[i])
+            if not prefix:
+                break
+            i += 1
+        return sorted(set(rows))
+
+    def query(
+        self,
+        seqid: Optional[str],
+        start: int = 1,
+        end: Optional[int] = None,
+        name: Optional[str] = None,
+        prefix: bool = False,
+        type_: Optional[str] = None,
+    ) -> np.ndarray:
+        """Rows matching a name (optionally on one seqid) or else a region, optionally of one type."""
+        if name is not None:
+            rows = np.array(self.named(name, prefix=prefix), dtype=np.int64)
+            if seqid is not None:
+                lo, hi = self.seqids.get(seqid, (0, 0))
+                rows = rows[(rows >= lo) & (rows < hi)]
+        else:
+            rows = self.overlapping(seqid, start, end if end is not None else np.iinfo(np.int64).max)
+        if type_ is not None:
+            types = self.metadata["types"]
+            code = types.index(type_) if type_ in types else -1
+            rows = rows[self.columns["types"][rows] == code]
+        return rows
+
+    def features(self, rows) -> list[dict]:
+        """Features at the given rows, in the shape of the records endpoint's GFF records."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns, metadata = self.columns, self.metadata
+        seqids = np.searchsorted(self._seqid_ends, rows, side="right").tolist()
+        picked = {name: column[rows].tolist() for name, column in columns.items()}
+        return [
+            {
+                "index": picked["numbers"][i],
+                "seqid": self._seqid_names[seqids[i]],
+                "source": metadata["sources"][picked["sources"][i]],
+                "type": metadata["types"][picked["types"][i]],
+                "start": picked["starts"][i],
+                "end": picked["ends"][i],
+                "score": None if picked["scores"][i] != picked["scores"][i] else picked["scores"][i],
+                "strand": picked["strands"][i].decode(),
+                "phase": picked["phases"][i].decode(),
+                "attributes": parse_attributes(self.attributes[row]),
+            }
+            for i, row in enumerate(rows.tolist())
+        ]
+
+    def write(self, path: Path):
+        metadata = zlib.compress(json.dumps(self.metadata, separators=(",", ":")).encode(), 6)
+        # Column 9 never contains a newline
+        attributes = zlib.compress("\n".join(self.attributes).encode(), 6)
+        header = _HEADER.pack(
+            INDEX_MAGIC, INDEX_VERSION, self.size, self.mtime_ns, self.count, len(metadata), len(attributes)
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for name, dtype in _COLUMNS.items():
+                f.write(self.columns[name].astype(dtype, copy=False).tobytes())
+            f.write(metadata)
+            f.write(attributes)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def read_version(path: Path) -> Optional[tuple[int, int]]:
+        """(source size, source mtime_ns) an index file was built from, without loading it."""
+        try:
+            with open(path, "rb") as f:
+                magic, version, size, mtime_ns, _, _, _ = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return None
+        return size, mtime_ns
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["FeatureIndex"]:
+        """Load an index file, or None if it is missing or unreadable."""
+        try:
+            with open(path, "rb") as f:
+                magic, version, size, mtime_ns, count, meta_len, attributes_len = _HEADER.unpack(
+                    f.read(_HEADER.size)
+                )
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return None
+                columns = {}
+                for name, dtype in _COLUMNS.items():
+                    data = f.read(count * dtype.itemsize)
+                    if len(data) != count * dtype.itemsize:
+                        return None
+                    columns[name] = np.frombuffer(data, dtype=dtype).copy()
+                metadata = json.loads(zlib.decompress(f.read(meta_len)))
+                attributes = zlib.decompress(f.read(attributes_len)).decode().split("\n") if count else []
+        except (OSError, struct.error, ValueError, zlib.error):
+            return None
+        return cls(size, mtime_ns, columns, metadata, attributes)
+
+
+def build_feature_index(source, size: int, mtime_ns: int) -> FeatureIndex:
+    """Parse a GFF (optionally gzipped) into a FeatureIndex in one pass."""
+    seqids: dict[str, int] = {}
+    types: dict[str, int] = {}
+    sources: dict[str, int] = {}
+    lengths: dict[str, int] = {}
+    rows = []
+    attributes = []
+    number = 0
+
+    with open_binary(source) as f:
+        for raw in f:
+            if raw.startswith(b"##FASTA"):
+                break
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if line.startswith("##sequence-region"):
+                parts = line.split()
+                if len(parts) >= 4 and parts[3].isdigit():
+                    lengths[parts[1]] = int(parts[3])
+                continue
+            if not line.strip() or line.startswith("#"):
+                continue
+            # Numbered like the records endpoint: every non-comment line counts
+            fields = line.split("\t")
+            feature_number = number
+            number += 1
+            if len(fields) < 8 or not fields[3].isdigit() or not fields[4].isdigit():
+                continue
+            fields += [""] * (9 - len(fields))
+            seqid, source_name, type_, start, end, score, strand, phase, attribute_text = fields[:9]
+            try:
+                score_value = float("nan") if score in ("", ".") else float(score)
+            except ValueError:
+                score_value = float("nan")
+            rows.append((
+                seqids.setdefault(seqid, len(seqids)),
+                int(start),
+                int(end),
+                feature_number,
+                types.setdefault(type_, len(types)),
+                sources.setdefault(source_name, len(sources)),
+                (strand or ".")[:1].encode(),
+                (phase or ".")[:1].encode(),
+                score_value,
+            ))
+            attributes.append(attribute_text)
+
+    seqid_codes = np.array([row[0] for row in rows], dtype=np.int64)
+    starts = np.array([row[1] for row in rows], dtype=np.int64)
+    ends = np.array([row[2] for row in rows], dtype=np.int64)
+    order = np.lexsort((ends, starts, seqid_codes))
+    columns = {
+        "starts": starts[order],
+        "ends": ends[order],
+        "numbers": np.array([row[3] for row in rows], dtype=np.uint32)[order],
+        "types": np.array([row[4] for row in rows], dtype=np.uint16)[order],
+        "sources": np.array([row[5] for row in rows], dtype=np.uint16)[order],
+        "strands": np.array([row[6] for row in rows], dtype="S1")[order],
+        "phases": np.array([row[7] for row in rows], dtype="S1")[order],
+        "scores": np.array([row[8] for row in rows], dtype=np.float64)[order],
+    }
+    bounds = np.searchsorted(seqid_codes[order], np.arange(len(seqids) + 1))
+    names = list(seqids)
+    attributes = [attributes[i] for i in order.tolist()]
+    metadata = {
+        "seqids": [[names[code], int(bounds[code]), int(bounds[code + 1])] for code in range(len(names))],
+        "types": list(types),
+        "sources": list(sources),
+        "lengths": lengths,
+        "names": _name_table(attributes),
+    }
+    return FeatureIndex(size, mtime_ns, columns, metadata, attributes)
+
+
+def _name_table(attributes: list[str]) -> list[list]:
+    """[[lower-cased name, [rows]], ...] sorted by name, from the NAME_ATTRIBUTES of each row."""
+    rows_by_name: dict[str, list[int]] = {}
+    for row, text in enumerate(attributes):
+        parsed = parse_attributes(text)
+        for key in NAME_ATTRIBUTES:
+            value = parsed.get(key)
+            if value:
+                rows = rows_by_name.setdefault(value.lower(), [])
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+    return [[name, rows_by_name[name]] for name in sorted(rows_by_name)]
+
+
+def is_feature_file(name: str) -> bool:
+    return record_format(name) == "gff"
+
+
+class FeatureIndexer:
+    """Builds, persists and caches feature indexes for a FileStorage tree."""
+
+    def __init__(self, storage: FileStorage, cache_dir: Path):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        # sha256 or (relative path, size, mtime_ns) -> FeatureIndex
+        self._indexes = BoundedCache("feature_indexes", max_bytes=env_megabytes("FEATURE_INDEX_CACHE_MB", 32))
+        # Builds in progress, shared by concurrent requests for the same file
+        self._building: dict = {}
+
+    def index_path(self, rel_path: str, digest: Optional[str] = None) -> Path:
+        if digest is not None:
+            return self.cache_dir / "objects" / digest[:2] / (digest + INDEX_SUFFIX)
+        return self.cache_dir / (rel_path + INDEX_SUFFIX)
+
+    def load_or_build(self, rel_path: str, size: int, mtime_ns: int, digest: Optional[str]) -> FeatureIndex:
+        """Blocking: read the index from disk if current, else build and save it."""
+        path = self.index_path(rel_path, digest)
+        index = FeatureIndex.read(path)
+        if index is not None and (index.size, index.mtime_ns) == (size, mtime_ns):
+            return index
+
+        index = build_feature_index(self.storage.source(rel_path), size, mtime_ns)
+        try:
+            index.write(path)
+        except OSError as e:
+            logger.warning(f"Could not save feature index for {rel_path}: {e}")
+        logger.info(f"Indexed {index.count} features in {rel_path}")
+        return index
+
+    async def index(self, rel_path: str, size: int, mtime_ns: int, digest: Optional[str] = None) -> FeatureIndex:
+        """The feature index for a file version, building it at most once at a time."""
+        key = digest or (rel_path, size, mtime_ns)
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.storage.aio.run(self.load_or_build, rel_path, size, mtime_ns, digest))
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        index = await asyncio.shield(task)
+        self._indexes.set(key, index, size=index.nbytes())
+        return index
+
+    def build(self) -> int:
+        """Build or refresh the index of every GFF file. Returns indexes written."""
+        count = 0
+        for rel_path in self.storage.iter_files():
+            if not is_feature_file(rel_path):
+                continue
+            try:
+                st = self.storage.stat(rel_path)
+                digest = self.storage.digest(rel_path)
+                if FeatureIndex.read_version(self.index_path(rel_path, digest)) == (st.st_size, st.st_mtime_ns):
+                    continue
+                self.load_or_build(rel_path, st.st_size, st.st_mtime_ns, digest)
+                count += 1
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to index features of {rel_path}: {e}")
+        return count
+
+
+template_features = FeatureIndexer(template_storage, RECORD_INDEX_DIR)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        print("Usage: python -m app.storage.features")
+        sys.exit(1)
+    written = template_features.build()
+    print(f"Wrote {written} feature indexes under {RECORD_INDEX_DIR}")
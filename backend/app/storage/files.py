@@ -3,17 +3,86 @@ File storage abstraction.
 
 Default implementation uses local disk. Swap to a GCSFileStorage subclass
 to serve files from Google Cloud Storage without changing callers.
+BlobFileStorage serves a content-addressed store (TEMPLATE_BLOB_STORE)
+where identical files are kept once; BundleFileStorage serves storylines
+packed into mmap'd single-file bundles (TEMPLATE_BUNDLE_DIR), and
+app.storage.remote an object store behind a local disk cache
+(TEMPLATE_OBJECT_STORE).
+
+Every FileStorage also exposes ``.aio``, an awaitable mirror of its API
+that runs the blocking calls on a dedicated file I/O thread pool, for use
+from async request handlers and the websocket loop.
 """
+import asyncio
 import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable, Iterator, Optional
+
+from app.storage import streaming
+
+if TYPE_CHECKING:
+    from app.storage.bundle import BundleEntry, StorylineBundle
+
+# Threads dedicated to blocking file I/O, so slow disks can't starve the
+# default executor used elsewhere
+FILE_IO_THREADS = int(os.getenv("FILE_IO_THREADS", "16"))
+
+_io_executor = ThreadPoolExecutor(max_workers=FILE_IO_THREADS, thread_name_prefix="file-io")
+
+
+# Media types for served files, by extension
+MEDIA_TYPES = {
+    ".html": "text/html",
+    ".txt": "text/plain",
+    ".tsv": "text/tab-separated-values",
+    ".csv": "text/csv",
+    ".json": "application/json",
+    ".fasta": "text/plain",
+    ".fa": "text/plain",
+    ".fna": "text/plain",
+    ".faa": "text/plain",
+    ".fastq": "text/plain",
+    ".fq": "text/plain",
+    ".gff": "text/plain",
+    ".gbk": "text/plain",
+    ".png": "image/png",
+    ".svg": "image/svg+xml",
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+}
+
+
+def media_type_for(path: Path) -> str:
+    return MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+
+def stat_result(size: int, mtime_ns: int) -> os.stat_result:
+    """A stat result for a read-only regular file that has no inode of its own."""
+    mtime = mtime_ns / 1e9
+    return os.stat_result((
+        0o100444, 0, 0, 1, 0, 0, size, mtime, mtime, mtime,
+        mtime, mtime, mtime, mtime_ns, mtime_ns, mtime_ns,
+    ))
+
+
+async def run_io(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking file operation on the file I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args))
 
 
 class FileStorage:
     """Local-disk file storage (default implementation)."""
 
+    # Reads may go over the network (prefer not to scan every file)
+    is_remote = False
+
     def __init__(self, base_path: Path):
         self.base_path = base_path
+        self.aio = AsyncFileStorage(self)
 
     def resolve(self, *parts: str) -> Path:
         """Return an absolute Path under base_path."""
@@ -37,6 +106,12 @@ class FileStorage:
             return None
         return p.read_text()
 
+    def read_bytes(self, *parts: str) -> Optional[bytes]:
+        p = self.resolve(*parts)
+        if not p.exists():
+            return None
+        return p.read_bytes()
+
     def read_json(self, *parts: str) -> Optional[dict]:
         import json
         text = self.read_text(*parts)
@@ -47,9 +122,325 @@ class FileStorage:
     def file_size(self, *parts: str) -> int:
         return self.resolve(*parts).stat().st_size
 
+    def stat(self, *parts: str) -> os.stat_result:
+        return self.resolve(*parts).stat()
+
+    def iter_chunks(
+        self, *parts: str, chunk_size: int = streaming.CHUNK_SIZE, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Yield file content in chunks (gzip is decompressed on the fly)."""
+        return streaming.iter_chunks(self.resolve(*parts), chunk_size, start, end)
+
+    def read_lines(self, *parts: str, start: int = 0, count: int = 50) -> list[str]:
+        return streaming.read_lines(self.resolve(*parts), start, count)
+
+    def tail_lines(self, *parts: str, count: int = 50) -> list[str]:
+        return streaming.tail_lines(self.resolve(*parts), count)
+
     def relative_to_base(self, path: Path) -> str:
         return str(path.relative_to(self.base_path))
 
+    def digest(self, *parts: str) -> Optional[str]:
+        """SHA-256 of a file if known without reading it (None for plain disk)."""
+        return None
+
+    def locate(self, *parts: str) -> tuple[Path, int]:
+        """Physical file holding this file's bytes, and the offset they start at."""
+        return self.resolve(*parts), 0
+
+    def media_type(self, *parts: str) -> str:
+        return media_type_for(Path(parts[-1]))
+
+    def source(self, *parts: str):
+        """What the streaming readers open for this file: a path, or an object with open()."""
+        return self.resolve(*parts)
+
+    def iter_files(self) -> Iterator[str]:
+        """Yield the relative (POSIX) path of every stored file."""
+        for dirpath, dirnames, filenames in os.walk(self.base_path):
+            dirnames.sort()
+            rel_dir = Path(dirpath).relative_to(self.base_path)
+            for name in sorted(filenames):
+                yield (rel_dir / name).as_posix()
+
+
+class ManifestFileStorage(FileStorage, ABC):
+    """
+    Base for stores whose tree is described by an index rather than a
+    directory walk.
+
+    Subclasses fill ``files`` (relative path -> (sha256, size, mtime_ns))
+    and call _set_tree() from reload(). Directory queries are answered from
+    the index; resolve() still returns paths under base_path, which the
+    other methods map back to index keys.
+    """
+
+    def __init__(self, base_path: Path):
+        super().__init__(base_path)
+        self.files: dict[str, tuple[str, int, int]] = {}
+        # Directory key ("" for the root) -> sorted child names
+        self.dirs: dict[str, list[str]] = {"": []}
+        self.reload()
+
+    @abstractmethod
+    def reload(self) -> bool:
+        """Re-read the index if it changed. Returns True if reloaded."""
+
+    async def areload(self) -> bool:
+        """reload() for async callers."""
+        return await self.aio.run(self.reload)
+
+    def _set_tree(self, files: dict[str, tuple[str, int, int]], empty_dirs: Iterable[str] = ()):
+        children: dict[str, set[str]] = {"": set()}
+        for key in list(files) + list(empty_dirs):
+            parts = key.split("/")
+            for i, name in enumerate(parts):
+                children.setdefault("/".join(parts[:i]), set()).add(name)
+        for key in empty_dirs:
+            children.setdefault(key, set())
+        self.files = files
+        self.dirs = {key: sorted(names) for key, names in children.items()}
+
+    def _key(self, parts: tuple[str, ...]) -> Optional[str]:
+        try:
+            rel = self.base_path.joinpath(*parts).relative_to(self.base_path)
+        except ValueError:
+            return None
+        key = rel.as_posix()
+        return "" if key == "." else key
+
+    def exists(self, *parts: str) -> bool:
+        key = self._key(parts)
+        return key in self.files or key in self.dirs
+
+    def is_dir(self, *parts: str) -> bool:
+        return self._key(parts) in self.dirs
+
+    def is_file(self, *parts: str) -> bool:
+        return self._key(parts) in self.files
+
+    def list_dir(self, *parts: str) -> list[Path]:
+        key = self._key(parts)
+        if key not in self.dirs:
+            raise FileNotFoundError(f"No such directory: {key}")
+        directory = self.base_path.joinpath(key) if key else self.base_path
+        return [directory / name for name in self.dirs[key]]
+
+    def digest(self, *parts: str) -> Optional[str]:
+        entry = self.files.get(self._key(parts))
+        return entry[0] if entry is not None else None
+
+    def iter_files(self) -> Iterator[str]:
+        return iter(sorted(self.files))
+
+
+# Manifest of a content-addressed store (see BlobFileStorage)
+BLOB_MANIFEST = "manifest.json"
+
+
+def blob_path(store: Path, digest: str) -> Path:
+    """Location of a blob inside a content-addressed store."""
+    return store / "objects" / digest[:2] / digest
+
+
+class BlobFileStorage(ManifestFileStorage):
+    """
+    Content-addressed storage: each distinct file is stored once as a blob.
+
+    A store (built with ``python -m app.storage.blobs``) contains
+    ``objects/ab/<sha256>`` blobs and a manifest mapping each relative path
+    to ``[sha256, size, mtime_ns]`` (size and mtime of the blob). resolve()
+    returns the blob for a file path, so reads go straight to it.
+    """
+
+    def __init__(self, base_path: Path):
+        self._manifest_signature: Optional[tuple[int, int]] = None
+        super().__init__(base_path)
+
+    def reload(self) -> bool:
+        import json
+        manifest_path = self.base_path / BLOB_MANIFEST
+        try:
+            st = manifest_path.stat()
+        except FileNotFoundError:
+            return False
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._manifest_signature:
+            return False
+
+        data = json.loads(manifest_path.read_text())
+        self._set_tree({key: tuple(entry) for key, entry in data["files"].items()}, data.get("dirs", []))
+        self._manifest_signature = signature
+        return True
+
+    def resolve(self, *parts: str) -> Path:
+        entry = self.files.get(self._key(parts))
+        if entry is not None:
+            return blob_path(self.base_path, entry[0])
+        return self.base_path.joinpath(*parts)
+
+
+class BundleFileStorage(ManifestFileStorage):
+    """
+    Storylines packed into single-file bundles, served from mmap.
+
+    base_path holds ``{category}/{storyline}.bundle`` files (built with
+    ``python -m app.storage.bundle``); each appears as the directory
+    ``{category}/{storyline}``. Lookups are dict hits on the bundles'
+    central indexes, and each storyline costs one mapping instead of an
+    inode per file. Replaced bundles are picked up by reload(); the old
+    mapping is released once no reader holds it.
+    """
+
+    def __init__(self, base_path: Path):
+        self.bundles: dict[str, "StorylineBundle"] = {}
+        self._entries: dict[str, "BundleEntry"] = {}
+        self._bundle_signature: Optional[tuple] = None
+        super().__init__(base_path)
+
+    def reload(self) -> bool:
+        from app.storage.bundle import BUNDLE_SUFFIX, StorylineBundle
+        found = []
+        if self.base_path.is_dir():
+            for path in sorted(self.base_path.glob(f"*/*{BUNDLE_SUFFIX}")):
+                st = path.stat()
+                key = f"{path.parent.name}/{path.name[:-len(BUNDLE_SUFFIX)]}"
+                found.append((key, path, st.st_mtime_ns, st.st_size))
+        signature = tuple((key, mtime_ns, size) for key, _, mtime_ns, size in found)
+        if signature == self._bundle_signature:
+            return False
+
+        bundles: dict[str, StorylineBundle] = {}
+        for key, path, mtime_ns, size in found:
+            previous = self.bundles.get(key)
+            unchanged = self._bundle_signature and (key, mtime_ns, size) in self._bundle_signature
+            bundles[key] = previous if previous is not None and unchanged else StorylineBundle(path)
+
+        entries: dict[str, BundleEntry] = {}
+        empty_dirs: list[str] = []
+        for key, bundle in bundles.items():
+            empty_dirs.append(key)
+            empty_dirs.extend(f"{key}/{name}" for name in bundle.dirs)
+            for name, entry in bundle.entries.items():
+                entries[f"{key}/{name}"] = entry
+
+        self._set_tree({key: (e.sha256, e.size, e.mtime_ns) for key, e in entries.items()}, empty_dirs)
+        self.bundles = bundles
+        self._entries = entries
+        self._bundle_signature = signature
+        return True
+
+    def entry(self, *parts: str) -> "BundleEntry":
+        entry = self._entries.get(self._key(parts))
+        if entry is None:
+            raise FileNotFoundError(f"No such file in bundles: {self.base_path.joinpath(*parts)}")
+        return entry
+
+    def read_text(self, *parts: str) -> Optional[str]:
+        data = self.read_bytes(*parts)
+        return data.decode() if data is not None else None
+
+    def read_bytes(self, *parts: str) -> Optional[bytes]:
+        entry = self._entries.get(self._key(parts))
+        return entry.read() if entry is not None else None
+
+    def file_size(self, *parts: str) -> int:
+        return self.entry(*parts).size
+
+    def stat(self, *parts: str) -> os.stat_result:
+        return self.entry(*parts).stat()
+
+    def iter_chunks(
+        self, *parts: str, chunk_size: int = streaming.CHUNK_SIZE, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        return streaming.iter_chunks(self.entry(*parts), chunk_size, start, end)
+
+    def read_lines(self, *parts: str, start: int = 0, count: int = 50) -> list[str]:
+        return streaming.read_lines(self.entry(*parts), start, count)
+
+    def tail_lines(self, *parts: str, count: int = 50) -> list[str]:
+        return streaming.tail_lines(self.entry(*parts), count)
+
+    def locate(self, *parts: str) -> tuple[Path, int]:
+        entry = self.entry(*parts)
+        return entry.bundle.path, entry.offset
+
+    def media_type(self, *parts: str) -> str:
+        return self.entry(*parts).media_type
+
+    def source(self, *parts: str) -> "BundleEntry":
+        return self.entry(*parts)
+
+
+class AsyncFileStorage:
+    """Awaitable view of a FileStorage; each call runs on the file I/O pool."""
+
+    def __init__(self, storage: FileStorage):
+        self.storage = storage
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run any blocking callable (e.g. a directory walk) on the file I/O pool."""
+        return await run_io(func, *args)
+
+    async def exists(self, *parts: str) -> bool:
+        return await self.run(self.storage.exists, *parts)
+
+    async def is_dir(self, *parts: str) -> bool:
+        return await self.run(self.storage.is_dir, *parts)
+
+    async def is_file(self, *parts: str) -> bool:
+        return await self.run(self.storage.is_file, *parts)
+
+    async def list_dir(self, *parts: str) -> list[Path]:
+        return await self.run(self.storage.list_dir, *parts)
+
+    async def read_text(self, *parts: str) -> Optional[str]:
+        return await self.run(self.storage.read_text, *parts)
+
+    async def read_bytes(self, *parts: str) -> Optional[bytes]:
+        return await self.run(self.storage.read_bytes, *parts)
+
+    async def read_json(self, *parts: str) -> Optional[dict]:
+        return await self.run(self.storage.read_json, *parts)
+
+    async def file_size(self, *parts: str) -> int:
+        return await self.run(self.storage.file_size, *parts)
+
+    async def stat(self, *parts: str) -> os.stat_result:
+        return await self.run(self.storage.stat, *parts)
+
+    async def locate(self, *parts: str) -> tuple[Path, int]:
+        return self.storage.locate(*parts)
+
+    async def prefetch(self, *paths: str):
+        """Warm any cache in front of the storage (no-op for local disk)."""
+
+    async def fetch(self, *parts: str):
+        """Make a file readable by blocking calls without network waits (no-op for local disk).
+
+        Await this before run()-ing work that reads the file.
+        """
+
+    async def read_lines(self, *parts: str, start: int = 0, count: int = 50) -> list[str]:
+        return await self.run(partial(self.storage.read_lines, *parts, start=start, count=count))
+
+    async def tail_lines(self, *parts: str, count: int = 50) -> list[str]:
+        return await self.run(partial(self.storage.tail_lines, *parts, count=count))
+
+    async def stream(
+        self, *parts: str, chunk_size: int = streaming.CHUNK_SIZE, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Async-iterate file content in chunks, one pool hop per chunk."""
+        chunks = self.storage.iter_chunks(*parts, chunk_size=chunk_size, start=start, end=end)
+        try:
+            while True:
+                chunk = await self.run(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await self.run(chunks.close)
+
 
 def _default_template_dir() -> Path:
     return Path(__file__).parent.parent.parent.parent / "template"
@@ -60,10 +451,22 @@ def _default_storyline_dir() -> Path:
 
 
 _env_template_dir = os.getenv("TEMPLATE_DIR")
+_env_blob_store = os.getenv("TEMPLATE_BLOB_STORE")
+_env_bundle_dir = os.getenv("TEMPLATE_BUNDLE_DIR")
+_env_object_store = os.getenv("TEMPLATE_OBJECT_STORE")
 
-template_storage = FileStorage(
-    Path(_env_template_dir) if _env_template_dir else _default_template_dir()
-)
+if _env_object_store:
+    # Imported here: app.storage.remote builds on the classes above
+    from app.storage.remote import create_object_storage
+    template_storage = create_object_storage(_env_object_store)
+elif _env_bundle_dir:
+    template_storage = BundleFileStorage(Path(_env_bundle_dir))
+elif _env_blob_store:
+    template_storage = BlobFileStorage(Path(_env_blob_store))
+else:
+    template_storage = FileStorage(
+        Path(_env_template_dir) if _env_template_dir else _default_template_dir()
+    )
 
 storyline_storage = FileStorage(
     Path(_env_template_dir) / "storylines" if _env_template_dir else _default_storyline_dir()
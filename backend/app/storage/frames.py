@@ -0,0 +1,93 @@
+"""
+Pre-rendered playback frames for pre-computed command outputs.
+
+Every user who runs the same recorded command receives the same bytes, so
+the CRLF normalization, line splitting and "Files generated" block are
+rendered once per CommandOutput and shared by every session instead of
+being rebuilt on each playback.
+"""
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.storage import CommandOutput
+
+# Outputs shorter than this are sent as a single frame
+SHORT_OUTPUT_CHARS = 200
+
+# Delay between line frames of a long output (simulated typing)
+LINE_DELAY_SECONDS = 0.05
+
+# Execution time shown to the user is capped for UX
+MAX_DISPLAY_SECONDS = 5.0
+MAX_WAIT_SECONDS = 2.0
+
+
+class PlaybackFrames:
+    """Immutable, ready-to-send terminal frames for one CommandOutput."""
+    __slots__ = ("header", "running", "wait", "output", "line_delay", "files")
+
+    def __init__(
+        self,
+        header: str,
+        running: Optional[str],
+        wait: float,
+        output: tuple[str, ...],
+        line_delay: float,
+        files: tuple[str, ...],
+    ):
+        self.header = header
+        self.running = running
+        self.wait = wait
+        self.output = output
+        self.line_delay = line_delay
+        self.files = files
+
+    def __iter__(self):
+        """Iterate over every frame in playback order."""
+        yield self.header
+        if self.running:
+            yield self.running
+        yield from self.output
+        yield from self.files
+
+
+def render_text_frames(text: str) -> tuple[tuple[str, ...], float]:
+    """
+    Split terminal text into CRLF-terminated frames.
+
+    Returns:
+        (frames, delay between frames in seconds)
+    """
+    if len(text) < SHORT_OUTPUT_CHARS:
+        return (text.replace('\n', '\r\n'),), 0.0
+
+    lines = text.split('\n')
+    last = len(lines) - 1
+    return tuple(line + ('\r\n' if i < last else '') for i, line in enumerate(lines)), LINE_DELAY_SECONDS
+
+
+def render_frames(result: "CommandOutput") -> PlaybackFrames:
+    """Render the playback frames for a recorded command output."""
+    running = None
+    wait = 0.0
+    display_time = min(result.execution_time, MAX_DISPLAY_SECONDS)
+    if display_time > 0.5:
+        running = f"\x1b[90m[Running... ~{int(result.execution_time)}s]\x1b[0m\r\n"
+        wait = min(display_time, MAX_WAIT_SECONDS)
+
+    output, line_delay = render_text_frames(result.terminal_output)
+
+    files: tuple[str, ...] = ()
+    if result.files_generated:
+        files = ("\r\n\x1b[32mFiles generated:\x1b[0m\r\n",) + tuple(
+            f"  📄 {f}\r\n" for f in result.files_generated
+        )
+
+    return PlaybackFrames(
+        header=f"\x1b[36m$ {result.command}\x1b[0m\r\n",
+        running=running,
+        wait=wait,
+        output=output,
+        line_delay=line_delay,
+        files=files,
+    )
@@ -0,0 +1,159 @@
+"""
+Binary indexed pack format for pre-computed narrative results.
+
+A pack holds the same data as content/results/{narrative_id}.json but
+can be memory-mapped and decoded one CommandOutput at a time, so a
+session only pays for the commands it actually runs.
+
+Layout (all integers little-endian):
+
+    header   magic b"BLPK" | version u16 | entry count u32
+             | narrative_id length u16 | narrative_id (UTF-8)
+    index    per entry: step_id i32 | payload offset u64 | payload length u32
+             | command length u16 | command (UTF-8)
+    payloads per entry: CommandOutput as compact JSON
+
+The index carries each recorded command so the command lookup can be
+built without touching any payload.
+
+Convert existing results with:
+    python -m app.storage.pack content/results/*.json
+"""
+from pathlib import Path
+import mmap
+import struct
+import sys
+
+from app.storage.command_index import CommandIndex
+
+PACK_MAGIC = b"BLPK"
+PACK_VERSION = 1
+
+_HEADER = struct.Struct("<4sHIH")
+_ENTRY = struct.Struct("<iQIH")
+
+
+class PackError(ValueError):
+    """Raised when a pack file is malformed or has an unknown version."""
+
+
+def write_pack(results, path: Path):
+    """Write NarrativeResults to a pack file."""
+    narrative_id = results.narrative_id.encode()
+    entries = [
+        (step.step_id, cmd_output.command.encode(), cmd_output.model_dump_json(exclude_defaults=True).encode())
+        for step in results.steps
+        for cmd_output in step.commands
+    ]
+
+    index_size = sum(_ENTRY.size + len(command) for _, command, _ in entries)
+    offset = _HEADER.size + len(narrative_id) + index_size
+
+    index = bytearray()
+    for step_id, command, payload in entries:
+        index += _ENTRY.pack(step_id, offset, len(payload), len(command)) + command
+        offset += len(payload)
+
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries), len(narrative_id)))
+        f.write(narrative_id)
+        f.write(index)
+        for _, _, payload in entries:
+            f.write(payload)
+    tmp_path.replace(path)
+
+
+class NarrativePack:
+    """A memory-mapped pack with lazily decoded command outputs."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, count, id_len = _HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            raise PackError(f"{path}: truncated header")
+        if magic != PACK_MAGIC:
+            raise PackError(f"{path}: not a narrative pack")
+        if version != PACK_VERSION:
+            raise PackError(f"{path}: unsupported pack version {version}")
+
+        pos = _HEADER.size
+        self.narrative_id = self._mm[pos:pos + id_len].decode()
+        pos += id_len
+
+        # (step_id, command, offset, length) per entry
+        self.entries: list[tuple[int, str, int, int]] = []
+        for _ in range(count):
+            step_id, offset, length, cmd_len = _ENTRY.unpack_from(self._mm, pos)
+            pos += _ENTRY.size
+            command = self._mm[pos:pos + cmd_len].decode()
+            pos += cmd_len
+            if offset + length > len(self._mm):
+                raise PackError(f"{path}: payload out of bounds")
+            self.entries.append((step_id, command, offset, length))
+
+        # Resident cost of the parsed index; payloads stay in the page cache
+        self.index_bytes = pos
+        self._decoded: dict[int, object] = {}
+        # Payload bytes of the decoded outputs, as a proxy for their resident size
+        self.decoded_bytes = 0
+
+    def output(self, entry: int):
+        """Decode (once) and return the CommandOutput for an entry."""
+        cmd_output = self._decoded.get(entry)
+        if cmd_output is None:
+            from app.storage import CommandOutput
+            _, _, offset, length = self.entries[entry]
+            cmd_output = CommandOutput.model_validate_json(self._mm[offset:offset + length])
+            self._decoded[entry] = cmd_output
+            self.decoded_bytes += length
+        return cmd_output
+
+    def command_index(self) -> CommandIndex:
+        """Build a command lookup whose hits decode only the matched entry."""
+        index = CommandIndex(resolve=self.output)
+        for entry, (step_id, command, _, _) in enumerate(self.entries):
+            index.add(step_id, command, entry)
+        return index
+
+    def to_results(self):
+        """Decode every entry into a full NarrativeResults tree."""
+        from app.storage import NarrativeResults, StepResults
+        steps: dict[int, list] = {}
+        for entry, (step_id, _, _, _) in enumerate(self.entries):
+            steps.setdefault(step_id, []).append(self.output(entry))
+        return NarrativeResults(
+            narrative_id=self.narrative_id,
+            steps=[StepResults(step_id=step_id, commands=commands) for step_id, commands in steps.items()],
+        )
+
+    @property
+    def resident_bytes(self) -> int:
+        return self.index_bytes + self.decoded_bytes
+
+    def close(self):
+        self._decoded.clear()
+        self.decoded_bytes = 0
+        self._mm.close()
+
+
+def convert_json(json_path: Path) -> Path:
+    """Convert a results JSON file to a pack next to it."""
+    from app.storage import NarrativeResults
+    results = NarrativeResults.model_validate_json(json_path.read_bytes())
+    pack_path = json_path.with_suffix(".pack")
+    write_pack(results, pack_path)
+    return pack_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m app.storage.pack RESULTS.json [...]")
+        sys.exit(1)
+    for arg in sys.argv[1:]:
+        pack_path = convert_json(Path(arg))
+        print(f"{arg} -> {pack_path} ({pack_path.stat().st_size} bytes)")
@@ -0,0 +1,236 @@
+"""
+Precompressed variants of template files.
+
+Text outputs such as FastQC HTML reports and Prokka GFF compress 5-10x,
+so an ingest step writes gzip (and, when the ``brotli`` package is
+installed, brotli) sidecars once, and the file routes serve whichever
+variant the client's Accept-Encoding prefers.
+
+Sidecars live in a separate tree (PRECOMPRESSED_DIR) mirroring the
+template layout, e.g. ``tutorial/x/o_quast/report.txt.gz``, so template
+listings never see them. For a content-addressed store they are keyed by
+content hash instead, so duplicated files are compressed once. Each
+sidecar's mtime is set to its source's mtime; a sidecar whose mtime
+doesn't match is stale and is ignored until the next build.
+
+Sidecars are compressed in a streaming pass, with faster settings for
+large files; files over PRECOMPRESS_MAX_MB are skipped.
+
+Build sidecars with:
+    python -m app.storage.precompress
+(also run in the background at startup; up-to-date sidecars are skipped).
+"""
+from pathlib import Path
+from typing import Optional
+import logging
+import os
+import sys
+import zlib
+
+from app.cache import BoundedCache
+from app.storage.files import FileStorage, template_storage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Extensions worth compressing (already-compressed formats are excluded)
+COMPRESSIBLE_EXTENSIONS = {
+    ".html", ".txt", ".tsv", ".csv", ".tab", ".json", ".svg",
+    ".fasta", ".fa", ".fna", ".faa", ".fastq", ".fq", ".gff", ".gbk",
+}
+
+# Files smaller than this aren't worth a sidecar
+MIN_SIZE = 1024
+
+# Keep a variant only if it is at most this fraction of the original
+MAX_RATIO = 0.9
+
+# Larger files (e.g. raw FASTQ runs) get no sidecar: compressing them would
+# take minutes of CPU, and clients download them rather than view them
+PRECOMPRESS_MAX_BYTES = int(os.getenv("PRECOMPRESS_MAX_MB", "256")) * 1024 * 1024
+
+# Above this size the fast compression levels are used (brotli 11 runs at ~1 MB/s)
+MAX_EFFORT_BYTES = 4 * 1024 * 1024
+
+# Content-Encoding -> sidecar suffix, in server preference order
+SIDECAR_SUFFIXES = {"br": ".br", "gzip": ".gz"} if brotli is not None else {"gzip": ".gz"}
+
+
+def _default_precompressed_dir() -> Path:
+    return Path(__file__).parent.parent.parent / ".precompressed"
+
+
+PRECOMPRESSED_DIR = Path(os.getenv("PRECOMPRESSED_DIR") or _default_precompressed_dir())
+
+
+def is_compressible(path: Path) -> bool:
+    return path.suffix.lower() in COMPRESSIBLE_EXTENSIONS
+
+
+class _Encoder:
+    """Streaming compressor for one content coding."""
+
+    def __init__(self, encoding: str, size: int):
+        small = size <= MAX_EFFORT_BYTES
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=11 if small else 5)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            # wbits=31 writes a gzip container with mtime 0, so output is deterministic
+            compressor = zlib.compressobj(9 if small else 6, zlib.DEFLATED, 31)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+def parse_accept_encoding(header: Optional[str]) -> dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    codings: dict[str, float] = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """
+    Pick the best available content coding for a request.
+
+    Returns None to serve the original (identity) file. Ties are broken by
+    SIDECAR_SUFFIXES order, which prefers brotli.
+    """
+    codings = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in SIDECAR_SUFFIXES:
+        if encoding not in available:
+            continue
+        q = codings.get(encoding, codings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Precompressor:
+    """Builds and looks up compressed sidecars for a FileStorage tree."""
+
+    def __init__(self, storage: FileStorage, cache_dir: Path):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        # sha256 or (relative path, size, mtime_ns) -> {encoding: (sidecar path, size)}
+        self._variants = BoundedCache("precompressed_variants", max_entries=8192)
+
+    def sidecar_path(self, rel_path: str, encoding: str, digest: Optional[str] = None) -> Path:
+        # Content-addressed files share one sidecar per distinct content
+        if digest is not None:
+            return self.cache_dir / "objects" / digest[:2] / (digest + SIDECAR_SUFFIXES[encoding])
+        return self.cache_dir / (rel_path + SIDECAR_SUFFIXES[encoding])
+
+    def build_file(self, rel_path: str) -> list[str]:
+        """Write any missing or stale sidecars for one file. Returns encodings written."""
+        st = self.storage.stat(rel_path)
+        if not MIN_SIZE <= st.st_size <= PRECOMPRESS_MAX_BYTES or not is_compressible(Path(rel_path)):
+            return []
+        digest = self.storage.digest(rel_path)
+
+        stale = {}
+        for encoding in SIDECAR_SUFFIXES:
+            target = self.sidecar_path(rel_path, encoding, digest)
+            try:
+                if target.stat().st_mtime_ns == st.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            stale[encoding] = target
+        if not stale:
+            return []
+
+        # One streaming pass feeds every stale encoding, so memory stays at a chunk
+        outputs = {}
+        try:
+            for encoding, target in stale.items():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(target.name + ".tmp")
+                outputs[encoding] = (_Encoder(encoding, st.st_size), tmp_path, open(tmp_path, "wb"))
+            for chunk in self.storage.iter_chunks(rel_path):
+                for encoder, _, f in outputs.values():
+                    f.write(encoder.compress(chunk))
+            for encoder, _, f in outputs.values():
+                f.write(encoder.finish())
+        finally:
+            for _, _, f in outputs.values():
+                f.close()
+
+        written = []
+        for encoding, (_, tmp_path, _) in outputs.items():
+            target = stale[encoding]
+            if tmp_path.stat().st_size > st.st_size * MAX_RATIO:
+                tmp_path.unlink(missing_ok=True)
+                target.unlink(missing_ok=True)
+                continue
+            # Tie the sidecar to this version of the source
+            os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            tmp_path.replace(target)
+            written.append(encoding)
+        return written
+
+    def build(self) -> int:
+        """Build sidecars for every compressible file. Returns sidecars written."""
+        count = 0
+        for rel_path in self.storage.iter_files():
+            if not is_compressible(Path(rel_path)):
+                continue
+            try:
+                count += len(self.build_file(rel_path))
+            except OSError as e:
+                logger.error(f"Failed to precompress {rel_path}: {e}")
+        self._variants.clear()
+        return count
+
+    def _find_variants(self, rel_path: str, mtime_ns: int, digest: Optional[str]) -> dict[str, tuple[Path, int]]:
+        variants = {}
+        for encoding in SIDECAR_SUFFIXES:
+            target = self.sidecar_path(rel_path, encoding, digest)
+            try:
+                st = target.stat()
+            except FileNotFoundError:
+                continue
+            if st.st_mtime_ns == mtime_ns:
+                variants[encoding] = (target, st.st_size)
+        return variants
+
+    async def variants(
+        self, rel_path: str, size: int, mtime_ns: int, digest: Optional[str] = None
+    ) -> dict[str, tuple[Path, int]]:
+        """Up-to-date sidecars for a file version, as {encoding: (path, size)}."""
+        key = digest or (rel_path, size, mtime_ns)
+        variants = self._variants.get(key)
+        if variants is None:
+            variants = await self.storage.aio.run(self._find_variants, rel_path, mtime_ns, digest)
+            self._variants.set(key, variants)
+        return variants
+
+
+template_precompressor = Precompressor(template_storage, PRECOMPRESSED_DIR)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1:
+        print("Usage: python -m app.storage.precompress")
+        sys.exit(1)
+    encodings = ", ".join(SIDECAR_SUFFIXES)
+    written = template_precompressor.build()
+    print(f"Wrote {written} sidecars ({encodings}) under {PRECOMPRESSED_DIR}")
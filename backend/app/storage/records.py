@@ -0,0 +1,524 @@
+"""
+Record-level access to FASTA, FASTQ and GFF template files.
+
+The output panel shows a few contigs, reads or features at a time, so
+instead of fetching a whole ``assembly.fasta`` or Prokka GFF it asks for
+records N..N+count, or for a named contig. The first request for a file
+builds an offset index (like samtools' ``.fai``) in one sequential pass;
+after that, a page costs one seek and reads only the records it returns.
+
+Indexes are written to RECORD_INDEX_DIR, mirroring the template layout
+(or keyed by content hash for content-addressed stores, like
+precompressed sidecars). Each records the size and mtime of
+the file it was built from and is rebuilt when they change.
+
+What is indexed:
+    FASTA   every record: offset, id and sequence length
+    FASTQ   every RECORD_STRIDE-th read (4-line records)
+    GFF     every RECORD_STRIDE-th feature line, and the first feature of
+            each seqid; a trailing ##FASTA section is not part of the
+            feature records
+
+Offsets refer to the decompressed content. Gzip files (detected by magic
+bytes, as in app.storage.streaming) get seek points every
+CHECKPOINT_SPACING decompressed bytes: a snapshot of the zlib state taken
+during the indexing pass, so reaching record N inflates at most that
+much. zlib state can't be written to disk, so after a restart the seek
+points are rebuilt with one inflate pass on first use; the record index
+itself is read from disk.
+"""
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Optional
+from urllib.parse import unquote
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import struct
+import zlib
+
+from app.cache import BoundedCache, env_megabytes
+from app.storage.files import FileStorage, template_storage
+from app.storage.streaming import CHUNK_SIZE, GZIP_MAGIC, is_gzip, open_raw
+
+logger = logging.getLogger(__name__)
+
+FASTA_EXTENSIONS = {".fasta", ".fa", ".fna", ".faa", ".ffn", ".fas"}
+FASTQ_EXTENSIONS = {".fastq", ".fq"}
+GFF_EXTENSIONS = {".gff", ".gff3"}
+
+# FASTQ reads / GFF features between two indexed offsets
+RECORD_STRIDE = 64
+
+# Decompressed bytes between gzip seek points
+CHECKPOINT_SPACING = 4 * 1024 * 1024
+
+# Approximate resident size of one zlib snapshot (32 KiB window + state)
+CHECKPOINT_BYTES = 48 * 1024
+
+INDEX_MAGIC = b"BLRI"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".ridx"
+
+# magic | version u16 | format u8 | pad | source size u64 | source mtime_ns i64
+# | record count u64 | stride u32 | offsets count u64 | metadata length u32
+_HEADER = struct.Struct("<4sHBxQqQIQI")
+
+_FORMAT_CODES = {"fasta": 1, "fastq": 2, "gff": 3}
+_FORMAT_NAMES = {code: name for name, code in _FORMAT_CODES.items()}
+
+
+def _default_record_index_dir() -> Path:
+    return Path(__file__).parent.parent.parent / ".record_index"
+
+
+RECORD_INDEX_DIR = Path(os.getenv("RECORD_INDEX_DIR") or _default_record_index_dir())
+
+
+def record_format(name: str) -> Optional[str]:
+    """fasta, fastq or gff for a file name (``.gz`` is looked through), else None."""
+    path = Path(name)
+    if path.suffix.lower() == ".gz":
+        path = path.with_suffix("")
+    suffix = path.suffix.lower()
+    if suffix in FASTA_EXTENSIONS:
+        return "fasta"
+    if suffix in FASTQ_EXTENSIONS:
+        return "fastq"
+    if suffix in GFF_EXTENSIONS:
+        return "gff"
+    return None
+
+
+class _Checkpoint:
+    __slots__ = ("offset", "raw_offset", "state")
+
+    def __init__(self, offset: int, raw_offset: int, state):
+        self.offset = offset
+        self.raw_offset = raw_offset
+        self.state = state
+
+
+class _InflateReader(io.RawIOBase):
+    """
+    Seekable raw view of a gzip file's decompressed content.
+
+    Seeking backwards (or far forwards) restarts from the nearest
+    checkpoint; short forward seeks just inflate and discard. Pass
+    ``record=True`` to collect checkpoints while reading from the start.
+    Multi-member files (e.g. bgzip output) are read member after member.
+    """
+
+    def __init__(self, raw: BinaryIO, checkpoints: Optional[list[_Checkpoint]] = None, record: bool = False):
+        self._raw = raw
+        self.checkpoints = checkpoints if checkpoints is not None else []
+        self._record = record
+        self._restart(None)
+
+    def _restart(self, checkpoint: Optional[_Checkpoint]):
+        if checkpoint is None:
+            self._raw.seek(0)
+            self._inflater = zlib.decompressobj(31)
+            self._produced = 0
+        else:
+            self._raw.seek(checkpoint.raw_offset)
+            self._inflater = checkpoint.state.copy()
+            self._produced = checkpoint.offset
+        self._pending = b""
+        self._pending_pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._produced - (len(self._pending) - self._pending_pos)
+
+    def _fill(self) -> bool:
+        """Inflate the next input chunk into the pending buffer. False at the end."""
+        while self._pending_pos >= len(self._pending):
+            if self._inflater.eof:
+                data = self._inflater.unused_data + self._raw.read(CHUNK_SIZE)
+                # Another member follows, or this is the end (possibly zero padding)
+                if not data.startswith(GZIP_MAGIC):
+                    return False
+                self._inflater = zlib.decompressobj(31)
+            else:
+                data = self._raw.read(CHUNK_SIZE)
+                if not data:
+                    return False
+            self._pending = self._inflater.decompress(data)
+            self._pending_pos = 0
+            self._produced += len(self._pending)
+
+            last = self.checkpoints[-1].offset if self.checkpoints else 0
+            if self._record and not self._inflater.unused_data and self._produced - last >= CHECKPOINT_SPACING:
+                # All input so far is consumed, so the state resumes at the raw position
+                self.checkpoints.append(_Checkpoint(self._produced, self._raw.tell(), self._inflater.copy()))
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._fill():
+            return 0
+        n = min(len(b), len(self._pending) - self._pending_pos)
+        b[:n] = self._pending[self._pending_pos:self._pending_pos + n]
+        self._pending_pos += n
+        return n
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self.tell()
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("can't seek from the end of a gzip stream")
+        current = self.tell()
+        nearest = None
+        for checkpoint in self.checkpoints:
+            if checkpoint.offset > pos:
+                break
+            nearest = checkpoint
+        start = nearest.offset if nearest is not None else 0
+        if pos < current or start > current:
+            self._restart(nearest)
+            current = self.tell()
+        # Inflate and discard up to pos
+        while current < pos and self._fill():
+            step = min(pos - current, len(self._pending) - self._pending_pos)
+            self._pending_pos += step
+            current += step
+        return current
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class RecordIndex:
+    """Record offsets of one file version, plus names for lookups."""
+
+    def __init__(
+        self,
+        format: str,
+        size: int,
+        mtime_ns: int,
+        count: int,
+        stride: int,
+        offsets: array,
+        metadata: dict,
+    ):
+        self.format = format
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.count = count
+        self.stride = stride
+        self.offsets = offsets
+        self.metadata = metadata
+        # Name -> record number (FASTA ids, or the first feature of each GFF seqid)
+        if format == "fasta":
+            self.lookup = {name: i for i, name in reversed(list(enumerate(metadata["names"])))}
+        else:
+            self.lookup = dict(metadata.get("seqids", {}))
+        # Gzip seek points; None until the file has been inflated once
+        self.checkpoints: Optional[list[_Checkpoint]] = None
+        self.compressed = False
+
+    def nbytes(self) -> int:
+        names = sum(len(name) + 64 for name in self.lookup)
+        checkpoints = len(self.checkpoints or ()) * CHECKPOINT_BYTES
+        return self.offsets.itemsize * len(self.offsets) + names + checkpoints
+
+    def write(self, path: Path):
+        metadata = json.dumps(self.metadata, separators=(",", ":")).encode()
+        header = _HEADER.pack(
+            INDEX_MAGIC, INDEX_VERSION, _FORMAT_CODES[self.format], self.size, self.mtime_ns,
+            self.count, self.stride, len(self.offsets), len(metadata),
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(self.offsets.tobytes())
+            f.write(metadata)
+        tmp_path.replace(path)
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["RecordIndex"]:
+        """Load an index file, or None if it is missing or unreadable."""
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                magic, version, code, size, mtime_ns, count, stride, n_offsets, meta_len = _HEADER.unpack(header)
+                if magic != INDEX_MAGIC or version != INDEX_VERSION or code not in _FORMAT_NAMES:
+                    return None
+                offsets = array("Q")
+                offsets.frombytes(f.read(n_offsets * offsets.itemsize))
+                metadata = json.loads(f.read(meta_len))
+        except (OSError, struct.error, ValueError):
+            return None
+        return cls(_FORMAT_NAMES[code], size, mtime_ns, count, stride, offsets, metadata)
+
+
+def _header_fields(line: bytes) -> tuple[str, str]:
+    """(id, description) of a FASTA/FASTQ header line."""
+    text = line[1:].decode("utf-8", errors="replace").strip()
+    record_id, _, description = text.partition(" ")
+    return record_id, description.strip()
+
+
+def build_index(source, format: str, size: int, mtime_ns: int) -> RecordIndex:
+    """Index a file in one sequential pass (recording gzip seek points as it goes)."""
+    compressed = is_gzip(source)
+    raw = open_raw(source)
+    inflate = _InflateReader(raw, record=True) if compressed else None
+    f = io.BufferedReader(inflate, CHUNK_SIZE) if inflate is not None else raw
+
+    offsets = array("Q")
+    metadata: dict = {}
+    count = 0
+    pos = 0
+    try:
+        if format == "fasta":
+            names, lengths = [], []
+            for line in f:
+                if line.startswith(b">"):
+                    offsets.append(pos)
+                    names.append(_header_fields(line)[0])
+                    lengths.append(0)
+                elif lengths:
+                    lengths[-1] += len(line.strip())
+                pos += len(line)
+            count = len(names)
+            metadata = {"names": names, "lengths": lengths}
+        elif format == "fastq":
+            for i, line in enumerate(f):
+                if i % 4 == 0:
+                    if count % RECORD_STRIDE == 0:
+                        offsets.append(pos)
+                    count += 1
+                pos += len(line)
+        else:
+            seqids: dict[str, int] = {}
+            for line in f:
+                if line.startswith(b"##FASTA"):
+                    break
+                if line.strip() and not line.startswith(b"#"):
+                    if count % RECORD_STRIDE == 0:
+                        offsets.append(pos)
+                    seqid = line.split(b"\t", 1)[0].decode("utf-8", errors="replace")
+                    seqids.setdefault(seqid, count)
+                    count += 1
+                pos += len(line)
+            metadata = {"seqids": seqids}
+    finally:
+        f.close()
+
+    stride = 1 if format == "fasta" else RECORD_STRIDE
+    index = RecordIndex(format, size, mtime_ns, count, stride, offsets, metadata)
+    index.compressed = compressed
+    if inflate is not None:
+        index.checkpoints = inflate.checkpoints
+    return index
+
+
+def scan_checkpoints(source) -> list[_Checkpoint]:
+    """Inflate a gzip file once, returning its seek points."""
+    inflate = _InflateReader(open_raw(source), record=True)
+    try:
+        while inflate._fill():
+            inflate._pending_pos = len(inflate._pending)
+    finally:
+        inflate.close()
+    return inflate.checkpoints
+
+
+def open_decompressed(source, index: RecordIndex) -> BinaryIO:
+    """Seekable binary file over the (decompressed) content the index refers to."""
+    if index.compressed:
+        return io.BufferedReader(_InflateReader(open_raw(source), index.checkpoints), CHUNK_SIZE)
+    return open_raw(source)
+
+
+def _read_bounded(f: BinaryIO, limit: int) -> tuple[bytes, int]:
+    """Read one line keeping at most limit bytes; returns (kept, full length without newline)."""
+    kept = line = f.readline(limit)
+    length = len(line)
+    while line and not line.endswith(b"\n"):
+        line = f.readline(CHUNK_SIZE)
+        length += len(line)
+    length -= len(line) - len(line.rstrip(b"\r\n"))
+    return kept.rstrip(b"\r\n"), length
+
+
+def parse_attributes(field: str) -> dict[str, str]:
+    """Column 9 of a GFF3 line (``ID=x;Name=y``) as a dict, percent-decoded."""
+    attributes = {}
+    for item in field.strip().split(";"):
+        key, sep, value = item.partition("=")
+        if sep:
+            attributes[unquote(key.strip())] = unquote(value.strip())
+    return attributes
+
+
+def _parse_score(score: str) -> Optional[float]:
+    """A GFF score column as a number; None for ".", blanks and anything malformed."""
+    try:
+        value = float(score)
+    except ValueError:
+        return None
+    # nan/inf parse but cannot be sent as JSON
+    return value if math.isfinite(value) else None
+
+
+def _parse_feature(line: bytes, number: int) -> dict:
+    fields = line.decode("utf-8", errors="replace").rstrip("\r\n").split("\t")
+    fields += [""] * (9 - len(fields))
+    seqid, source, type_, start, end, score, strand, phase, attributes = fields[:9]
+    return {
+        "index": number,
+        "seqid": seqid,
+        "source": source,
+        "type": type_,
+        "start": int(start) if start.isdigit() else 0,
+        "end": int(end) if end.isdigit() else 0,
+        "score": _parse_score(score),
+        "strand": strand,
+        "phase": phase,
+        "attributes": parse_attributes(attributes),
+    }
+
+
+def read_records(source, index: RecordIndex, start: int, count: int, max_bases: int) -> list[dict]:
+    """
+    Records start..start+count-1 as dicts.
+
+    Sequences (and FASTQ qualities) are cut to max_bases; ``length`` is
+    always the full length.
+    """
+    end = min(start + count, index.count)
+    if start >= end:
+        return []
+
+    records = []
+    with open_decompressed(source, index) as f:
+        if index.format == "fasta":
+            for number in range(start, end):
+                f.seek(index.offsets[number])
+                record_id, description = _header_fields(f.readline())
+                length = index.metadata["lengths"][number]
+                sequence = bytearray()
+                while len(sequence) < max_bases:
+                    line = f.readline(max_bases - len(sequence) + 1)
+                    if not line or line.startswith(b">"):
+                        break
+                    sequence += line.strip()
+                records.append({
+                    "index": number,
+                    "id": record_id,
+                    "description": description,
+                    "length": length,
+                    "sequence": sequence[:max_bases].decode("ascii", errors="replace"),
+                    "truncated": length > max_bases,
+                })
+            return records
+
+        # Jump to the indexed record before start, then walk forward
+        block = start // index.stride
+        f.seek(index.offsets[block])
+        number = block * index.stride
+        while number < end:
+            if index.format == "fastq":
+                header = f.readline()
+                if not header:
+                    break
+                sequence, length = _read_bounded(f, max_bases)
+                f.readline()
+                quality, _ = _read_bounded(f, max_bases)
+                if number >= start:
+                    record_id, description = _header_fields(header)
+                    records.append({
+                        "index": number,
+                        "id": record_id,
+                        "description": description,
+                        "length": length,
+                        "sequence": sequence[:max_bases].decode("ascii", errors="replace"),
+                        "quality": quality[:max_bases].decode("ascii", errors="replace"),
+                        "truncated": length > max_bases,
+                    })
+                number += 1
+            else:
+                line = f.readline()
+                if not line or line.startswith(b"##FASTA"):
+                    break
+                if not line.strip() or line.startswith(b"#"):
+                    continue
+                if number >= start:
+                    records.append(_parse_feature(line, number))
+                number += 1
+    return records
+
+
+class RecordIndexer:
+    """Builds, persists and caches record indexes for a FileStorage tree."""
+
+    def __init__(self, storage: FileStorage, cache_dir: Path):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        # sha256 or (relative path, size, mtime_ns) -> RecordIndex
+        self._indexes = BoundedCache("record_indexes", max_bytes=env_megabytes("RECORD_INDEX_CACHE_MB", 64))
+        # Builds in progress, shared by concurrent requests for the same file
+        self._building: dict = {}
+
+    def index_path(self, rel_path: str, digest: Optional[str] = None) -> Path:
+        if digest is not None:
+            return self.cache_dir / "objects" / digest[:2] / (digest + INDEX_SUFFIX)
+        return self.cache_dir / (rel_path + INDEX_SUFFIX)
+
+    def load_or_build(self, rel_path: str, format: str, size: int, mtime_ns: int, digest: Optional[str]) -> RecordIndex:
+        """Blocking: read the index from disk if current, else build and save it."""
+        source = self.storage.source(rel_path)
+        path = self.index_path(rel_path, digest)
+        index = RecordIndex.read(path)
+        if index is not None and (index.size, index.mtime_ns, index.format) == (size, mtime_ns, format):
+            index.compressed = is_gzip(source)
+            if index.compressed:
+                index.checkpoints = scan_checkpoints(source)
+            return index
+
+        index = build_index(source, format, size, mtime_ns)
+        try:
+            index.write(path)
+        except OSError as e:
+            logger.warning(f"Could not save record index for {rel_path}: {e}")
+        logger.info(f"Indexed {index.count} {format} records in {rel_path}")
+        return index
+
+    async def index(self, rel_path: str, format: str, size: int, mtime_ns: int, digest: Optional[str] = None) -> RecordIndex:
+        """The record index for a file version, building it at most once at a time."""
+        key = digest or (rel_path, size, mtime_ns)
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self.storage.aio.run(self.load_or_build, rel_path, format, size, mtime_ns, digest)
+            )
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        index = await asyncio.shield(task)
+        self._indexes.set(key, index, size=index.nbytes())
+        return index
+
+    async def records(self, rel_path: str, index: RecordIndex, start: int, count: int, max_bases: int) -> list[dict]:
+        def read() -> list[dict]:
+            return read_records(self.storage.source(rel_path), index, start, count, max_bases)
+        await self.storage.aio.fetch(rel_path)
+        return await self.storage.aio.run(read)
+
+
+template_records = RecordIndexer(template_storage, RECORD_INDEX_DIR)
@@ -0,0 +1,481 @@
+"""
+Templates served from an object store through a local disk cache.
+
+The store holds a content-addressed template tree in the layout written by
+``python -m app.storage.blobs`` (``manifest.json`` plus
+``objects/ab/<sha256>``), so it can live in any bucket or static file
+server. TEMPLATE_OBJECT_STORE points at it:
+
+    file:///mnt/templates            a mounted directory (NFS, gcsfuse, ...)
+    https://bucket.example/templates  anything serving the files over HTTP
+
+The tree and hashes come from the manifest, re-fetched on each index
+refresh (conditionally, by ETag). File contents are fetched on first read
+into TEMPLATE_CACHE_DIR, keyed by content hash, verified, and kept under
+an LRU byte budget (OBJECT_CACHE_MB). Concurrent reads of a cold file
+share one upstream fetch: when a class of 50 opens the same report, the
+store sees one request.
+
+This module builds on app.storage.files and is imported from it only
+when TEMPLATE_OBJECT_STORE is set.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Optional
+from urllib.parse import urlparse
+import asyncio
+import json
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+
+from app.cache import CACHES, env_megabytes
+from app.storage.files import (
+    BLOB_MANIFEST, AsyncFileStorage, ManifestFileStorage, blob_path, stat_result,
+)
+from app.storage.streaming import CHUNK_SIZE, sha256_file
+
+logger = logging.getLogger(__name__)
+
+# Upstream fetches allowed at once when warming a storyline
+PREFETCH_CONCURRENCY = 8
+
+# Files larger than this aren't prefetched (FASTQs are fetched on demand)
+PREFETCH_MAX_BYTES = 4 * 1024 * 1024
+
+# Seconds before an upstream request is abandoned
+OBJECT_STORE_TIMEOUT = 60.0
+
+# Seconds a blocking reader waits for a whole object to be fetched
+BLOCKING_FETCH_TIMEOUT = 10 * OBJECT_STORE_TIMEOUT
+
+# Threads for the disk side of fetches (temp files, hashing, moving into
+# the cache). They are separate from the file I/O pool: blocking readers on
+# that pool wait for fetches, so fetches queued behind them would deadlock
+OBJECT_FETCH_THREADS = int(os.getenv("OBJECT_FETCH_THREADS", "4"))
+
+_fetch_executor = ThreadPoolExecutor(max_workers=OBJECT_FETCH_THREADS, thread_name_prefix="object-fetch")
+
+
+async def run_fetch_io(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking step of an object fetch on the fetch pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_fetch_executor, partial(func, *args))
+
+
+def _default_cache_dir() -> Path:
+    return Path(__file__).parent.parent.parent / ".object_cache"
+
+
+class ObjectStore(ABC):
+    """Read-only access to a content-addressed store."""
+
+    @abstractmethod
+    async def get_manifest(self) -> Optional[bytes]:
+        """The manifest, or None if unchanged since the last call."""
+
+    @abstractmethod
+    async def download(self, name: str, dest: Path):
+        """Copy the object at name (relative to the store root) to dest."""
+
+
+class LocalObjectStore(ObjectStore):
+    """A store in a local or mounted directory."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._manifest_signature: Optional[tuple[int, int]] = None
+
+    def _read_manifest(self) -> Optional[bytes]:
+        st = (self.root / BLOB_MANIFEST).stat()
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._manifest_signature:
+            return None
+        data = (self.root / BLOB_MANIFEST).read_bytes()
+        self._manifest_signature = signature
+        return data
+
+    async def get_manifest(self) -> Optional[bytes]:
+        return await run_fetch_io(self._read_manifest)
+
+    async def download(self, name: str, dest: Path):
+        await run_fetch_io(shutil.copyfile, self.root / name, dest)
+
+
+class HTTPObjectStore(ObjectStore):
+    """A store served over HTTP(S), e.g. a public or signed-URL bucket."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/") + "/"
+        self._manifest_etag: Optional[str] = None
+        self._client = None
+        self._client_loop = None
+
+    def _http(self):
+        import httpx
+        # A client is bound to the loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=OBJECT_STORE_TIMEOUT, follow_redirects=True)
+            self._client_loop = loop
+        return self._client
+
+    async def get_manifest(self) -> Optional[bytes]:
+        headers = {"If-None-Match": self._manifest_etag} if self._manifest_etag else {}
+        response = await self._http().get(self.base_url + BLOB_MANIFEST, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self._manifest_etag = response.headers.get("etag")
+        return response.content
+
+    async def download(self, name: str, dest: Path):
+        async with self._http().stream("GET", self.base_url + name) as response:
+            response.raise_for_status()
+            f = await run_fetch_io(open, dest, "wb")
+            try:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    await run_fetch_io(f.write, chunk)
+            finally:
+                await run_fetch_io(f.close)
+
+
+class DiskCache:
+    """
+    LRU cache of content-addressed files on local disk.
+
+    Files live at ``root/objects/ab/<sha256>``. The recency order is kept in
+    memory and rebuilt from access times on startup, so a restart keeps the
+    warm set.
+    """
+
+    def __init__(self, name: str, root: Path, max_bytes: int):
+        self.name = name
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Misses served by a fetch already in flight for another reader
+        self.coalesced = 0
+
+        # sha256 -> size, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+        CACHES[name] = self
+
+    def _load(self):
+        found = []
+        for path in (self.root / "objects").glob("*/*"):
+            if path.name.endswith(".tmp"):
+                path.unlink(missing_ok=True)
+                continue
+            st = path.stat()
+            found.append((st.st_atime_ns, path.name, st.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self.total_bytes += size
+        self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def path(self, digest: str) -> Path:
+        return blob_path(self.root, digest)
+
+    def get(self, digest: str) -> Optional[Path]:
+        """Path of a cached file (marked as recently used), or None."""
+        with self._lock:
+            if digest not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+        return self.path(digest)
+
+    def contains(self, digest: str) -> bool:
+        return digest in self._entries
+
+    def temp_path(self, digest: str) -> Path:
+        """Where to download a file before put() moves it into place."""
+        target = self.path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        return target.with_name(f"{digest}.{secrets.token_hex(4)}.tmp")
+
+    def put(self, digest: str, tmp_path: Path) -> Path:
+        """Move a downloaded file into the cache and evict to stay in budget."""
+        target = self.path(digest)
+        size = tmp_path.stat().st_size
+        tmp_path.replace(target)
+        with self._lock:
+            if digest in self._entries:
+                self.total_bytes -= self._entries.pop(digest)
+            self._entries[digest] = size
+            self.total_bytes += size
+            self._evict()
+        return target
+
+    def _evict(self):
+        # The newest file stays even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            digest = next(iter(self._entries))
+            self.total_bytes -= self._entries.pop(digest)
+            # Readers with the file open keep reading the unlinked inode
+            self.path(digest).unlink(missing_ok=True)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": 0,
+            "coalesced": self.coalesced,
+        }
+
+
+class ObjectFileStorage(ManifestFileStorage):
+    """
+    Template tree in an object store, read through a local DiskCache.
+
+    Listings, sizes, mtimes and hashes come from the store's manifest, so
+    only reading a file's contents can touch the network. resolve() returns
+    the file's location in the cache; the read methods fetch it first.
+
+    Use ``.aio`` from request handlers, and ``aio.fetch()`` before handing
+    work that reads a file to the pool. The blocking methods are for the
+    file I/O pool: on a cache miss they wait (up to BLOCKING_FETCH_TIMEOUT)
+    for the fetch on the server's event loop, so they must never be called
+    on the loop itself. Fetches do their disk work on a pool of their own,
+    so waiting readers can't starve them.
+    """
+
+    is_remote = True
+
+    def __init__(self, store: ObjectStore, cache: DiskCache):
+        self.store = store
+        self.cache = cache
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # sha256 -> download task, shared by every reader waiting for it
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Strong references to fire-and-forget prefetches
+        self._background: set[asyncio.Task] = set()
+        super().__init__(cache.root)
+        self.aio = ObjectAsyncFileStorage(self)
+
+    def reload(self) -> bool:
+        # The manifest is fetched by areload() once the server's loop runs;
+        # before that (at import) the tree is empty
+        if self._loop is None:
+            return False
+        return self._call(self.areload())
+
+    async def areload(self) -> bool:
+        self._loop = asyncio.get_running_loop()
+        try:
+            data = await self.store.get_manifest()
+        except Exception as e:
+            logger.error(f"Failed to fetch template manifest: {e}")
+            return False
+        if data is None:
+            return False
+        manifest = json.loads(data)
+        self._set_tree({key: tuple(entry) for key, entry in manifest["files"].items()}, manifest.get("dirs", []))
+        logger.info(f"Template manifest loaded: {len(self.files)} files")
+        return True
+
+    def _call(self, coro: Coroutine) -> Any:
+        """Run a coroutine from a blocking caller (never the loop itself)."""
+        if self._loop is None or not self._loop.is_running():
+            return asyncio.run(coro)
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=BLOCKING_FETCH_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Object store fetch took longer than {BLOCKING_FETCH_TIMEOUT:g} s")
+
+    def _entry(self, parts: tuple[str, ...]) -> tuple[str, int, int]:
+        entry = self.files.get(self._key(parts))
+        if entry is None:
+            raise FileNotFoundError(f"No such file in object store: {'/'.join(parts)}")
+        return entry
+
+    def resolve(self, *parts: str) -> Path:
+        entry = self.files.get(self._key(parts))
+        if entry is not None:
+            return self.cache.path(entry[0])
+        return self.base_path.joinpath(*parts)
+
+    def file_size(self, *parts: str) -> int:
+        return self._entry(parts)[1]
+
+    def stat(self, *parts: str) -> os.stat_result:
+        _, size, mtime_ns = self._entry(parts)
+        return stat_result(size, mtime_ns)
+
+    async def fetch(self, *parts: str) -> Path:
+        """Make a file local and return its cache path (one download per hash at a time)."""
+        digest, size, mtime_ns = self._entry(parts)
+        path = self.cache.get(digest)
+        if path is not None:
+            return path
+
+        loop = asyncio.get_running_loop()
+        self._loop = self._loop or loop
+        task = self._inflight.get(digest)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(self._download(digest, mtime_ns))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        else:
+            self.cache.coalesced += 1
+        # One reader disconnecting mustn't cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _download(self, digest: str, mtime_ns: int) -> Path:
+        start = time.perf_counter()
+        tmp_path = await run_fetch_io(self.cache.temp_path, digest)
+        try:
+            await self.store.download(f"objects/{digest[:2]}/{digest}", tmp_path)
+            actual = await run_fetch_io(sha256_file, tmp_path)
+            if actual != digest:
+                raise OSError(f"Object {digest} failed verification (got {actual})")
+            # Matches the manifest, so precompressed sidecars stay valid
+            await run_fetch_io(partial(os.utime, tmp_path, ns=(mtime_ns, mtime_ns)))
+            path = await run_fetch_io(self.cache.put, digest, tmp_path)
+        except BaseException:
+            await run_fetch_io(tmp_path.unlink, True)
+            raise
+        logger.info(f"Fetched object {digest[:12]} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return path
+
+    def _ensure(self, parts: tuple[str, ...]):
+        entry = self.files.get(self._key(parts))
+        if entry is not None and not self.cache.contains(entry[0]):
+            self._call(self.fetch(*parts))
+
+    def read_text(self, *parts: str) -> Optional[str]:
+        self._ensure(parts)
+        return super().read_text(*parts)
+
+    def read_bytes(self, *parts: str) -> Optional[bytes]:
+        self._ensure(parts)
+        return super().read_bytes(*parts)
+
+    def iter_chunks(self, *parts: str, **kwargs):
+        self._ensure(parts)
+        return super().iter_chunks(*parts, **kwargs)
+
+    def read_lines(self, *parts: str, start: int = 0, count: int = 50) -> list[str]:
+        self._ensure(parts)
+        return super().read_lines(*parts, start=start, count=count)
+
+    def tail_lines(self, *parts: str, count: int = 50) -> list[str]:
+        self._ensure(parts)
+        return super().tail_lines(*parts, count=count)
+
+    def locate(self, *parts: str) -> tuple[Path, int]:
+        self._ensure(parts)
+        return super().locate(*parts)
+
+    def source(self, *parts: str) -> Path:
+        self._ensure(parts)
+        return super().source(*parts)
+
+    async def prefetch(self, *paths: str, max_size: int = PREFETCH_MAX_BYTES):
+        """Fetch the files under the given paths that aren't cached yet."""
+        prefixes = [path.strip("/") for path in paths]
+        wanted = [
+            key for key, (digest, size, _) in self.files.items()
+            if size <= max_size and not self.cache.contains(digest)
+            and any(key == p or key.startswith(p + "/") for p in prefixes)
+        ]
+        semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+        async def fetch_one(key: str):
+            async with semaphore:
+                try:
+                    await self.fetch(key)
+                except Exception as e:
+                    logger.warning(f"Prefetch of {key} failed: {e}")
+
+        await asyncio.gather(*(fetch_one(key) for key in wanted))
+
+    def prefetch_in_background(self, *paths: str):
+        task = asyncio.get_running_loop().create_task(self.prefetch(*paths))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+class ObjectAsyncFileStorage(AsyncFileStorage):
+    """Awaitable view of an ObjectFileStorage: fetches on the loop, reads on the pool."""
+
+    storage: ObjectFileStorage
+
+    async def _fetch(self, parts: tuple[str, ...]):
+        if self.storage.is_file(*parts):
+            await self.storage.fetch(*parts)
+
+    async def fetch(self, *parts: str):
+        await self._fetch(parts)
+
+    async def read_text(self, *parts: str) -> Optional[str]:
+        await self._fetch(parts)
+        return await super().read_text(*parts)
+
+    async def read_bytes(self, *parts: str) -> Optional[bytes]:
+        await self._fetch(parts)
+        return await super().read_bytes(*parts)
+
+    async def read_json(self, *parts: str) -> Optional[dict]:
+        await self._fetch(parts)
+        return await super().read_json(*parts)
+
+    async def read_lines(self, *parts: str, start: int = 0, count: int = 50) -> list[str]:
+        await self._fetch(parts)
+        return await super().read_lines(*parts, start=start, count=count)
+
+    async def tail_lines(self, *parts: str, count: int = 50) -> list[str]:
+        await self._fetch(parts)
+        return await super().tail_lines(*parts, count=count)
+
+    async def locate(self, *parts: str) -> tuple[Path, int]:
+        return await self.storage.fetch(*parts), 0
+
+    async def stream(self, *parts: str, **kwargs):
+        await self._fetch(parts)
+        async for chunk in super().stream(*parts, **kwargs):
+            yield chunk
+
+    async def prefetch(self, *paths: str):
+        """Warm the cache for these paths without making the caller wait."""
+        self.storage.prefetch_in_background(*paths)
+
+
+def create_object_storage(url: str) -> ObjectFileStorage:
+    """ObjectFileStorage for a TEMPLATE_OBJECT_STORE URL (file:// or http(s)://)."""
+    parsed = urlparse(url)
+    if parsed.scheme in ("http", "https"):
+        store = HTTPObjectStore(url)
+    elif parsed.scheme in ("file", ""):
+        store = LocalObjectStore(Path(parsed.path))
+    else:
+        raise ValueError(f"Unsupported TEMPLATE_OBJECT_STORE scheme: {parsed.scheme}")
+    cache_dir = Path(os.getenv("TEMPLATE_CACHE_DIR") or _default_cache_dir())
+    cache = DiskCache("template_objects", cache_dir, env_megabytes("OBJECT_CACHE_MB", 1024))
+    return ObjectFileStorage(store, cache)
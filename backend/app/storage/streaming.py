@@ -0,0 +1,160 @@
+"""
+Streaming and partial reads for large template files.
+
+Everything here reads incrementally, so memory use depends on the chunk
+or page size requested, not on the file size. Gzip files are detected
+by their magic bytes (not their name, since some ``.fq.gz`` fixtures are
+stored uncompressed) and decompressed on the fly; byte and line
+positions then refer to the decompressed content.
+
+Plain files seek directly. A gzip stream has no random access, so
+reaching a position still means decompressing everything before it,
+but only a chunk at a time.
+
+``path`` may also be any object with an ``open()`` returning a seekable
+binary file (e.g. a bundle entry), so the same readers work on files
+that aren't on disk individually.
+"""
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+import gzip
+import hashlib
+import os
+
+CHUNK_SIZE = 64 * 1024
+
+# Longest line returned by line-oriented reads; longer lines are cut
+MAX_LINE_BYTES = 64 * 1024
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_raw(path) -> BinaryIO:
+    if isinstance(path, (str, os.PathLike)):
+        return open(path, "rb")
+    return path.open()
+
+
+def is_gzip(path: Path) -> bool:
+    """True if the file starts with the gzip magic bytes."""
+    with open_raw(path) as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def sha256_file(path: Path) -> str:
+    """SHA-256 hex digest of a file's raw bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open_raw(path) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def open_binary(path: Path) -> BinaryIO:
+    """Open a file for reading, transparently decompressing gzip."""
+    if is_gzip(path):
+        if isinstance(path, (str, os.PathLike)):
+            return gzip.open(path, "rb")
+        return gzip.GzipFile(fileobj=path.open(), mode="rb")
+    return open_raw(path)
+
+
+def iter_chunks(
+    path: Path,
+    chunk_size: int = CHUNK_SIZE,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the content of a file in chunks.
+
+    Args:
+        path: File to read
+        chunk_size: Maximum bytes per chunk
+        start: First byte offset to return
+        end: Offset to stop before (None for end of file)
+    """
+    with open_binary(path) as f:
+        if start:
+            f.seek(start)
+        remaining = None if end is None else max(0, end - start)
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def _decode_line(raw: bytes) -> str:
+    return raw[:MAX_LINE_BYTES].decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def _iter_bounded_lines(f: BinaryIO) -> Iterator[bytes]:
+    """Yield each line cut to MAX_LINE_BYTES; the rest of a long line is skipped in chunks."""
+    while True:
+        kept = line = f.readline(MAX_LINE_BYTES)
+        if not line:
+            return
+        while line and not line.endswith(b"\n"):
+            line = f.readline(CHUNK_SIZE)
+        yield kept
+
+
+def read_lines(path: Path, start: int = 0, count: int = 50) -> list[str]:
+    """Return up to ``count`` lines starting at line ``start`` (0-based)."""
+    lines = []
+    with open_binary(path) as f:
+        for i, raw in enumerate(_iter_bounded_lines(f)):
+            if i >= start + count:
+                break
+            if i >= start:
+                lines.append(_decode_line(raw))
+    return lines
+
+
+def tail_lines(path: Path, count: int = 50) -> list[str]:
+    """Return the last ``count`` lines of a file."""
+    if count <= 0:
+        return []
+
+    if is_gzip(path):
+        # No random access into a gzip stream: keep a rolling window
+        with open_binary(path) as f:
+            return [_decode_line(raw) for raw in deque(_iter_bounded_lines(f), maxlen=count)]
+
+    with open_raw(path) as f:
+        f.seek(0, os.SEEK_END)
+        end = pos = f.tell()
+        # Scan backwards for line starts only, so memory stays at one chunk
+        # however long the lines are; a trailing newline starts no line
+        starts: list[int] = []
+        while pos > 0 and len(starts) < count:
+            step = min(CHUNK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            i = len(chunk)
+            while len(starts) < count:
+                i = chunk.rfind(b"\n", 0, i)
+                if i < 0:
+                    break
+                if pos + i + 1 < end:
+                    starts.append(pos + i + 1)
+        if pos == 0 and len(starts) < count and end > 0:
+            starts.append(0)
+
+        lines = []
+        for start in reversed(starts):
+            f.seek(start)
+            lines.append(_decode_line(next(_iter_bounded_lines(f))))
+    return lines
+
+
+def read_page(path: Path, page: int = 0, page_size: int = 50) -> list[str]:
+    """Return page ``page`` (0-based) of ``page_size`` lines."""
+    return read_lines(path, start=page * page_size, count=page_size)
@@ -13,79 +13,105 @@ import logging
 import json
 
 from app.storage import get_command_output, CommandOutput
+from app.storage.frames import render_text_frames
+from app.websocket.channel import OutputChannel
+from app.websocket.sessions import SessionStore, UserSession, create_session_store
 
 logger = logging.getLogger(__name__)
 
-
-class UserSession:
-    """Tracks a user's current position in a narrative."""
-    def __init__(self, session_id: str):
-        self.session_id = session_id
-        self.narrative_id: Optional[str] = "hospital-outbreak"  # Default narrative
-        self.current_step: int = 3  # Start at step 3 (first task)
-        self.completed_commands: list[str] = []
+# Long outputs are paced in ticks of several lines rather than one
+# sleep and one frame per line
+TYPING_TICK_SECONDS = 0.25
 
 
 class ConnectionManager:
     """Manages WebSocket connections for terminal sessions."""
 
-    def __init__(self):
+    def __init__(self, store: Optional[SessionStore] = None):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.channels: Dict[str, OutputChannel] = {}
+        # Sessions of connections owned by this worker; the store is the source of truth
         self.sessions: Dict[str, UserSession] = {}
+        self.store = store or create_session_store()
 
     async def connect(self, websocket: WebSocket, session_id: str):
         """Accept a new WebSocket connection."""
         await websocket.accept()
         self.active_connections[session_id] = websocket
-        self.sessions[session_id] = UserSession(session_id)
+        channel = OutputChannel(websocket)
+        channel.start()
+        self.channels[session_id] = channel
+        session = await self.store.load(session_id)
+        if session is None:
+            session = UserSession(session_id)
+            await self.store.save(session)
+        self.sessions[session_id] = session
         logger.info(f"Terminal session {session_id} connected")
 
     def disconnect(self, session_id: str):
-        """Handle WebSocket disconnection."""
+        """Handle WebSocket disconnection. Session state stays in the store for reconnects."""
         if session_id in self.active_connections:
             del self.active_connections[session_id]
+        channel = self.channels.pop(session_id, None)
+        if channel:
+            channel.close()
         if session_id in self.sessions:
             del self.sessions[session_id]
         logger.info(f"Terminal session {session_id} disconnected")
 
     async def send_message(self, session_id: str, message: str):
         """Send a message to a specific session."""
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_text(message)
+        channel = self.channels.get(session_id)
+        if channel:
+            await channel.write(message)
 
     async def send_json(self, session_id: str, data: dict):
         """Send JSON data to a specific session."""
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_json(data)
+        channel = self.channels.get(session_id)
+        if channel:
+            await channel.write_json(data)
 
     async def simulate_typing(self, session_id: str, text: str, chars_per_second: int = 500):
         """
         Simulate terminal output appearing character by character.
         For long outputs, send in chunks for performance.
         """
-        websocket = self.active_connections.get(session_id)
-        if not websocket:
+        channel = self.channels.get(session_id)
+        if not channel:
             return
 
-        # For short outputs, send immediately
-        if len(text) < 200:
-            await websocket.send_text(text.replace('\n', '\r\n'))
+        frames, delay = render_text_frames(text)
+        await self._stream_frames(channel, frames, delay)
+
+    async def _stream_frames(self, channel: OutputChannel, frames: tuple[str, ...], delay: float = 0.0):
+        """
+        Write pre-rendered frames to the channel.
+
+        With a per-line delay, lines are released a tick's worth at a time
+        so the channel coalesces them into one websocket frame per tick
+        while the overall typing pace stays the same.
+        """
+        if not delay:
+            for frame in frames:
+                if not await channel.write(frame):
+                    return
             return
 
-        # For longer outputs, send line by line with small delays
-        lines = text.split('\n')
-        for i, line in enumerate(lines):
-            await websocket.send_text(line + ('\r\n' if i < len(lines) - 1 else ''))
-            await asyncio.sleep(0.05)  # 50ms between lines
+        lines_per_tick = max(1, round(TYPING_TICK_SECONDS / delay))
+        for i, frame in enumerate(frames, 1):
+            if not await channel.write(frame):
+                return
+            if i % lines_per_tick == 0 or i == len(frames):
+                await asyncio.sleep(delay * (i % lines_per_tick or lines_per_tick))
 
     async def process_command(self, session_id: str, command: str):
         """
         Process a command from the terminal.
         Looks up pre-computed results and plays them back.
         """
-        websocket = self.active_connections.get(session_id)
+        channel = self.channels.get(session_id)
         session = self.sessions.get(session_id)
-        if not websocket or not session:
+        if not channel or not session:
             return
 
         cmd = command.strip()
@@ -94,15 +120,15 @@ class ConnectionManager:
 
         # Handle built-in commands
         if cmd == "help":
-            await self._send_help(websocket)
+            await self._send_help(channel)
             return
 
         if cmd == "clear":
-            await websocket.send_text("\x1b[2J\x1b[H")
+            await channel.write("\x1b[2J\x1b[H")
             return
 
         if cmd.startswith("cd ") or cmd == "pwd" or cmd.startswith("ls"):
-            await self._handle_filesystem_command(websocket, cmd)
+            await self._handle_filesystem_command(channel, cmd)
             return
 
         # Look up pre-computed result for this command
@@ -113,12 +139,13 @@ class ConnectionManager:
         )
 
         if result:
-            await self._playback_result(session_id, websocket, result)
+            await self._playback_result(session_id, channel, result)
             session.completed_commands.append(cmd)
+            await self.store.save(session)
 
             # Send chart/summary data as JSON for the output panel
             if result.chart_data or result.summary:
-                await websocket.send_json({
+                await channel.write_json({
                     "type": "output_data",
                     "chart": result.chart_data,
                     "summary": result.summary,
@@ -126,32 +153,30 @@ class ConnectionManager:
                 })
         else:
             # Command not found in pre-computed results
-            await websocket.send_text(
+            await channel.write(
                 f"\x1b[33mHint: Try the suggested command from the story panel.\x1b[0m\r\n"
                 f"\x1b[90mThis learning environment uses pre-recorded analysis results.\x1b[0m\r\n"
             )
 
-    async def _playback_result(self, session_id: str, websocket: WebSocket, result: CommandOutput):
+    async def _playback_result(self, session_id: str, channel: OutputChannel, result: CommandOutput):
         """Play back a pre-computed result with realistic timing."""
+        frames = result.frames
+
         # Show "executing" message
-        await websocket.send_text(f"\x1b[36m$ {result.command}\x1b[0m\r\n")
+        await channel.write(frames.header)
 
         # Simulate execution time (capped for UX)
-        display_time = min(result.execution_time, 5.0)  # Max 5 seconds display
-        if display_time > 0.5:
-            await websocket.send_text(f"\x1b[90m[Running... ~{int(result.execution_time)}s]\x1b[0m\r\n")
-            await asyncio.sleep(min(display_time, 2.0))  # Wait max 2 seconds
+        if frames.running:
+            await channel.write(frames.running)
+            await asyncio.sleep(frames.wait)
 
         # Send the terminal output
-        await self.simulate_typing(session_id, result.terminal_output)
+        await self._stream_frames(channel, frames.output, frames.line_delay)
 
         # Show files generated
-        if result.files_generated:
-            await websocket.send_text("\r\n\x1b[32mFiles generated:\x1b[0m\r\n")
-            for f in result.files_generated:
-                await websocket.send_text(f"  📄 {f}\r\n")
+        await self._stream_frames(channel, frames.files)
 
-    async def _send_help(self, websocket: WebSocket):
+    async def _send_help(self, channel: OutputChannel):
         """Send help message."""
         help_text = """
 \x1b[1;33m═══════════════════════════════════════════════════════════\x1b[0m
@@ -178,18 +203,18 @@ class ConnectionManager:
   \x1b[32mpwd\x1b[0m    - Show current directory
 
 """
-        await websocket.send_text(help_text.replace('\n', '\r\n'))
+        await channel.write(help_text.replace('\n', '\r\n'))
 
-    async def _handle_filesystem_command(self, websocket: WebSocket, cmd: str):
+    async def _handle_filesystem_command(self, channel: OutputChannel, cmd: str):
         """Handle simulated filesystem commands."""
         if cmd == "pwd":
-            await websocket.send_text("/data/outbreak_investigation\r\n")
+            await channel.write("/data/outbreak_investigation\r\n")
         elif cmd == "ls" or cmd.startswith("ls "):
-            await websocket.send_text(
+            await channel.write(
                 "\x1b[34mraw_reads/\x1b[0m  \x1b[34mqc_reports/\x1b[0m  \x1b[34massembly/\x1b[0m  \x1b[34mannotation/\x1b[0m\r\n"
                 "sample_01_R1.fastq.gz  sample_01_R2.fastq.gz\r\n"
                 "sample_02_R1.fastq.gz  sample_02_R2.fastq.gz\r\n"
                 "sample_03_R1.fastq.gz  sample_03_R2.fastq.gz\r\n"
             )
         elif cmd.startswith("cd "):
-            await websocket.send_text("")  # Silent success
+            pass  # Silent success
@@ -0,0 +1,165 @@
+"""
+Per-connection output channel for terminal websockets.
+
+Playback produces many small writes (one per output line or generated
+file). Instead of turning each into its own websocket frame and send
+coroutine, writes go into a bounded queue that a single writer task
+drains, coalescing consecutive text writes into frames up to a size/time
+budget.
+
+The bounded queue applies backpressure to the playback coroutine. A
+client that stops reading (queue stays full, or a send stalls) is
+disconnected rather than letting frames pile up in the ASGI send path.
+"""
+from fastapi import WebSocket
+from typing import Optional, Union
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Coalescing budget: flush once a frame reaches this size or age
+MAX_FRAME_CHARS = 16 * 1024
+FLUSH_INTERVAL_SECONDS = 0.01
+
+# Backpressure: pending writes per connection before writers must wait
+MAX_PENDING_WRITES = 1024
+
+# A consumer that can't make progress for this long is dropped
+SLOW_CONSUMER_TIMEOUT_SECONDS = 10.0
+
+# "Try Again Later" close code sent to dropped consumers
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class OutputChannel:
+    """Coalescing, bounded write buffer in front of one WebSocket."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_frame_chars: int = MAX_FRAME_CHARS,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_pending: int = MAX_PENDING_WRITES,
+        slow_consumer_timeout: float = SLOW_CONSUMER_TIMEOUT_SECONDS,
+    ):
+        self.websocket = websocket
+        self.max_frame_chars = max_frame_chars
+        self.flush_interval = flush_interval
+        self.slow_consumer_timeout = slow_consumer_timeout
+        self.closed = False
+
+        # Counters for observing coalescing effectiveness
+        self.writes = 0
+        self.frames_sent = 0
+
+        self._queue: asyncio.Queue[Union[str, dict]] = asyncio.Queue(maxsize=max_pending)
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the writer task. Must be called from the event loop."""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+
+    def close(self):
+        """Stop the writer and discard anything still queued."""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    async def write(self, text: str) -> bool:
+        """
+        Queue terminal text for the client.
+
+        Waits while the queue is full. Returns False if the channel is
+        closed or the consumer was dropped for being too slow.
+        """
+        if not text:
+            return not self.closed
+        return await self._put(text)
+
+    async def write_json(self, data: dict) -> bool:
+        """Queue a JSON message, preserving order relative to text writes."""
+        return await self._put(data)
+
+    async def _put(self, item: Union[str, dict]) -> bool:
+        if self.closed:
+            return False
+        self.writes += 1
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.slow_consumer_timeout)
+            except asyncio.TimeoutError:
+                await self._drop("write queue stayed full")
+                return False
+        return True
+
+    def _drain(self, parts: list[str], size: int) -> tuple[int, Optional[dict]]:
+        """Move queued text into parts until the frame budget is reached."""
+        while size < self.max_frame_chars:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if isinstance(item, dict):
+                return size, item
+            parts.append(item)
+            size += len(item)
+        return size, None
+
+    async def _run(self):
+        """Writer loop: coalesce queued text into frames and send them."""
+        try:
+            while True:
+                item = await self._queue.get()
+                while isinstance(item, dict):
+                    await self._send(self.websocket.send_json(item))
+                    item = await self._queue.get()
+
+                parts = [item]
+                size, pending = self._drain(parts, len(item))
+                if pending is None and size < self.max_frame_chars:
+                    # Give the producer one interval to add to this frame
+                    await asyncio.sleep(self.flush_interval)
+                    size, pending = self._drain(parts, size)
+
+                await self._send(self.websocket.send_text("".join(parts)))
+                if pending is not None:
+                    await self._send(self.websocket.send_json(pending))
+        except _SlowConsumer:
+            await self._drop("send stalled")
+        except Exception as e:
+            # Client went away mid-send; the receive loop handles cleanup
+            logger.debug(f"Output channel closed: {e}")
+            self.closed = True
+
+    async def _send(self, coro):
+        try:
+            await asyncio.wait_for(coro, self.slow_consumer_timeout)
+        except asyncio.TimeoutError:
+            raise _SlowConsumer()
+        self.frames_sent += 1
+
+    async def _drop(self, reason: str):
+        """Disconnect a consumer that can't keep up."""
+        if self.closed:
+            return
+        self.closed = True
+        logger.warning(f"Dropping slow terminal consumer: {reason}")
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE),
+                self.slow_consumer_timeout,
+            )
+        except Exception:
+            pass
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+
+class _SlowConsumer(Exception):
+    """Raised inside the writer when a send exceeds its budget."""
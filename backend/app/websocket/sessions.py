@@ -0,0 +1,176 @@
+"""
+Terminal session state and pluggable session stores.
+
+A terminal session's position in a narrative (narrative, current step,
+completed commands) lives in a SessionStore rather than only in the
+process that accepted the websocket, so sessions survive restarts and
+reconnects that land on a different uvicorn worker.
+
+Backends:
+- MemorySessionStore: in-process dict (default, single worker)
+- SQLiteSessionStore: shared SQLite file in WAL mode, safe for N workers
+  on one host
+
+Select with SESSION_STORE=memory|sqlite and SESSION_DB_PATH.
+"""
+from abc import ABC, abstractmethod
+from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sessions untouched for this long are purged from the store
+SESSION_TTL_SECONDS = 24 * 3600
+PURGE_INTERVAL_SECONDS = 600
+
+
+class UserSession:
+    """Tracks a user's current position in a narrative."""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.narrative_id: Optional[str] = "hospital-outbreak"  # Default narrative
+        self.current_step: int = 3  # Start at step 3 (first task)
+        self.completed_commands: list[str] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "narrative_id": self.narrative_id,
+            "current_step": self.current_step,
+            "completed_commands": self.completed_commands,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserSession":
+        session = cls(data["session_id"])
+        session.narrative_id = data.get("narrative_id")
+        session.current_step = data.get("current_step", session.current_step)
+        session.completed_commands = list(data.get("completed_commands", []))
+        return session
+
+
+class SessionStore(ABC):
+    """Interface for session persistence. Subclass to add a backend."""
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[UserSession]:
+        """The stored session, or None if unknown or expired."""
+
+    @abstractmethod
+    async def save(self, session: UserSession):
+        """Store the session, replacing any earlier state."""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Forget the session."""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store. Sessions are lost on restart and not shared."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._sessions: dict[str, tuple[dict, float]] = {}
+        self._last_purge = time.time()
+
+    async def load(self, session_id: str) -> Optional[UserSession]:
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[1] < time.time() - self.ttl:
+            return None
+        return UserSession.from_dict(entry[0])
+
+    async def save(self, session: UserSession):
+        now = time.time()
+        self._sessions[session.session_id] = (session.to_dict(), now)
+        if now - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            cutoff = now - self.ttl
+            self._sessions = {k: v for k, v in self._sessions.items() if v[1] >= cutoff}
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Shared store backed by a local SQLite file in WAL mode.
+
+    WAL lets every worker read while one writes, and each write is a
+    single-row upsert, so per-command saves stay cheap. Queries run in a
+    worker thread to keep the event loop free.
+    """
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS terminal_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._last_purge = 0.0
+        self._purge_expired()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _purge_expired(self):
+        now = time.time()
+        self._last_purge = now
+        self._execute("DELETE FROM terminal_sessions WHERE updated_at < ?", (now - self.ttl,))
+
+    def _load(self, session_id: str) -> Optional[UserSession]:
+        rows = self._execute(
+            "SELECT data, updated_at FROM terminal_sessions WHERE session_id = ?", (session_id,)
+        )
+        if not rows or rows[0][1] < time.time() - self.ttl:
+            return None
+        return UserSession.from_dict(json.loads(rows[0][0]))
+
+    def _save(self, session_id: str, data: str):
+        now = time.time()
+        self._execute(
+            "INSERT INTO terminal_sessions (session_id, data, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (session_id, data, now),
+        )
+        if now - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._purge_expired()
+
+    async def load(self, session_id: str) -> Optional[UserSession]:
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def save(self, session: UserSession):
+        # Serialize on the loop so the thread sees a consistent snapshot
+        data = json.dumps(session.to_dict())
+        await asyncio.to_thread(self._save, session.session_id, data)
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(
+            self._execute, "DELETE FROM terminal_sessions WHERE session_id = ?", (session_id,)
+        )
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store configured by SESSION_STORE."""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        path = os.getenv("SESSION_DB_PATH", "./terminal_sessions.db")
+        logger.info(f"Using SQLite session store at {path}")
+        return SQLiteSessionStore(path)
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_STORE '{backend}', falling back to memory")
+    return MemorySessionStore()
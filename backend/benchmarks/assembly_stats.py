@@ -0,0 +1,57 @@
+"""
+Throughput of the vectorized assembly statistics engine.
+
+Writes a synthetic Unicycler-style assembly (many small contigs plus a
+few chromosome-sized ones, 60 bp lines) and times
+compute_assembly_stats over it, reporting MB/s and peak RSS.
+
+Usage (from backend/):
+    python -m benchmarks.assembly_stats [size_mb] [contigs]
+"""
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.assembly_stats import compute_assembly_stats
+
+LINE_WIDTH = 60
+
+
+def _write_assembly(path: Path, size_mb: int, contigs: int):
+    rng = np.random.default_rng(0)
+    total = size_mb * 1024 * 1024
+    # A few large replicons hold most of the bases; the rest are short fragments
+    lengths = rng.integers(200, 20_000, contigs)
+    lengths[:3] = max(1, (total - int(lengths[3:].sum())) // 3)
+    with open(path, "wb") as f:
+        for i, length in enumerate(lengths.tolist(), 1):
+            f.write(f">{i} length={length} depth={rng.uniform(1, 80):.2f}x\n".encode())
+            seq = rng.choice(np.frombuffer(b"ACGT", dtype=np.uint8), length)
+            lines = [seq[j:j + LINE_WIDTH].tobytes() for j in range(0, length, LINE_WIDTH)]
+            f.write(b"\n".join(lines) + b"\n")
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    contigs = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp, "assembly.fasta")
+        _write_assembly(path, size_mb, contigs)
+        file_mb = path.stat().st_size / 1024 / 1024
+
+        start = time.perf_counter()
+        stats = compute_assembly_stats(path)
+        elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{file_mb:.0f} MiB, {stats.contigs:,} contigs: {elapsed:.2f} s ({file_mb / elapsed:.0f} MiB/s)")
+    print(f"N50 {stats.n50:,} bp, GC {stats.gc_percent}%, peak RSS {peak_mb:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
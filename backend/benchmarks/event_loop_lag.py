@@ -0,0 +1,84 @@
+"""
+Event-loop lag under concurrent file reads.
+
+Runs a ticker that should wake every 5 ms while N coroutines read the same
+file, first with blocking reads on the loop and then through
+FileStorage.aio. Each read also sleeps for a simulated disk latency
+(network volumes, cold page cache). Lag is how late the ticker wakes;
+blocking reads delay every connected terminal by about that much.
+
+Usage (from backend/):
+    python -m benchmarks.event_loop_lag [readers] [file_mb] [latency_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.storage.files import FileStorage
+
+TICK_SECONDS = 0.005
+
+
+class SlowDiskStorage(FileStorage):
+    """FileStorage whose reads pay a fixed simulated device latency."""
+
+    def __init__(self, base_path: Path, latency: float):
+        super().__init__(base_path)
+        self.latency = latency
+
+    def read_bytes(self, *parts: str):
+        time.sleep(self.latency)
+        return super().read_bytes(*parts)
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def _run(label: str, read, readers: int):
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(TICK_SECONDS * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(read() for _ in range(readers)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    worst = lags[-1] if lags else 0.0
+    print(f"{label:>9}: total {elapsed * 1000:8.1f} ms  lag p99 {p99 * 1000:7.1f} ms  max {worst * 1000:7.1f} ms")
+
+
+async def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    size_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SlowDiskStorage(Path(tmp), latency_ms / 1000)
+        storage.resolve("big.txt").write_bytes(os.urandom(size_mb * 1024 * 1024))
+        print(f"{readers} concurrent reads of a {size_mb} MiB file, {latency_ms:g} ms device latency")
+
+        async def blocking_read():
+            storage.read_bytes("big.txt")
+
+        async def pooled_read():
+            await storage.aio.read_bytes("big.txt")
+
+        await _run("blocking", blocking_read, readers)
+        await _run("aio", pooled_read, readers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""
+Login throughput and event-loop lag with on-loop vs pooled bcrypt.
+
+Simulates a class logging in at once: N coroutines each verify a bcrypt
+password, first by calling verify_password on the event loop (as the
+login handler used to) and then through the password hashing pool. A
+ticker that should wake every 5 ms measures how late the loop runs;
+that lag is what every connected websocket terminal feels.
+
+Usage (from backend/):
+    python -m benchmarks.login_throughput [logins] [threads]
+"""
+import asyncio
+import sys
+
+from app.auth import PasswordHasher, hash_password, verify_password
+from benchmarks.event_loop_lag import _run
+
+PASSWORD = "correct horse battery staple"
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    hashed = hash_password(PASSWORD)
+    pool = PasswordHasher(threads, max_queue=logins)
+    print(f"{logins} concurrent logins, {threads} hashing threads")
+
+    async def blocking_login():
+        assert verify_password(PASSWORD, hashed)
+
+    async def pooled_login():
+        assert await pool.verify(PASSWORD, hashed)
+
+    await _run("blocking", blocking_login, logins)
+    await _run("pooled", pooled_login, logins)
+    stats = pool.stats()
+    print(f"pool queue time: avg {stats['queue_ms_avg']} ms  max {stats['queue_ms_max']} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Upstream fetches for concurrent reads of a cold object-store file.
+
+Builds a small content-addressed store, then has N coroutines read the
+same uncached file at once through ObjectFileStorage.aio, with a fixed
+simulated upstream latency per download. With coalescing the store sees
+one download however many students open the file; a second round shows
+the warm (disk cache) cost.
+
+Usage (from backend/):
+    python -m benchmarks.object_store_coalescing [readers] [file_mb] [latency_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.storage.blobs import ingest
+from app.storage.remote import DiskCache, LocalObjectStore, ObjectFileStorage
+
+
+class SlowObjectStore(LocalObjectStore):
+    """LocalObjectStore that counts downloads and pays a fixed latency for each."""
+
+    def __init__(self, root: Path, latency: float):
+        super().__init__(root)
+        self.latency = latency
+        self.downloads = 0
+
+    async def download(self, name: str, dest: Path):
+        self.downloads += 1
+        await asyncio.sleep(self.latency)
+        await super().download(name, dest)
+
+
+async def _round(label: str, storage: ObjectFileStorage, readers: int):
+    start = time.perf_counter()
+    await asyncio.gather(*(storage.aio.read_bytes("tutorial", "demo", "report.txt") for _ in range(readers)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>5}: total {elapsed * 1000:8.1f} ms  upstream downloads {storage.store.downloads}")
+
+
+async def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    size_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 200.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, store_dir, cache_dir = Path(tmp, "src"), Path(tmp, "store"), Path(tmp, "cache")
+        (source / "tutorial" / "demo").mkdir(parents=True)
+        (source / "tutorial" / "demo" / "report.txt").write_bytes(os.urandom(size_mb * 1024 * 1024))
+        ingest(source, store_dir)
+
+        store = SlowObjectStore(store_dir, latency_ms / 1000)
+        storage = ObjectFileStorage(store, DiskCache("benchmark_objects", cache_dir, 1024 ** 3))
+        await storage.areload()
+        print(f"{readers} concurrent reads of a cold {size_mb} MiB file, {latency_ms:g} ms upstream latency")
+
+        await _round("cold", storage, readers)
+        await _round("warm", storage, readers)
+        print(f"coalesced waits: {storage.cache.coalesced}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Allocation benchmark for pre-rendered playback frames.
+
+Compares the per-playback string churn of rendering a recorded output on
+the fly against streaming its cached PlaybackFrames.
+
+Usage (from backend/):
+    python -m benchmarks.playback_frames [sessions]
+"""
+import sys
+import time
+import tracemalloc
+
+from app.storage import CommandOutput
+
+
+def _sample_output() -> CommandOutput:
+    log = "\n".join(
+        f"\x1b[32m[{i:04d}]\x1b[0m Assembling contig_{i} length={1000 + i * 37} depth=42.1x"
+        for i in range(400)
+    )
+    return CommandOutput(
+        command="unicycler -1 sample_01_R1_paired.fq.gz -2 sample_01_R2_paired.fq.gz -o assembly/",
+        terminal_output=log,
+        execution_time=180.0,
+        files_generated=[f"assembly/file_{i}.gfa" for i in range(12)],
+    )
+
+
+def _render_legacy(result: CommandOutput) -> list[str]:
+    """The per-playback rendering the websocket layer used to do."""
+    sent = [f"\x1b[36m$ {result.command}\x1b[0m\r\n"]
+    if min(result.execution_time, 5.0) > 0.5:
+        sent.append(f"\x1b[90m[Running... ~{int(result.execution_time)}s]\x1b[0m\r\n")
+    text = result.terminal_output
+    if len(text) < 200:
+        sent.append(text.replace('\n', '\r\n'))
+    else:
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            sent.append(line + ('\r\n' if i < len(lines) - 1 else ''))
+    if result.files_generated:
+        sent.append("\r\n\x1b[32mFiles generated:\x1b[0m\r\n")
+        for f in result.files_generated:
+            sent.append(f"  📄 {f}\r\n")
+    return sent
+
+
+def _render_cached(result: CommandOutput) -> list[str]:
+    return list(result.frames)
+
+
+def _measure(label: str, render, result: CommandOutput, sessions: int):
+    render(result)  # warm caches
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(sessions):
+        render(result)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size for stat in snapshot.statistics("filename"))
+    print(f"{label:>8}: {elapsed * 1000:8.1f} ms  peak {peak / 1024:8.1f} KiB  retained {allocated / 1024:6.1f} KiB")
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    result = _sample_output()
+    print(f"Playing back one {len(result.terminal_output)}-char output for {sessions} sessions")
+    _measure("legacy", _render_legacy, result, sessions)
+    _measure("frames", _render_cached, result, sessions)
+
+
+if __name__ == "__main__":
+    main()
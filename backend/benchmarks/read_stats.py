@@ -0,0 +1,62 @@
+"""
+Throughput and memory of the FASTQ read profiler.
+
+Writes synthetic Illumina-style FASTQ files of increasing read counts
+(150 bp reads, gzip optional) and times compute_read_stats over each.
+Peak RSS should stay flat as the read count grows.
+
+Usage (from backend/):
+    python -m benchmarks.read_stats [max_reads] [--gzip]
+"""
+import gzip
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.read_stats import compute_read_stats
+
+READ_LENGTH = 150
+
+
+def _write_reads(path: Path, reads: int, compress: bool):
+    rng = np.random.default_rng(0)
+    opener = gzip.open if compress else open
+    with opener(path, "wb") as f:
+        for start in range(0, reads, 10_000):
+            batch = min(10_000, reads - start)
+            seqs = rng.choice(np.frombuffer(b"ACGT", dtype=np.uint8), (batch, READ_LENGTH))
+            # Quality falls off along the read, as on a real run
+            quals = np.clip(rng.normal(38 - np.arange(READ_LENGTH) / 15, 3, (batch, READ_LENGTH)), 2, 41)
+            quals = (quals + 33).astype(np.uint8)
+            f.write(b"".join(
+                b"@read%d\n%s\n+\n%s\n" % (start + i, seqs[i].tobytes(), quals[i].tobytes())
+                for i in range(batch)
+            ))
+
+
+def main():
+    max_reads = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 2_000_000
+    compress = "--gzip" in sys.argv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reads = max_reads // 8
+        while reads <= max_reads:
+            path = Path(tmp, "reads.fq.gz" if compress else "reads.fq")
+            _write_reads(path, reads, compress)
+            start = time.perf_counter()
+            stats = compute_read_stats(path)
+            elapsed = time.perf_counter() - start
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(
+                f"{stats.reads:>10,} reads: {elapsed:6.2f} s ({stats.reads / elapsed / 1e6:.2f} M reads/s)"
+                f"  Q30 {stats.q30_percent}%  peak RSS {peak_mb:.0f} MiB"
+            )
+            reads *= 2
+
+
+if __name__ == "__main__":
+    main()
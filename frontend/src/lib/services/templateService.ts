@@ -242,6 +242,16 @@ export async function initializeStoryline(category: string, storyline: string):
 export interface FilesystemStructure {
 	data_dir: string;
 	filesystem: Record<string, string[]>;
+	/** Directories listed but not included; fetch with fetchFilesystemSubtree */
+	unexpanded?: string[];
+	/** Set when the requested directory has more entries */
+	next_cursor?: string | null;
+}
+
+export interface SubtreeOptions {
+	depth?: number;
+	limit?: number;
+	cursor?: string;
 }
 
 /**
@@ -270,6 +280,215 @@ export async function fetchFilesystemStructure(dataDir: string): Promise<Filesys
 	}
 }
 
+/**
+ * Fetch one directory (relative to the storyline folder) of the filesystem lazily
+ */
+export async function fetchFilesystemSubtree(
+	dataDir: string,
+	path: string,
+	options: SubtreeOptions = { depth: 1, limit: 200 }
+): Promise<FilesystemStructure | null> {
+	const context = get(storylineContext);
+	if (!context) {
+		console.warn('No storyline context set');
+		return null;
+	}
+
+	const params = new URLSearchParams({ data_dir: dataDir, path });
+	if (options.depth !== undefined) params.set('depth', String(options.depth));
+	if (options.limit !== undefined) params.set('limit', String(options.limit));
+	if (options.cursor) params.set('cursor', options.cursor);
+
+	try {
+		const response = await fetch(
+			`${API_BASE_URL}/templates/${context.category}/${context.storyline}/filesystem?${params}`
+		);
+		if (!response.ok) {
+			console.error('Failed to fetch filesystem subtree:', response.statusText);
+			return null;
+		}
+
+		return await response.json();
+	} catch (error) {
+		console.error('Error fetching filesystem subtree:', error);
+		return null;
+	}
+}
+
+export interface SequenceRecord {
+	index: number;
+	id: string;
+	description: string;
+	/** Full sequence length (sequence may be cut to max_bases) */
+	length: number;
+	sequence: string;
+	quality?: string | null;
+	truncated: boolean;
+}
+
+export interface FeatureRecord {
+	index: number;
+	seqid: string;
+	source: string;
+	type: string;
+	start: number;
+	end: number;
+	score?: number | null;
+	strand: string;
+	phase: string;
+	attributes: Record<string, string>;
+}
+
+export interface RecordPage {
+	name: string;
+	format: 'fasta' | 'fastq' | 'gff';
+	total: number;
+	start: number;
+	records: (SequenceRecord | FeatureRecord)[];
+	/** Pass as start for the next page; null on the last page */
+	next_start?: number | null;
+}
+
+export interface RecordOptions {
+	start?: number;
+	count?: number;
+	/** FASTA record id or GFF seqid to start at */
+	name?: string;
+	maxBases?: number;
+}
+
+/**
+ * Fetch a page of records from a FASTA/FASTQ/GFF file (path relative to the storyline folder)
+ */
+export async function fetchFileRecords(path: string, options: RecordOptions = {}): Promise<RecordPage | null> {
+	const context = get(storylineContext);
+	if (!context) {
+		console.warn('No storyline context set');
+		return null;
+	}
+
+	const params = new URLSearchParams();
+	if (options.start !== undefined) params.set('start', String(options.start));
+	if (options.count !== undefined) params.set('count', String(options.count));
+	if (options.name) params.set('name', options.name);
+	if (options.maxBases !== undefined) params.set('max_bases', String(options.maxBases));
+
+	try {
+		const response = await fetch(
+			`${API_BASE_URL}/templates/${context.category}/${context.storyline}/_records/${path}?${params}`
+		);
+		if (!response.ok) {
+			console.error('Failed to fetch file records:', response.statusText);
+			return null;
+		}
+
+		return await response.json();
+	} catch (error) {
+		console.error('Error fetching file records:', error);
+		return null;
+	}
+}
+
+export interface SequenceRegion {
+	seqid: string;
+	length: number;
+	features: number;
+}
+
+export interface FeatureQuery {
+	name: string;
+	/** Matching features, including any beyond limit */
+	total: number;
+	features: FeatureRecord[];
+	truncated: boolean;
+	/** Only when neither seqid nor name is given */
+	sequences?: SequenceRegion[] | null;
+}
+
+export interface FeatureQueryOptions {
+	seqid?: string;
+	/** 1-based, inclusive */
+	start?: number;
+	end?: number;
+	/** Name, gene, locus_tag or ID */
+	name?: string;
+	prefix?: boolean;
+	type?: string;
+	limit?: number;
+}
+
+/**
+ * Query the features of a GFF file by region or name (path relative to the storyline folder)
+ */
+export async function fetchFileFeatures(path: string, options: FeatureQueryOptions = {}): Promise<FeatureQuery | null> {
+	const context = get(storylineContext);
+	if (!context) {
+		console.warn('No storyline context set');
+		return null;
+	}
+
+	const params = new URLSearchParams();
+	if (options.seqid) params.set('seqid', options.seqid);
+	if (options.start !== undefined) params.set('start', String(options.start));
+	if (options.end !== undefined) params.set('end', String(options.end));
+	if (options.name) params.set('name', options.name);
+	if (options.prefix) params.set('prefix', 'true');
+	if (options.type) params.set('type', options.type);
+	if (options.limit !== undefined) params.set('limit', String(options.limit));
+
+	try {
+		const response = await fetch(
+			`${API_BASE_URL}/templates/${context.category}/${context.storyline}/_features/${path}?${params}`
+		);
+		if (!response.ok) {
+			console.error('Failed to fetch file features:', response.statusText);
+			return null;
+		}
+
+		return await response.json();
+	} catch (error) {
+		console.error('Error fetching file features:', error);
+		return null;
+	}
+}
+
+export interface FileAnalysis {
+	name: string;
+	kind: 'assembly' | 'reads';
+	/** Labelled values for the summary table */
+	summary: Record<string, string>;
+	/** Same shape as the output_data chart sent over the terminal websocket */
+	chart_data?: Record<string, unknown> | null;
+	charts: Record<string, unknown>[];
+	stats: Record<string, unknown>;
+}
+
+/**
+ * Fetch computed statistics for a file (path relative to the storyline folder)
+ */
+export async function fetchFileStats(path: string): Promise<FileAnalysis | null> {
+	const context = get(storylineContext);
+	if (!context) {
+		console.warn('No storyline context set');
+		return null;
+	}
+
+	try {
+		const response = await fetch(
+			`${API_BASE_URL}/templates/${context.category}/${context.storyline}/_stats/${path}`
+		);
+		if (!response.ok) {
+			console.error('Failed to fetch file stats:', response.statusText);
+			return null;
+		}
+
+		return await response.json();
+	} catch (error) {
+		console.error('Error fetching file stats:', error);
+		return null;
+	}
+}
+
 /**
  * Get file extension from filename
  */
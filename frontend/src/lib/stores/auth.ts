@@ -142,6 +142,19 @@ function createAuthStore() {
 			});
 		},
 
+		/** Replace the session's tokens (e.g. after a password change revokes the old ones). */
+		setTokens(tokens: { access_token: string; refresh_token: string }) {
+			update((s) => {
+				const next = {
+					...s,
+					accessToken: tokens.access_token,
+					refreshToken: tokens.refresh_token,
+				};
+				persist(next);
+				return next;
+			});
+		},
+
 		/** Helper: get an Authorization header value for API calls. */
 		getAuthHeader(): string | null {
 			let token: string | null = null;